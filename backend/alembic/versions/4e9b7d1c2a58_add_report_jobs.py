@@ -0,0 +1,50 @@
+"""add_report_jobs
+
+Revision ID: 4e9b7d1c2a58
+Revises: c81d4e2f6a93
+Create Date: 2026-10-17 17:40:22.913604
+
+Background report jobs; the table doubles as the job queue.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e9b7d1c2a58'
+down_revision = 'c81d4e2f6a93'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('report_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('report_type', sa.String(length=20), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('end_date', sa.Date(), nullable=True),
+        sa.Column('cache_key', sa.String(length=200), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_report_jobs_id'), 'report_jobs', ['id'], unique=False)
+    op.create_index('ix_report_jobs_status_id', 'report_jobs', ['status', 'id'], unique=False)
+    op.create_index('ix_report_jobs_business_cache_key', 'report_jobs', ['business_id', 'cache_key'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_report_jobs_business_cache_key', table_name='report_jobs')
+    op.drop_index('ix_report_jobs_status_id', table_name='report_jobs')
+    op.drop_index(op.f('ix_report_jobs_id'), table_name='report_jobs')
+    op.drop_table('report_jobs')
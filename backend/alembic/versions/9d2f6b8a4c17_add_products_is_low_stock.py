@@ -0,0 +1,30 @@
+"""add_products_is_low_stock
+
+Revision ID: 9d2f6b8a4c17
+Revises: 4e9b7d1c2a58
+Create Date: 2026-10-17 19:05:41.270316
+
+Flag products at or below their minimum stock level, with a partial index
+so low-stock lists and counts read only the flagged rows.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2f6b8a4c17'
+down_revision = '4e9b7d1c2a58'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('products', sa.Column('is_low_stock', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute("UPDATE products SET is_low_stock = TRUE WHERE stock_quantity <= min_stock_level")
+    op.create_index('ix_products_business_low_stock', 'products', ['business_id'], unique=False,
+                    postgresql_where=sa.text("is_low_stock"),
+                    sqlite_where=sa.text("is_low_stock = 1"))
+
+def downgrade():
+    op.drop_index('ix_products_business_low_stock', table_name='products')
+    op.drop_column('products', 'is_low_stock')
@@ -0,0 +1,22 @@
+"""add_role_version_to_users
+
+Revision ID: a3c9e1f47b20
+Revises: dcfbe6fbc1b7
+Create Date: 2026-10-17 09:12:04.118230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f47b20'
+down_revision = 'dcfbe6fbc1b7'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('users', sa.Column('role_version', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('users', 'role_version')
@@ -0,0 +1,36 @@
+"""add_sale_ingest_keys
+
+Revision ID: c81d4e2f6a93
+Revises: f7a3c5e92d18
+Create Date: 2026-10-17 15:12:09.448120
+
+Idempotency keys for sales uploaded in bulk by offline tills.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81d4e2f6a93'
+down_revision = 'f7a3c5e92d18'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('sale_ingest_keys',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+        sa.Column('sale_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.ForeignKeyConstraint(['sale_id'], ['sales.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('business_id', 'idempotency_key', name='uq_sale_ingest_keys_business_key')
+    )
+    op.create_index(op.f('ix_sale_ingest_keys_id'), 'sale_ingest_keys', ['id'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_sale_ingest_keys_id'), table_name='sale_ingest_keys')
+    op.drop_table('sale_ingest_keys')
@@ -0,0 +1,109 @@
+"""add_daily_sales_rollup
+
+Revision ID: e5b2d8a41c67
+Revises: a3c9e1f47b20
+Create Date: 2026-10-17 10:41:27.503118
+
+Existing sales, payments and refunds are backfilled in upgrade(), with the
+same attribution RollupService.rebuild uses.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2d8a41c67'
+down_revision = 'a3c9e1f47b20'
+branch_labels = None
+depends_on = None
+
+METRICS = (
+    'sales_usd', 'sales_original', 'tax_usd', 'tax_original', 'transactions', 'items_sold',
+    'cogs_usd', 'cogs_original', 'payment_count', 'payments_usd', 'payments_original',
+    'refunds_usd', 'refunds_original', 'refund_count'
+)
+
+# One fact row per completed sale, sale line, completed payment and processed
+# refund, summed per bucket. Sale totals and refunds go to the sale's first
+# payment method, payments to their own; refunds are dated by the refund.
+BACKFILL = """
+WITH first_payment AS (
+    SELECT p.sale_id, p.payment_method
+    FROM payments p
+    JOIN (SELECT sale_id, MIN(id) AS id FROM payments GROUP BY sale_id) f ON f.id = p.id
+),
+facts (business_id, sale_date, currency_code, payment_method, {metrics}) AS (
+    SELECT s.business_id, DATE(s.created_at), s.original_currency, fp.payment_method,
+           s.total_amount, s.original_amount, s.tax_amount,
+           COALESCE(s.tax_amount / NULLIF(s.exchange_rate_at_sale, 0), s.tax_amount), 1, 0,
+           0.0, 0.0, 0, 0.0, 0.0, 0.0, 0.0, 0
+    FROM sales s LEFT JOIN first_payment fp ON fp.sale_id = s.id
+    WHERE s.payment_status = 'completed' AND s.business_id IS NOT NULL
+    UNION ALL
+    SELECT s.business_id, DATE(s.created_at), s.original_currency, fp.payment_method,
+           0.0, 0.0, 0.0, 0.0, 0, si.quantity,
+           si.quantity * COALESCE(pr.cost_price, 0), si.quantity * COALESCE(pr.original_cost_price, 0),
+           0, 0.0, 0.0, 0.0, 0.0, 0
+    FROM sale_items si
+    JOIN sales s ON s.id = si.sale_id
+    JOIN products pr ON pr.id = si.product_id
+    LEFT JOIN first_payment fp ON fp.sale_id = s.id
+    WHERE s.payment_status = 'completed' AND s.business_id IS NOT NULL
+    UNION ALL
+    SELECT s.business_id, DATE(s.created_at), s.original_currency, p.payment_method,
+           0.0, 0.0, 0.0, 0.0, 0, 0, 0.0, 0.0,
+           1, p.amount, COALESCE(p.original_amount, p.amount / NULLIF(s.exchange_rate_at_sale, 0)),
+           0.0, 0.0, 0
+    FROM payments p JOIN sales s ON s.id = p.sale_id
+    WHERE p.status = 'completed' AND s.business_id IS NOT NULL
+    UNION ALL
+    SELECT r.business_id, DATE(r.created_at), r.original_currency, fp.payment_method,
+           0.0, 0.0, 0.0, 0.0, 0, 0, 0.0, 0.0, 0, 0.0, 0.0,
+           r.total_amount, r.original_amount, 1
+    FROM refunds r LEFT JOIN first_payment fp ON fp.sale_id = r.sale_id
+    WHERE r.status = 'processed' AND r.business_id IS NOT NULL
+)
+INSERT INTO daily_sales_rollup (business_id, sale_date, currency_code, payment_method, {metrics}, updated_at)
+SELECT business_id, sale_date, COALESCE(currency_code, 'USD'), COALESCE(payment_method, 'unknown'),
+       {sums}, CURRENT_TIMESTAMP
+FROM facts
+GROUP BY business_id, sale_date, COALESCE(currency_code, 'USD'), COALESCE(payment_method, 'unknown')
+""".format(
+    metrics=', '.join(METRICS),
+    sums=', '.join('COALESCE(SUM({0}), 0)'.format(metric) for metric in METRICS)
+)
+
+def upgrade():
+    op.create_table('daily_sales_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('sale_date', sa.Date(), nullable=False),
+        sa.Column('currency_code', sa.String(length=3), nullable=False),
+        sa.Column('payment_method', sa.String(length=50), nullable=False),
+        sa.Column('sales_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('sales_original', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('tax_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('tax_original', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('transactions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('items_sold', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cogs_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('cogs_original', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('payment_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payments_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('payments_original', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('refunds_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('refunds_original', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('refund_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('business_id', 'sale_date', 'currency_code', 'payment_method',
+                            name='uq_daily_sales_rollup_bucket')
+    )
+    op.create_index(op.f('ix_daily_sales_rollup_id'), 'daily_sales_rollup', ['id'], unique=False)
+    op.execute(BACKFILL)
+
+def downgrade():
+    op.drop_index(op.f('ix_daily_sales_rollup_id'), table_name='daily_sales_rollup')
+    op.drop_table('daily_sales_rollup')
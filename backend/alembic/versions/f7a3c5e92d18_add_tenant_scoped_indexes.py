@@ -0,0 +1,53 @@
+"""add_tenant_scoped_indexes
+
+Revision ID: f7a3c5e92d18
+Revises: e5b2d8a41c67
+Create Date: 2026-10-17 13:05:48.271904
+
+Composite (business_id, time) indexes for the report and listing queries,
+partial indexes for the completed-sale and processed-refund filters, and the
+foreign-key indexes the joins in reports and refunds rely on. On PostgreSQL
+the indexes are built CONCURRENTLY so live tables are not locked.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a3c5e92d18'
+down_revision = 'e5b2d8a41c67'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial-index predicate)
+INDEXES = [
+    ('ix_sales_business_created_at', 'sales', ['business_id', 'created_at'], None),
+    ('ix_sales_business_completed_created_at', 'sales', ['business_id', 'created_at'], "payment_status = 'completed'"),
+    ('ix_sale_items_sale_id', 'sale_items', ['sale_id'], None),
+    ('ix_sale_items_product_id', 'sale_items', ['product_id'], None),
+    ('ix_payments_sale_id', 'payments', ['sale_id'], None),
+    ('ix_refunds_business_created_at', 'refunds', ['business_id', 'created_at'], None),
+    ('ix_refunds_business_processed_created_at', 'refunds', ['business_id', 'created_at'], "status = 'processed'"),
+    ('ix_refunds_sale_id', 'refunds', ['sale_id'], None),
+    ('ix_refund_items_refund_id', 'refund_items', ['refund_id'], None),
+    ('ix_inventory_history_business_changed_at', 'inventory_history', ['business_id', 'changed_at'], None),
+    ('ix_inventory_history_product_changed_at', 'inventory_history', ['product_id', 'changed_at'], None),
+    ('ix_expenses_business_date', 'expenses', ['business_id', 'date'], None),
+    ('ix_products_business_barcode', 'products', ['business_id', 'barcode'], None),
+    ('ix_barcode_scan_events_created_at', 'barcode_scan_events', ['created_at'], None),
+]
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            predicate = sa.text(where) if where else None
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_where=predicate, sqlite_where=predicate,
+                            postgresql_concurrently=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
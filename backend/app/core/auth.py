@@ -2,14 +2,20 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from app.crud.user import get_user_by_email
 from app.database import get_db
 from app.schemas.user_schema import TokenData
 from sqlalchemy.orm import Session
 import os
+import logging
 from dotenv import load_dotenv
 from app.crud.user import get_user_by_email, get_user_permissions
+from app.core.permission_cache import permission_cache
+from app.core import token_claims
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -34,8 +40,59 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    print("DEBUG: get_current_user function called!")
+def build_token_claims(user: User) -> dict:
+    """
+    Claims for a user's access token. Besides `sub` and `business_id` the token
+    carries the user id, role version and a permission bitset, so it can be
+    authorized without the database when AUTH_TOKEN_MODE=claims.
+    """
+    token_data = {"sub": user.email}
+    if user.business_id:
+        token_data["business_id"] = user.business_id
+    token_data.update({
+        "uid": user.id,
+        "usr": user.username,
+        "rv": user.role_version or 0,
+        "perms": token_claims.encode_permission_bits(token_claims.permission_ids_for_user(user))
+    })
+    return token_data
+
+def _context_from_claims(payload: dict, db: Session, credentials_exception: HTTPException) -> dict:
+    """User context from a claims token; rejects it if the user's roles changed since it was issued"""
+    user_id = payload["uid"]
+    current = permission_cache.get_role_version(user_id)
+    if current is None:
+        row = db.query(User.role_version, User.is_active).filter(User.id == user_id).first()
+        if row is None:
+            raise credentials_exception
+        current = (row.role_version or 0, row.is_active)
+        permission_cache.put_role_version(user_id, *current)
+
+    role_version, is_active = current
+    if payload["rv"] != role_version or not is_active:
+        logger.debug("Rejecting stale token", extra={
+            "event": "auth.token_rejected", "user_id": user_id,
+            "token_role_version": payload["rv"], "role_version": role_version
+        })
+        raise credentials_exception
+
+    return {
+        "id": user_id,
+        "email": payload["sub"],
+        "username": payload.get("usr"),
+        "is_active": is_active,
+        "created_at": None,
+        "permissions": token_claims.permission_catalog.names(
+            db, token_claims.decode_permission_bits(payload["perms"])
+        )
+    }
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # Resolved once per request: every other dependency reuses this context
+    current_user = getattr(request.state, "current_user", None)
+    if current_user is not None:
+        return current_user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,23 +101,39 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        print(f"DEBUG: Decoded JWT payload: {payload}")
-        print(f"DEBUG: Extracted email: {email}")
+        logger.debug("Decoded JWT", extra={"event": "auth.token_decoded", "sub": email})
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError as e:
-        print(f"DEBUG: JWTError: {e}")
+        logger.debug("Invalid JWT: %s", e, extra={"event": "auth.token_invalid"})
         raise credentials_exception
 
-    user = get_user_by_email(db, email=token_data.email)
-    print(f"DEBUG: Found user: {user.id if user else None}")
-    if user is None:
-        raise credentials_exception
+    if token_claims.AUTH_TOKEN_MODE == "claims" and token_claims.is_claims_token(payload):
+        user_context = _context_from_claims(payload, db, credentials_exception)
+    else:
+        user_context = permission_cache.get_by_email(token_data.email)
+    if user_context is None:
+        user = get_user_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
 
-    # NEW: Get the user's permissions from the database
-    user_permissions = get_user_permissions(db, user.id)
-    print(f"DEBUG: User permissions: {user_permissions}")
+        # NEW: Get the user's permissions from the database
+        user_permissions = get_user_permissions(db, user.id)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Loaded permissions", extra={
+                "event": "auth.authenticated", "user_id": user.id, "permission_count": len(user_permissions)
+            })
+
+        user_context = {
+            "id": user.id,
+            "email": user.email,
+            "username": user.username,
+            "is_active": user.is_active,
+            "created_at": user.created_at.isoformat() if user.created_at else None,
+            "permissions": user_permissions
+        }
+        permission_cache.put(user_context)
 
     # FIXED: Convert business_id from JWT token to an integer
     biz_id_int = None
@@ -69,19 +142,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         try:
             biz_id_int = int(business_id_from_token)
         except (ValueError, TypeError):
-            print(f"DEBUG: Could not convert business_id '{business_id_from_token}' to integer. Setting to None.")
+            logger.debug("Ignoring non-integer business_id %r in token", business_id_from_token)
             biz_id_int = None
 
     # RETURN USER DICTIONARY - MAINTAINS EXISTING STRUCTURE
-    return {
-        "id": user.id,
-        "email": user.email,
-        "username": user.username,
-        "is_active": user.is_active,
-        "created_at": user.created_at.isoformat() if user.created_at else None,
-        "permissions": user_permissions,
+    current_user = {
+        **user_context,
+        "permissions": list(user_context["permissions"]),
         "business_id": biz_id_int  # <-- NOW THIS IS AN INTEGER (or None)
     }
+    request.state.current_user = current_user
+    return current_user
 
 # This function MUST be defined AFTER get_current_user
 async def get_current_active_user(current_user: dict = Depends(get_current_user)):
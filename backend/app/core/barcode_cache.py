@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# How long a scanned product is served without reading it again.
+# Invalidation below is process-local, so this also bounds staleness across workers.
+BARCODE_CACHE_TTL_SECONDS = float(os.getenv("BARCODE_CACHE_TTL_SECONDS", "120"))
+# How long a barcode found in no source is answered as unknown without looking again
+BARCODE_NEGATIVE_TTL_SECONDS = float(os.getenv("BARCODE_NEGATIVE_TTL_SECONDS", "15"))
+# Barcodes kept per business; the least recently scanned are evicted first
+BARCODE_CACHE_SIZE = int(os.getenv("BARCODE_CACHE_SIZE", "10000"))
+# Businesses that sold within this many days have their catalog loaded at startup
+BARCODE_CACHE_WARM_DAYS = int(os.getenv("BARCODE_CACHE_WARM_DAYS", "7"))
+
+# Session.info key holding the barcode changes a transaction applies when it commits
+_CHANGES_KEY = "barcode_changes"
+
+class BarcodeEntry(NamedTuple):
+    product: Optional[dict]  # None for a barcode found in no source
+    expires: float
+
+class BarcodeCache:
+    """
+    Per-business LRU of scanned barcodes and the product each one resolves to.
+
+    Entries hold the scanner's product dict and expire after `ttl_seconds`;
+    barcodes found nowhere are remembered as unknown for `negative_ttl_seconds`.
+    Writers call `forget` when a product is created, edited or deleted, and
+    the ledger calls `stock_changed` for every stock movement, so the cached
+    stock quantity follows sales without dropping the entry. Both take effect
+    when the writer's transaction commits.
+
+    A lookup that started before a change for its business committed does not
+    store its result, since it may predate the change.
+    """
+
+    def __init__(self, ttl_seconds: float = BARCODE_CACHE_TTL_SECONDS,
+                 negative_ttl_seconds: float = BARCODE_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = BARCODE_CACHE_SIZE, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[int, "OrderedDict[str, BarcodeEntry]"] = {}
+        self._products: Dict[int, Tuple[int, str]] = {}
+        self._generations: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, business_id: Optional[int], barcode: str) -> Optional[BarcodeEntry]:
+        """The cached entry for `barcode`, or None when it has to be looked up"""
+        if business_id is None:
+            return None
+        with self._lock:
+            entries = self._entries.get(business_id)
+            entry = entries.get(barcode) if entries is not None else None
+            if entry is None or entry.expires < self.clock():
+                self.misses += 1
+                return None
+            entries.move_to_end(barcode)
+            self.hits += 1
+        if entry.product is not None:
+            entry = entry._replace(product=dict(entry.product))
+        return entry
+
+    def generation(self, business_id: Optional[int]) -> int:
+        """Take before a lookup and pass to `put` with its result"""
+        with self._lock:
+            return self._generations.get(business_id, 0)
+
+    def put(self, business_id: Optional[int], barcode: str, product: Optional[dict],
+            generation: Optional[int] = None):
+        """Cache what `barcode` resolved to; `product` None records it as unknown"""
+        ttl = self.ttl_seconds if product is not None else self.negative_ttl_seconds
+        if business_id is None or ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and self._generations.get(business_id, 0) != generation:
+                return
+            entries = self._entries.setdefault(business_id, OrderedDict())
+            self._drop(business_id, entries, barcode)
+            entries[barcode] = BarcodeEntry(dict(product) if product is not None else None, self.clock() + ttl)
+            if product is not None:
+                self._products[product["id"]] = (business_id, barcode)
+            while len(entries) > self.max_entries:
+                self._drop(business_id, entries, next(iter(entries)))
+
+    def forget(self, db: Session, business_id: Optional[int], barcode: Optional[str]):
+        """Drop `barcode` from `business_id`'s cache when `db`'s transaction commits"""
+        if business_id is not None and barcode:
+            db.info.setdefault(_CHANGES_KEY, []).append((business_id, barcode, None, None))
+
+    def stock_changed(self, db: Session, business_id: Optional[int], product_id: int, stock_quantity: int):
+        """Update the product's cached stock quantity when `db`'s transaction commits"""
+        if business_id is not None:
+            db.info.setdefault(_CHANGES_KEY, []).append((business_id, None, product_id, stock_quantity))
+
+    def apply(self, business_id: int, barcode: Optional[str], product_id: Optional[int],
+              stock_quantity: Optional[int]):
+        with self._lock:
+            self._generations[business_id] = self._generations.get(business_id, 0) + 1
+            if barcode is None:
+                business_id, barcode = self._products.get(product_id, (business_id, None))
+            entries = self._entries.get(business_id)
+            if entries is None or barcode is None:
+                return
+            if stock_quantity is None:
+                self._drop(business_id, entries, barcode)
+                return
+            entry = entries.get(barcode)
+            if entry is not None and entry.product is not None and entry.product["id"] == product_id:
+                entries[barcode] = entry._replace(product={**entry.product, "stock_quantity": stock_quantity})
+
+    def _drop(self, business_id: int, entries: "OrderedDict[str, BarcodeEntry]", barcode: str):
+        entry = entries.pop(barcode, None)
+        if entry is not None and entry.product is not None:
+            if self._products.get(entry.product["id"]) == (business_id, barcode):
+                del self._products[entry.product["id"]]
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._products.clear()
+
+# Global cache instance
+barcode_cache = BarcodeCache()
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session):
+    # Savepoint commits fire this too; only the outermost commit publishes the changes
+    if not session.in_nested_transaction():
+        for change in session.info.pop(_CHANGES_KEY, ()):
+            barcode_cache.apply(*change)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    if not session.in_nested_transaction():
+        session.info.pop(_CHANGES_KEY, None)
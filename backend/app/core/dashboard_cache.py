@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Longest a dashboard snapshot is served without being rebuilt.
+# Invalidation below is process-local, so this also bounds staleness across workers.
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+# An invalidated snapshot younger than this is still served, so a busy till
+# causes at most one rebuild per interval rather than one per sale
+DASHBOARD_MIN_REFRESH_SECONDS = float(os.getenv("DASHBOARD_MIN_REFRESH_SECONDS", "15"))
+
+# Session.info key holding the businesses whose dashboards the transaction changes
+_CHANGED_KEY = "dashboard_changed"
+
+class DashboardSnapshot(NamedTuple):
+    key: str
+    data: dict
+    etag: str
+    built_at: datetime
+    expires: float
+    refresh_after: float
+    stale: bool
+
+class DashboardCache:
+    """
+    Per-business cache of the dashboard metrics, shared by every open dashboard.
+
+    Writers that change what the dashboard shows (sales, refunds, stock
+    movements, expenses) call `mark_changed` inside their transaction; the
+    business's snapshot is marked stale when that transaction commits and
+    forgotten if it rolls back. A stale snapshot is rebuilt by the next poll
+    once it is `min_refresh_seconds` old. Concurrent misses for one business
+    wait for a single rebuild.
+
+    Each snapshot carries an ETag derived from its data, so a rebuild that
+    finds nothing changed keeps the client's copy valid.
+    """
+
+    def __init__(self, ttl_seconds: float = DASHBOARD_CACHE_TTL_SECONDS,
+                 min_refresh_seconds: float = DASHBOARD_MIN_REFRESH_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[int, DashboardSnapshot] = {}
+        self._generations: Dict[int, int] = {}
+        self._build_locks: Dict[int, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, business_id: int, key: str, build: Callable[[], dict]) -> DashboardSnapshot:
+        """
+        The business's snapshot for `key` (the day it covers), calling `build`
+        when there is no usable one
+        """
+        with self._lock:
+            entry = self._usable(business_id, key)
+            if entry is not None:
+                return entry
+            build_lock = self._build_locks.setdefault(business_id, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                # Another request may have rebuilt it while this one waited
+                entry = self._usable(business_id, key)
+                if entry is not None:
+                    return entry
+                self.misses += 1
+                generation = self._generations.get(business_id, 0)
+
+            started = self.clock()
+            data = build()
+            entry = DashboardSnapshot(key, data, self.etag(data), datetime.now(), started + self.ttl_seconds,
+                                      started + self.min_refresh_seconds, False)
+            if self.ttl_seconds <= 0:
+                return entry
+            with self._lock:
+                # A write committed during the build may not be in it
+                entry = entry._replace(stale=self._generations.get(business_id, 0) != generation)
+                self._entries[business_id] = entry
+            return entry
+
+    def _usable(self, business_id: int, key: str) -> Optional[DashboardSnapshot]:
+        entry = self._entries.get(business_id)
+        now = self.clock()
+        if entry is None or entry.key != key or entry.expires < now or (entry.stale and entry.refresh_after <= now):
+            return None
+        self.hits += 1
+        return entry
+
+    @staticmethod
+    def etag(data: dict) -> str:
+        body = json.dumps(jsonable_encoder(data), sort_keys=True, separators=(",", ":"))
+        return '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+
+    def mark_changed(self, db: Session, business_id: Optional[int]):
+        """Invalidate `business_id`'s dashboard when `db`'s transaction commits"""
+        if business_id is not None:
+            db.info.setdefault(_CHANGED_KEY, set()).add(business_id)
+
+    def invalidate(self, business_id: int):
+        with self._lock:
+            self._generations[business_id] = self._generations.get(business_id, 0) + 1
+            entry = self._entries.get(business_id)
+            if entry is not None:
+                self._entries[business_id] = entry._replace(stale=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Global cache instance
+dashboard_cache = DashboardCache()
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    # Savepoint commits fire this too; only the outermost commit publishes the changes
+    if not session.in_nested_transaction():
+        for business_id in session.info.pop(_CHANGED_KEY, ()):
+            dashboard_cache.invalidate(business_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    if not session.in_nested_transaction():
+        session.info.pop(_CHANGED_KEY, None)
@@ -0,0 +1,142 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Root level, e.g. INFO or DEBUG
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-module overrides: "app.core.auth=DEBUG,app.services.sequence_service=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "text" for humans, "json" for one structured object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# High-frequency events are kept 1 in LOG_SAMPLE_EVERY (1 keeps them all)
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+LOG_SAMPLED_EVENTS = os.getenv(
+    "LOG_SAMPLED_EVENTS",
+    "auth.token_decoded,auth.authenticated,permission.checked,scanner.lookup"
+)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message and any `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line format, with `extra` fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = [f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES]
+        return f"{line} {' '.join(fields)}" if fields else line
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps 1 in `every` records for each sampled event.
+
+    Records name their event with extra={"event": "..."}; records without an
+    event, or with one that is not sampled, always pass. Sampling is by
+    count rather than random so the kept fraction is exact.
+    """
+
+    def __init__(self, events, every: int):
+        super().__init__()
+        self.events = set(events)
+        self.every = max(1, every)
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event not in self.events or self.every == 1:
+            return True
+        with self._lock:
+            seen = self._seen.get(event, 0)
+            self._seen[event] = seen + 1
+        if seen % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records as they are. The stock QueueHandler formats each record
+    before enqueueing it, which would put the formatting cost back on the
+    request thread; here the listener's handler does it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """"a.b=DEBUG,c=WARNING" -> {"a.b": "DEBUG", "c": "WARNING"}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT,
+                      sample_every: int = LOG_SAMPLE_EVERY, sampled_events: str = LOG_SAMPLED_EVENTS,
+                      stream=None):
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Request handlers only pay for building the record and putting it on the
+    queue; formatting and the write to stdout happen on the listener thread.
+    Safe to call again (e.g. in tests); the previous listener is stopped.
+    """
+    global _listener
+    stop_logging()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(filter(None, sampled_events.split(",")), sample_every))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging():
+    """Flush whatever is queued and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
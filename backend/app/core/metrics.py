@@ -0,0 +1,334 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Off by default: when disabled neither the middleware nor the engine hooks are installed
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+# Adds a Server-Timing header (app, db) to every response while profiling is on
+PROFILING_SERVER_TIMING = os.getenv("PROFILING_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+# How many of the slowest statements to keep per route
+PROFILING_SLOW_STATEMENTS = int(os.getenv("PROFILING_SLOW_STATEMENTS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"
+
+class RequestProfile:
+    """SQL issued while serving one request"""
+    __slots__ = ("statements", "db_seconds", "slowest")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        entry = (seconds, statement)
+        if len(self.slowest) < PROFILING_SLOW_STATEMENTS:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+# The profile of the request being served. Starlette copies the context into
+# worker threads, so sync endpoints and dependencies record into it as well.
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+class RouteStats:
+    def __init__(self):
+        self.requests: Dict[int, int] = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []
+
+class MetricsRegistry:
+    """Per-route request latency and SQL totals, aggregated in process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float, profile: RequestProfile):
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            stats.requests[status_code] = stats.requests.get(status_code, 0) + 1
+            stats.count += 1
+            stats.latency_sum += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+            stats.statements += profile.statements
+            stats.db_seconds += profile.db_seconds
+            for entry in profile.slowest:
+                if len(stats.slowest) < PROFILING_SLOW_STATEMENTS:
+                    heapq.heappush(stats.slowest, entry)
+                elif entry[0] > stats.slowest[0][0]:
+                    heapq.heapreplace(stats.slowest, entry)
+
+    def snapshot(self) -> List[dict]:
+        """Per-route summary, busiest database users first"""
+        with self._lock:
+            rows = [
+                {
+                    "method": method,
+                    "route": route,
+                    "requests": stats.count,
+                    "avg_latency_ms": stats.latency_sum / stats.count * 1000 if stats.count else 0.0,
+                    "sql_statements": stats.statements,
+                    "avg_sql_statements": stats.statements / stats.count if stats.count else 0.0,
+                    "db_time_ms": stats.db_seconds * 1000,
+                    "slowest_statements": [
+                        {"ms": seconds * 1000, "statement": " ".join(statement.split())}
+                        for seconds, statement in sorted(stats.slowest, reverse=True)
+                    ],
+                }
+                for (method, route), stats in self._routes.items()
+            ]
+        return sorted(rows, key=lambda row: row["db_time_ms"], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            "# HELP bizzy_http_requests_total HTTP requests by route and status.",
+            "# TYPE bizzy_http_requests_total counter",
+        ]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            for (method, route), stats in routes:
+                for status_code, count in sorted(stats.requests.items()):
+                    lines.append(f'bizzy_http_requests_total{{{_labels(method, route)},status="{status_code}"}} {count}')
+
+            lines += [
+                "# HELP bizzy_http_request_duration_seconds Request latency by route.",
+                "# TYPE bizzy_http_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in routes:
+                labels = _labels(method, route)
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'bizzy_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'bizzy_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f"bizzy_http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}")
+                lines.append(f"bizzy_http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+            lines += [
+                "# HELP bizzy_http_request_sql_statements_total SQL statements executed while serving the route.",
+                "# TYPE bizzy_http_request_sql_statements_total counter",
+            ]
+            lines += [
+                f"bizzy_http_request_sql_statements_total{{{_labels(method, route)}}} {stats.statements}"
+                for (method, route), stats in routes
+            ]
+            lines += [
+                "# HELP bizzy_http_request_sql_seconds_total Time spent in SQL while serving the route.",
+                "# TYPE bizzy_http_request_sql_seconds_total counter",
+            ]
+            lines += [
+                f"bizzy_http_request_sql_seconds_total{{{_labels(method, route)}}} {stats.db_seconds:.6f}"
+                for (method, route), stats in routes
+            ]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+# Global registry instance
+metrics_registry = MetricsRegistry()
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+class PoolStats:
+    def __init__(self, pool):
+        self.pool = pool
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * len(POOL_WAIT_BUCKETS)
+
+class PoolMetrics:
+    """
+    Connection checkouts and the time spent waiting for them, per engine.
+
+    Always on: one lock and a few additions per checkout. The size, in-use
+    and overflow gauges are read from the pool itself when rendered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, PoolStats] = {}
+
+    def register(self, name: str, pool):
+        """Track `pool` under `name`; a recreated pool (engine.dispose()) keeps the counters"""
+        with self._lock:
+            stats = self._pools.get(name)
+            if stats is None:
+                self._pools[name] = PoolStats(pool)
+            else:
+                stats.pool = pool
+
+    def observe_checkout(self, name: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            stats = self._pools.get(name)
+            if stats is None:
+                return
+            if timed_out:
+                stats.timeouts += 1
+                return
+            stats.checkouts += 1
+            stats.wait_sum += seconds
+            stats.wait_max = max(stats.wait_max, seconds)
+            for i, bound in enumerate(POOL_WAIT_BUCKETS):
+                if seconds <= bound:
+                    stats.wait_buckets[i] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {
+                    "size": _pool_gauge(stats.pool, "size"),
+                    "checked_out": _pool_gauge(stats.pool, "checkedout"),
+                    "overflow": _pool_gauge(stats.pool, "overflow"),
+                    "checkouts": stats.checkouts,
+                    "timeouts": stats.timeouts,
+                    "avg_wait_ms": stats.wait_sum / stats.checkouts * 1000 if stats.checkouts else 0.0,
+                    "max_wait_ms": stats.wait_max * 1000,
+                }
+                for name, stats in self._pools.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            pools = sorted(self._pools.items())
+            gauges = (
+                ("bizzy_db_pool_size", "Connections the pool keeps open.", "size"),
+                ("bizzy_db_pool_checked_out", "Connections currently checked out.", "checkedout"),
+                ("bizzy_db_pool_overflow", "Connections open beyond the pool size.", "overflow"),
+            )
+            for metric, help_text, attribute in gauges:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+                lines += [f'{metric}{{pool="{name}"}} {_pool_gauge(stats.pool, attribute)}' for name, stats in pools]
+
+            lines += [
+                "# HELP bizzy_db_pool_checkout_timeouts_total Checkouts that gave up after the pool timeout.",
+                "# TYPE bizzy_db_pool_checkout_timeouts_total counter",
+            ]
+            lines += [f'bizzy_db_pool_checkout_timeouts_total{{pool="{name}"}} {stats.timeouts}' for name, stats in pools]
+
+            lines += [
+                "# HELP bizzy_db_pool_checkout_wait_seconds Time spent waiting for a connection.",
+                "# TYPE bizzy_db_pool_checkout_wait_seconds histogram",
+            ]
+            for name, stats in pools:
+                for bound, count in zip(POOL_WAIT_BUCKETS, stats.wait_buckets):
+                    lines.append(f'bizzy_db_pool_checkout_wait_seconds_bucket{{pool="{name}",le="{bound}"}} {count}')
+                lines.append(f'bizzy_db_pool_checkout_wait_seconds_bucket{{pool="{name}",le="+Inf"}} {stats.checkouts}')
+                lines.append(f'bizzy_db_pool_checkout_wait_seconds_sum{{pool="{name}"}} {stats.wait_sum:.6f}')
+                lines.append(f'bizzy_db_pool_checkout_wait_seconds_count{{pool="{name}"}} {stats.checkouts}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            for stats in self._pools.values():
+                stats.__init__(stats.pool)
+
+def _pool_gauge(pool, attribute: str) -> int:
+    """
+    QueuePool gauges; pools without them (SQLite's in-memory pools) report 0.
+    QueuePool.overflow() counts down from -pool_size until the pool is full,
+    so it is clamped at 0.
+    """
+    gauge = getattr(pool, attribute, None)
+    return max(gauge(), 0) if callable(gauge) else 0
+
+# Global pool metrics instance
+pool_metrics = PoolMetrics()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        context._profiling_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = getattr(context, "_profiling_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+def instrument_engine(engine):
+    """Time every statement the engine runs on behalf of a profiled request"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and SQL usage per route template.
+
+    Routes are keyed by their path template (/api/sales/{sale_id}), so path
+    parameters do not explode the number of series.
+    """
+
+    def __init__(self, app, server_timing: bool = PROFILING_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    header = (
+                        f'app;dur={elapsed_ms:.1f}, '
+                        f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.statements} queries"'
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            route = scope.get("route")
+            metrics_registry.observe(
+                scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status_code,
+                time.perf_counter() - started, profile
+            )
+
+def install(app, *engines):
+    """Enable request profiling when PROFILING_ENABLED is set; a no-op otherwise"""
+    if not PROFILING_ENABLED:
+        return
+    for engine in engines:
+        instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+    logger.info("Request profiling enabled (Server-Timing: %s)", PROFILING_SERVER_TIMING)
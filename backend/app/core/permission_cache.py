@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# How long a user's identity and permissions are trusted before reloading them.
+# Invalidation below is process-local, so this also bounds staleness across workers.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+
+class PermissionCache:
+    """
+    Short-lived, process-local cache of authenticated user contexts.
+
+    Entries are keyed by user id and hold the user fields `get_current_user`
+    returns plus the flattened permission names. An email index maps the JWT
+    subject to the user id. Anything that changes a user's roles, permissions
+    or active flag must call `invalidate_user` (or `clear` for role-wide changes).
+
+    For claims-based tokens it also remembers each user's current role version
+    and active flag, which is all that is needed to reject outdated tokens.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[float, dict]] = {}
+        self._email_index: Dict[str, int] = {}
+        self._role_versions: Dict[int, Tuple[float, int, bool]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        with self._lock:
+            user_id = self._email_index.get(email)
+            entry = self._entries.get(user_id) if user_id is not None else None
+            if entry is None or entry[0] < self.clock():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_context: dict):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[user_context["id"]] = (self.clock() + self.ttl_seconds, user_context)
+            self._email_index[user_context["email"]] = user_context["id"]
+
+    def get_role_version(self, user_id: int) -> Optional[Tuple[int, bool]]:
+        """(role_version, is_active) for the user, or None when unknown or expired"""
+        with self._lock:
+            entry = self._role_versions.get(user_id)
+            if entry is None or entry[0] < self.clock():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put_role_version(self, user_id: int, role_version: int, is_active: bool):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._role_versions[user_id] = (self.clock() + self.ttl_seconds, role_version, is_active)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._role_versions.pop(user_id, None)
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._email_index.pop(entry[1]["email"], None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._email_index.clear()
+            self._role_versions.clear()
+
+# Global cache instance
+permission_cache = PermissionCache()
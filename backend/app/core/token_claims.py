@@ -0,0 +1,63 @@
+import os
+import threading
+from typing import Dict, Iterable, List
+from sqlalchemy.orm import Session
+from app.models.permission import Permission
+
+# "db": permissions are loaded from the database (through the permission cache).
+# "claims": permissions are read from the token; only the role version is checked.
+AUTH_TOKEN_MODE = os.getenv("AUTH_TOKEN_MODE", "db").lower()
+
+class PermissionCatalog:
+    """
+    Process-wide map between permission ids and names.
+
+    Tokens carry permissions as a bitset where bit N is the permission with
+    id N, so the catalog is what turns those bits back into names. The
+    permissions table is seed data; the catalog reloads itself when it
+    meets an id it does not know.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names_by_id: Dict[int, str] = {}
+
+    def load(self, db: Session):
+        rows = db.query(Permission.id, Permission.name).all()
+        with self._lock:
+            self._names_by_id = {permission_id: name for permission_id, name in rows}
+
+    def names(self, db: Session, permission_ids: Iterable[int]) -> List[str]:
+        permission_ids = list(permission_ids)
+        if any(permission_id not in self._names_by_id for permission_id in permission_ids):
+            self.load(db)
+        names_by_id = self._names_by_id
+        return [names_by_id[permission_id] for permission_id in permission_ids if permission_id in names_by_id]
+
+permission_catalog = PermissionCatalog()
+
+def encode_permission_bits(permission_ids: Iterable[int]) -> str:
+    """Pack permission ids into a hex bitset"""
+    bits = 0
+    for permission_id in permission_ids:
+        bits |= 1 << permission_id
+    return format(bits, "x")
+
+def decode_permission_bits(encoded: str) -> List[int]:
+    """Unpack a hex bitset into permission ids"""
+    bits = int(encoded, 16) if encoded else 0
+    permission_ids = []
+    position = 0
+    while bits:
+        if bits & 1:
+            permission_ids.append(position)
+        bits >>= 1
+        position += 1
+    return permission_ids
+
+def is_claims_token(payload: dict) -> bool:
+    return all(key in payload for key in ("uid", "rv", "perms"))
+
+def permission_ids_for_user(user) -> List[int]:
+    """Every permission id granted by the user's roles"""
+    return sorted({permission.id for role in user.roles for permission in role.permissions})
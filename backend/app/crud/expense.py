@@ -2,9 +2,12 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+from app.core.dashboard_cache import dashboard_cache
 from app.models.expense import Expense
 from app.schemas.expense_schema import ExpenseCreate
 from app.crud.business import get_business_by_user_id
+from app.services.activity_service import ActivityService
+from app.services.event_bus import event_bus
 from app.services.sequence_service import SequenceService
 from app.models.expense import ExpenseCategory
 from app.schemas.expense_schema import ExpenseCategoryCreate
@@ -45,6 +48,9 @@ def create_expense(db: Session, expense_data, user_id: int, usd_amount: float, e
             business_expense_number=business_expense_number
         )
         db.add(db_expense)
+        db.flush()
+        dashboard_cache.mark_changed(db, db_expense.business_id)
+        event_bus.publish(db, db_expense.business_id, "expense", ActivityService.expense_activity(db_expense, datetime.now()))
         db.commit()
         db.refresh(db_expense)
         return db_expense
@@ -84,6 +90,7 @@ def delete_expense(db: Session, expense_id: int):
     expense = db.query(Expense).filter(Expense.id == expense_id).first()
     if expense:
         db.delete(expense)
+        dashboard_cache.mark_changed(db, expense.business_id)
         db.commit()
     return expense
 
@@ -1,11 +1,13 @@
 # ~/Bizzy_store/backend/app/crud/inventory.py - COMPLETE FIXED VERSION
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from app.models.product import Product
 from app.models.inventory import InventoryHistory
 from app.schemas.inventory_schema import InventoryAdjustment
 from datetime import datetime
-from app.services.sequence_service import SequenceService
+from typing import Optional
+from app.services.inventory_ledger import InventoryLedger
+from app.utils.pagination import keyset_paginate
 
 def get_next_business_inventory_number(db: Session, business_id: int) -> int:
     """Get the next virtual inventory number for a business"""
@@ -15,8 +17,9 @@ def get_next_business_inventory_number(db: Session, business_id: int) -> int:
     ).order_by(InventoryHistory.business_inventory_number.desc()).first()
     return (last_record.business_inventory_number + 1) if last_record else 1
 
-def get_inventory_history(db: Session, product_id: int = None, skip: int = 0, limit: int = 100, business_id: int = None):
-    """Get inventory history, optionally filtered by product and business"""
+def get_inventory_history(db: Session, product_id: int = None, skip: int = 0, limit: int = 100, business_id: int = None,
+                          cursor: Optional[str] = None):
+    """Get inventory history, optionally filtered by product and business. Pass `cursor` for keyset paging"""
     query = db.query(
         InventoryHistory,
         Product.name.label('product_name')
@@ -28,7 +31,7 @@ def get_inventory_history(db: Session, product_id: int = None, skip: int = 0, li
         query = query.filter(InventoryHistory.product_id == product_id)
 
     query = query.filter(InventoryHistory.changed_by.isnot(None))
-    results = query.order_by(InventoryHistory.changed_at.desc()).offset(skip).limit(limit).all()
+    results = keyset_paginate(query, (InventoryHistory.changed_at, InventoryHistory.id), cursor, skip, limit)
 
     history_with_names = []
     for history, product_name in results:
@@ -55,9 +58,6 @@ def adjust_inventory(db: Session, adjustment: InventoryAdjustment, user_id: int,
         if not product:
             return None
 
-        previous_quantity = product.stock_quantity
-        product.stock_quantity += adjustment.quantity_change
-
         # Determine change type
         if adjustment.quantity_change > 0:
             change_type = "restock"
@@ -65,26 +65,14 @@ def adjust_inventory(db: Session, adjustment: InventoryAdjustment, user_id: int,
         else:
             change_type = "adjustment"
 
-        # FIXED: Use SequenceService instead of get_next_business_inventory_number
-        business_inventory_number = SequenceService.get_next_number(db, business_id, 'inventory')
-
-        # Create history record WITH the sequence number
-        history = InventoryHistory(
-            product_id=product.id,
-            business_id=business_id,
-            business_inventory_number=business_inventory_number,
-            change_type=change_type,
-            quantity_change=adjustment.quantity_change,
-            previous_quantity=previous_quantity,
-            new_quantity=product.stock_quantity,
-            reason=adjustment.reason,
-            changed_by=user_id
+        # Conditional update: raises InsufficientStock instead of going below zero
+        InventoryLedger.move(
+            db, business_id, user_id, change_type, adjustment.reason,
+            [(product.id, adjustment.quantity_change)]
         )
 
-        db.add(history)
         db.commit()
         db.refresh(product)
-        db.refresh(history)
         return product
 
     except Exception as e:
@@ -93,13 +81,20 @@ def adjust_inventory(db: Session, adjustment: InventoryAdjustment, user_id: int,
 
 def get_low_stock_items(db: Session, threshold: int = None, business_id: int = None):
     """Get products with stock below minimum level, filtered by business_id if provided"""
-    query = db.query(Product).filter(Product.stock_quantity <= Product.min_stock_level)
+    query = db.query(Product).filter(Product.is_low_stock == True)
     if business_id is not None:
         query = query.filter(Product.business_id == business_id)
     if threshold:
         query = query.filter(Product.stock_quantity <= threshold)
     return query.all()
 
+def count_low_stock_items(db: Session, business_id: int) -> int:
+    """Number of the business's products at or below their minimum stock level"""
+    return db.query(func.count(Product.id)).filter(
+        Product.business_id == business_id,
+        Product.is_low_stock == True
+    ).scalar()
+
 def get_stock_levels(db: Session, skip: int = 0, limit: int = 100, business_id: int = None):
     """Get current stock levels for all products, filtered by business_id if provided"""
     query = db.query(Product)
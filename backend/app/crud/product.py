@@ -1,14 +1,20 @@
 # ~/Bizzy_store/backend/app/crud/product.py - COMPLETE FIXED VERSION
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
+from app.core.barcode_cache import barcode_cache
+from app.core.dashboard_cache import dashboard_cache
 from typing import List, Optional
-import asyncio
 from app.models.product import Product
 from app.models.business import Business
 from app.models.user import User
 from app.schemas.product_schema import ProductCreate, ProductUpdate
 from app.services.currency_service import CurrencyService
 from app.services.sequence_service import SequenceService
+from app.services.inventory_ledger import InventoryLedger
+from app.utils.pagination import keyset_paginate
+import logging
+
+logger = logging.getLogger(__name__)
 
 def get_product(db: Session, product_id: int, business_id: int = None) -> Optional[Product]:
     """Get a single product by ID, filtered by business_id if provided"""
@@ -17,11 +23,13 @@ def get_product(db: Session, product_id: int, business_id: int = None) -> Option
         query = query.filter(Product.business_id == business_id)
     return query.first()
 
-def get_products(db: Session, skip: int = 0, limit: int = 100, business_id: int = None) -> List[Product]:
+def get_products(db: Session, skip: int = 0, limit: int = 100, business_id: int = None,
+                 cursor: Optional[str] = None) -> List[Product]:
+    """Products in creation order. Pass `cursor` for keyset paging instead of `skip`"""
     query = db.query(Product)
     if business_id is not None:
         query = query.filter(Product.business_id == business_id)
-    products = query.offset(skip).limit(limit).all()
+    products = keyset_paginate(query, (Product.id,), cursor, skip, limit, descending=False)
     return products
 
 def get_product_by_barcode(db: Session, barcode: str, business_id: int = None) -> Optional[Product]:
@@ -38,8 +46,12 @@ def get_business_by_user_id(db: Session, user_id: int) -> Optional[Business]:
         return user.business
     return None
 
-def create_product(db: Session, product_data: ProductCreate, user_id: int, business_id: int) -> Product:
-    """Create a new product with proper currency conversion - FIXED VERSION"""
+def create_product(db: Session, product_data: ProductCreate, user_id: int, business_id: int,
+                   exchange_rate: Optional[float] = None) -> Product:
+    """
+    Create a new product with proper currency conversion - FIXED VERSION.
+    `exchange_rate` (local → USD) may be resolved by the caller ahead of time.
+    """
     try:
         # Get the user's business to determine local currency
         business = get_business_by_user_id(db, user_id)
@@ -52,15 +64,14 @@ def create_product(db: Session, product_data: ProductCreate, user_id: int, busin
             local_currency = business.currency_code
 
         # Get the exchange rate for converting Local Currency -> USD
-        exchange_rate = 1.0
-        if local_currency != 'USD':
-            try:
-                usd_to_local_rate = asyncio.run(CurrencyService(db).get_latest_exchange_rate('USD', local_currency)) or 1.0
-                if usd_to_local_rate != 0:
-                    exchange_rate = 1.0 / usd_to_local_rate
-            except Exception as e:
-                print(f"Warning: Could not get exchange rate for {local_currency}->USD: {e}. Using 1.0")
-                exchange_rate = 1.0
+        if exchange_rate is None:
+            exchange_rate = 1.0
+            if local_currency != 'USD':
+                try:
+                    exchange_rate = CurrencyService(db).get_rate_to_usd_sync(local_currency) or 1.0
+                except Exception as e:
+                    logger.warning("Could not get exchange rate for %s->USD: %s. Using 1.0", local_currency, e, exc_info=True)
+                    exchange_rate = 1.0
 
         # User's input is the local price
         local_price = product_data.price
@@ -90,6 +101,8 @@ def create_product(db: Session, product_data: ProductCreate, user_id: int, busin
             business_product_number=business_product_number  # Use the sequence number we already obtained
         )
         db.add(db_product)
+        # A scan may have cached the barcode as unknown
+        barcode_cache.forget(db, business_id, db_product.barcode)
         db.commit()
         db.refresh(db_product)
         return db_product
@@ -98,25 +111,26 @@ def create_product(db: Session, product_data: ProductCreate, user_id: int, busin
         db.rollback()
         raise e
 
-def update_product(db: Session, product_id: int, product: ProductUpdate, user_id: int):
-    """Update existing product. If price or cost is updated, recaptures the currency context."""
+def update_product(db: Session, product_id: int, product: ProductUpdate, user_id: int,
+                   exchange_rate: Optional[float] = None):
+    """
+    Update existing product. If price or cost is updated, recaptures the currency context.
+    `exchange_rate` (local → USD) may be resolved by the caller ahead of time.
+    """
     db_product = get_product(db, product_id)
     if db_product:
         update_data = product.dict(exclude_unset=True)
         if 'price' in update_data or 'cost_price' in update_data:
             business = get_business_by_user_id(db, user_id)
-            currency_service = CurrencyService(db)
-            current_rate = 1.0
+            current_rate = exchange_rate if exchange_rate is not None else 1.0
             local_currency = 'USD'
             if business and business.currency_code:
                 local_currency = business.currency_code
-                if business.currency_code != 'USD':
+                if exchange_rate is None and business.currency_code != 'USD':
                     try:
-                        usd_to_local_rate = asyncio.run(currency_service.get_latest_exchange_rate('USD', local_currency)) or 1.0
-                        if usd_to_local_rate != 0:
-                            current_rate = 1.0 / usd_to_local_rate
+                        current_rate = CurrencyService(db).get_rate_to_usd_sync(local_currency) or 1.0
                     except Exception as e:
-                        print(f"Warning: Could not get exchange rate for update: {e}")
+                        logger.warning("Could not get exchange rate for %s->USD on update: %s. Using 1.0", local_currency, e, exc_info=True)
                         current_rate = 1.0
 
             if 'price' in update_data:
@@ -132,8 +146,11 @@ def update_product(db: Session, product_id: int, product: ProductUpdate, user_id
                     update_data['cost_price'] = new_local_cost_price * current_rate
                 update_data['original_cost_price'] = new_local_cost_price
 
+        # Scans cached the product under its old barcode; the new one may be cached as unknown
+        barcode_cache.forget(db, db_product.business_id, db_product.barcode)
         for field, value in update_data.items():
             setattr(db_product, field, value)
+        barcode_cache.forget(db, db_product.business_id, db_product.barcode)
         db.commit()
         db.refresh(db_product)
     return db_product
@@ -143,6 +160,7 @@ def delete_product(db: Session, product_id: int):
     db_product = get_product(db, product_id)
     if db_product:
         db.delete(db_product)
+        barcode_cache.forget(db, db_product.business_id, db_product.barcode)
         db.commit()
     return db_product
 
@@ -158,17 +176,22 @@ def search_products(db: Session, query: str, skip: int = 0, limit: int = 100, bu
 
 def get_low_stock_products(db: Session, business_id: int = None) -> List[Product]:
     """Get products that are below minimum stock level, filtered by business_id if provided"""
-    query = db.query(Product).filter(Product.stock_quantity <= Product.min_stock_level)
+    query = db.query(Product).filter(Product.is_low_stock == True)
     if business_id is not None:
         query = query.filter(Product.business_id == business_id)
     products = query.all()
     return products
 
 def update_product_stock(db: Session, product_id: int, quantity_change: int) -> Optional[Product]:
-    """Update product stock quantity"""
+    """Update product stock quantity; raises InsufficientStock rather than going below zero"""
     db_product = get_product(db, product_id)
     if db_product:
-        db_product.stock_quantity += quantity_change
-        db.commit()
+        try:
+            InventoryLedger.apply(db, {product_id: quantity_change})
+            dashboard_cache.mark_changed(db, db_product.business_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise e
         db.refresh(db_product)
     return db_product
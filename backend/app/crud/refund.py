@@ -1,13 +1,14 @@
 # ~/Bizzy_store/backend/app/crud/refund.py - COMPLETE FIXED VERSION
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
-from typing import List
+from typing import List, Optional
 from app.models.refund import Refund, RefundItem
 from app.models.sale import Sale, SaleItem
-from app.models.product import Product
-from app.models.inventory import InventoryHistory
 from app.schemas.refund_schema import RefundCreate
 from app.services.sequence_service import SequenceService
+from app.services.rollup_service import RollupService
+from app.services.inventory_ledger import InventoryLedger
+from app.utils.pagination import keyset_paginate
 
 def detect_and_fix_swapped_amounts(refund: Refund) -> Refund:
     """Detect and fix swapped currency amounts in refund records."""
@@ -80,6 +81,7 @@ def process_refund(db: Session, refund_data: RefundCreate, user_id: int):
         db.flush()
 
         # 4. PROCESS EACH REFUND ITEM
+        restock_entries = []
         for item_data in refund_items_to_create:
             sale_item_id = item_data["sale_item_id"]
             quantity_to_refund = item_data["quantity"]
@@ -96,32 +98,25 @@ def process_refund(db: Session, refund_data: RefundCreate, user_id: int):
             sale_item = sale_items_map[sale_item_id]
             sale_item.refunded_quantity += quantity_to_refund
 
-            # Restore product inventory
-            product = db.query(Product).filter(Product.id == sale_item.product_id).first()
-            if product:
-                previous_quantity = product.stock_quantity
-                product.stock_quantity += quantity_to_refund
-
-                # FIXED: Add business inventory numbering
-                inventory_history = InventoryHistory(
-                    product_id=product.id,
-                    business_id=business_id,
-                    business_inventory_number=SequenceService.get_next_number(db, business_id, 'inventory'),  # ADDED THIS LINE
-                    change_type="refund",
-                    quantity_change=quantity_to_refund,
-                    previous_quantity=previous_quantity,
-                    new_quantity=product.stock_quantity,
-                    reason=f"Refund #{business_refund_number} for Sale #{sale.business_sale_number}",
-                    changed_by=user_id
-                )
-                db.add(inventory_history)
+            restock_entries.append((sale_item.product_id, quantity_to_refund))
+
+        # Restore product inventory, with one history row per refunded item
+        InventoryLedger.move(
+            db, business_id, user_id, "refund",
+            f"Refund #{business_refund_number} for Sale #{sale.business_sale_number}", restock_entries
+        )
 
         # 5. Update sale payment_status if entire sale is refunded
         total_sale_refunded = all(
             (sale_item.refunded_quantity == sale_item.quantity)
             for sale_item in sale.sale_items
         )
+        payment_method = RollupService.primary_payment_method(sale)
+        RollupService.record_refund(db, db_refund, payment_method)
         if total_sale_refunded:
+            if sale.payment_status == "completed":
+                # The sale no longer counts towards completed sales for its day
+                RollupService.reverse_sale(db, sale, payment_method)
             sale.payment_status = "refunded"
 
         # SINGLE COMMIT for everything
@@ -136,34 +131,35 @@ def process_refund(db: Session, refund_data: RefundCreate, user_id: int):
         db.rollback()
         raise e
 
+def _refund_query(db: Session):
+    """Refunds with the sale number and items the Refund schema needs, loaded up front"""
+    return db.query(Refund).options(
+        joinedload(Refund.sale).load_only(Sale.id, Sale.business_sale_number),
+        selectinload(Refund.refund_items)
+    )
+
+def _attach_sale_number(refund: Refund) -> Refund:
+    if refund.sale:
+        refund.business_sale_number = refund.sale.business_sale_number
+    return detect_and_fix_swapped_amounts(refund)
+
 def get_refunds_by_sale(db: Session, sale_id: int, business_id: int = None):
     """Get all refunds for a specific sale and fix any swapped amounts"""
-    refunds = db.query(Refund).filter(Refund.sale_id == sale_id).all()
-    for refund in refunds:
-        sale = db.query(Sale).filter(Sale.id == refund.sale_id).first()
-        if sale:
-            refund.business_sale_number = sale.business_sale_number
-    return [detect_and_fix_swapped_amounts(refund) for refund in refunds]
+    refunds = _refund_query(db).filter(Refund.sale_id == sale_id).all()
+    return [_attach_sale_number(refund) for refund in refunds]
 
 def get_refund(db: Session, refund_id: int, business_id: int = None):
     """Get a specific refund by ID and fix any swapped amounts"""
-    refund = db.query(Refund).filter(Refund.id == refund_id).first()
+    refund = _refund_query(db).filter(Refund.id == refund_id).first()
     if refund:
-        sale = db.query(Sale).filter(Sale.id == refund.sale_id).first()
-        if sale:
-            refund.business_sale_number = sale.business_sale_number
-    return detect_and_fix_swapped_amounts(refund)
+        _attach_sale_number(refund)
+    return refund
 
-def get_refunds_by_business(db: Session, business_id: int, skip: int = 0, limit: int = 100):
-    """Get all refunds for a business - use stored numbering"""
-    refunds = db.query(Refund).filter(Refund.business_id == business_id)\
-        .order_by(Refund.created_at.desc())\
-        .offset(skip).limit(limit).all()
-    for refund in refunds:
-        sale = db.query(Sale).filter(Sale.id == refund.sale_id).first()
-        if sale:
-            refund.business_sale_number = sale.business_sale_number
-    return [detect_and_fix_swapped_amounts(refund) for refund in refunds]
+def get_refunds_by_business(db: Session, business_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    """Get all refunds for a business - use stored numbering. Pass `cursor` for keyset paging"""
+    query = _refund_query(db).filter(Refund.business_id == business_id)
+    refunds = keyset_paginate(query, (Refund.created_at, Refund.id), cursor, skip, limit)
+    return [_attach_sale_number(refund) for refund in refunds]
 
 def fix_existing_swapped_refunds(db: Session):
     """Fix all existing refunds in the database that have swapped amounts"""
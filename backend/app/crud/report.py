@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, extract, case, text, desc
 from datetime import date, datetime, timedelta
 from typing import List, Optional, Dict
@@ -12,6 +12,7 @@ from app.models.user import User
 from app.models.expense import Expense, ExpenseCategory
 from app.models.business import Business
 from app.models.refund import Refund, RefundItem
+from app.services.rollup_service import RollupService
 
 def get_sales_report(db: Session, start_date: date, end_date: date, business_id: Optional[int] = None) -> Dict:
     """Generate comprehensive sales report USING BOTH USD AND LOCAL CURRENCY AMOUNTS"""
@@ -24,49 +25,8 @@ def get_sales_report(db: Session, start_date: date, end_date: date, business_id:
     if business_id is not None:
         business_filter = Sale.business_id == business_id
 
-    # Sales summary - RETURNING BOTH USD AND LOCAL CURRENCY AMOUNTS
-    sales_data = db.query(
-        func.coalesce(func.sum(Sale.total_amount), 0).label('total_sales'),          # USD amount
-        func.coalesce(func.sum(Sale.original_amount), 0).label('total_sales_original'), # Local currency amount
-        func.coalesce(func.sum(Sale.tax_amount), 0).label('total_tax'),              # USD tax amount
-        func.count(Sale.id).label('total_transactions'),
-        func.coalesce(func.avg(Sale.total_amount), 0).label('avg_transaction')       # USD average
-    ).filter(
-        Sale.created_at >= start_dt,
-        Sale.created_at <= end_dt,
-        Sale.payment_status == 'completed',
-        business_filter  # ← CRITICAL SECURITY FIX: ADD BUSINESS FILTER
-    ).first()
-
-    # Get primary currency using a simpler approach
-    primary_currency_query = db.query(
-        Sale.original_currency,
-        func.count(Sale.id).label('count')
-    ).filter(
-        Sale.created_at >= start_dt,
-        Sale.created_at <= end_dt,
-        Sale.payment_status == 'completed',
-        Sale.original_currency.isnot(None),
-        business_filter  # 🚨 CRITICAL FIX: ADD MISSING BUSINESS FILTER
-    ).group_by(Sale.original_currency)\
-     .order_by(desc(func.count(Sale.id)))\
-     .first()
-
-    primary_currency = primary_currency_query[0] if primary_currency_query else 'USD'
-
-    # Payment methods breakdown (unchanged - counts are currency-agnostic)
-    payment_methods_query = db.query(
-        Payment.payment_method,
-        func.count(Payment.id).label('count')
-    ).join(Sale, Sale.id == Payment.sale_id)\
-     .filter(
-        Sale.created_at >= start_dt,
-        Sale.created_at <= end_dt,
-        Payment.status == 'completed',
-        business_filter  # ← CRITICAL SECURITY FIX: ADD BUSINESS FILTER
-     ).group_by(Payment.payment_method).all()
-
-    payment_methods = {pmt[0]: pmt[1] for pmt in payment_methods_query}
+    # Sales summary, payment methods and primary currency from the daily rollup
+    summary = RollupService.sales_summary(db, start_date, end_date, business_id)
 
     # Top products - USING BOTH USD AND LOCAL CURRENCY AMOUNTS
     top_products = db.query(
@@ -88,33 +48,12 @@ def get_sales_report(db: Session, start_date: date, end_date: date, business_id:
      .order_by(desc(func.sum(SaleItem.subtotal)))\
      .limit(10).all()
 
-    # Sales trends (daily) - USING BOTH USD AND LOCAL CURRENCY AMOUNTS
-    sales_trends = db.query(
-        func.date(Sale.created_at).label('sale_date'),
-        func.coalesce(func.sum(Sale.total_amount), 0).label('daily_sales'),          # USD daily sales
-        func.coalesce(func.sum(Sale.original_amount), 0).label('daily_sales_original'), # Local currency daily sales
-        func.count(Sale.id).label('transactions'),
-        func.coalesce(func.avg(Sale.total_amount), 0).label('avg_order_value')       # USD average order value
-    ).filter(
-        Sale.created_at >= start_dt,
-        Sale.created_at <= end_dt,
-        Sale.payment_status == 'completed',
-        business_filter  # 🚨 CRITICAL FIX: ADD MISSING BUSINESS FILTER
-    ).group_by(func.date(Sale.created_at))\
-     .order_by(func.date(Sale.created_at))\
-     .all()
+    # Sales trends (daily) from the rollup - at most one row per day
+    sales_trends = RollupService.daily_trends(db, start_date, end_date, business_id)
 
     # Format the response
     return {
-        "summary": {
-            "total_sales": float(sales_data.total_sales),
-            "total_sales_original": float(sales_data.total_sales_original),
-            "total_tax": float(sales_data.total_tax),
-            "total_transactions": sales_data.total_transactions,
-            "average_transaction_value": float(sales_data.avg_transaction),
-            "payment_methods": payment_methods,
-            "primary_currency": primary_currency
-        },
+        "summary": summary,
         "top_products": [
             {
                 "product_id": product[0],
@@ -127,13 +66,7 @@ def get_sales_report(db: Session, start_date: date, end_date: date, business_id:
             for product in top_products
         ],
         "sales_trends": [
-            {
-                "date": str(trend[0]),
-                "daily_sales": float(trend[1]),
-                "daily_sales_original": float(trend[2]),
-                "transactions": trend[3],
-                "average_order_value": float(trend[4])
-            }
+            {**trend, "date": str(trend["date"])}
             for trend in sales_trends
         ],
         "date_range": {
@@ -154,7 +87,7 @@ def get_inventory_report(db: Session, business_id: Optional[int] = None) -> Dict
         func.coalesce(func.count(Product.id), 0).label('total_products'),  # FIX: Add coalesce for null values
         func.coalesce(func.sum(Product.stock_quantity * Product.price), 0).label('total_stock_value_usd'),  # USD
         func.coalesce(func.sum(Product.stock_quantity * Product.original_price), 0).label('total_stock_value_original'),  # Local
-        func.coalesce(func.sum(case((Product.stock_quantity <= Product.min_stock_level, 1), else_=0)), 0).label('low_stock_items'),  # FIX: Add coalesce
+        func.coalesce(func.sum(case((Product.is_low_stock == True, 1), else_=0)), 0).label('low_stock_items'),  # FIX: Add coalesce
         func.coalesce(func.sum(case((Product.stock_quantity == 0, 1), else_=0)), 0).label('out_of_stock_items')  # FIX: Add coalesce
     ).filter(
         business_filter  # ← CRITICAL SECURITY FIX: ADD BUSINESS FILTER
@@ -192,9 +125,11 @@ def get_inventory_report(db: Session, business_id: Optional[int] = None) -> Dict
      ).order_by(desc(InventoryHistory.changed_at))\
      .limit(50).all()
 
-    # Low stock alerts (unchanged) - WITH BUSINESS FILTER
-    low_stock_alerts = db.query(Product).filter(
-        Product.stock_quantity <= Product.min_stock_level,
+    # Low stock alerts - flagged rows only, through the partial index
+    low_stock_alerts = db.query(
+        Product.id, Product.name, Product.stock_quantity, Product.min_stock_level
+    ).filter(
+        Product.is_low_stock == True,
         business_filter  # ← CRITICAL SECURITY FIX: ADD BUSINESS FILTER
     ).all()
 
@@ -278,17 +213,36 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
         refund_business_filter = True
 
     # [KEEP ALL EXISTING SALES CALCULATIONS...]
-    # Fetch sales data
+    # Fetch sales data. Unlike the sales report this does not read the daily
+    # rollup: COGS here is valued at current product cost, which the rollup
+    # freezes at the time of sale, and the average exchange rate needs the USD
+    # revenue of only the sales that carry a local amount.
+    # Line-item COGS is aggregated per sale first and joined back on sale id, so
+    # every sale contributes its totals exactly once however many lines it has
+    item_costs = db.query(
+        SaleItem.sale_id.label('sale_id'),
+        func.sum(SaleItem.quantity * Product.cost_price).label('cogs_usd'),
+        func.sum(SaleItem.quantity * Product.original_cost_price).label('cogs_original')
+    ).join(Sale, Sale.id == SaleItem.sale_id)\
+     .join(Product, Product.id == SaleItem.product_id)\
+     .filter(
+        Sale.created_at >= start_dt,
+        Sale.created_at <= end_dt,
+        Sale.payment_status == 'completed',
+        business_filter
+     ).group_by(SaleItem.sale_id).subquery()
+
     sales_data = db.query(
         func.coalesce(func.sum(Sale.total_amount), 0).label('total_revenue_usd'),
         func.coalesce(func.sum(Sale.original_amount), 0).label('total_revenue_original'),
         func.coalesce(func.sum(Sale.tax_amount), 0).label('total_tax_usd'),
         func.coalesce(func.sum(Sale.tax_amount / Sale.exchange_rate_at_sale), 0).label('tax_collected_original'),
-        func.coalesce(func.sum(SaleItem.quantity * Product.cost_price), 0).label('cogs_usd'),
-        func.coalesce(func.sum(SaleItem.quantity * Product.original_cost_price), 0).label('cogs_original'),
-        func.count(Sale.id).label('total_transactions')
-    ).join(SaleItem, SaleItem.sale_id == Sale.id)\
-     .join(Product, Product.id == SaleItem.product_id)\
+        func.coalesce(func.sum(item_costs.c.cogs_usd), 0).label('cogs_usd'),
+        func.coalesce(func.sum(item_costs.c.cogs_original), 0).label('cogs_original'),
+        func.count(Sale.id).label('total_transactions'),
+        # USD total of the sales that carry a local amount, for the average exchange rate
+        func.coalesce(func.sum(case((Sale.original_amount.isnot(None), Sale.total_amount), else_=0)), 0).label('rated_revenue_usd')
+    ).outerjoin(item_costs, item_costs.c.sale_id == Sale.id)\
      .filter(
         Sale.created_at >= start_dt,
         Sale.created_at <= end_dt,
@@ -305,7 +259,8 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
             'tax_collected_original': 0,
             'cogs_usd': 0,
             'cogs_original': 0,
-            'total_transactions': 0
+            'total_transactions': 0,
+            'rated_revenue_usd': 0
         })()
 
     # Convert to float safely
@@ -324,21 +279,24 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
     gross_margin_original = (gross_profit_original / total_revenue_original * 100) if total_revenue_original > 0 else 0
 
     # [KEEP ALL EXISTING EXPENSE CALCULATIONS...]
-    # Operating expenses calculation
-    expenses_q = db.query(
-        func.coalesce(func.sum(Expense.amount), 0).label('total_expenses_usd'),
-        func.coalesce(func.sum(Expense.original_amount), 0).label('total_expenses_original'),
-    ).filter(
+    # Operating expenses per category - one grouped query feeds both the totals and the breakdown
+    expenses_by_category = db.query(
+        Expense.category_id,
+        ExpenseCategory.name.label('category_name'),
+        func.coalesce(func.sum(Expense.amount), 0).label('amount_usd'),
+        func.coalesce(func.sum(Expense.original_amount), 0).label('amount_original'),
+    ).outerjoin(ExpenseCategory, ExpenseCategory.id == Expense.category_id)\
+     .filter(
         Expense.date >= start_date,
         Expense.date <= end_date,
         expense_business_filter
-    ).first()
+     ).group_by(Expense.category_id, ExpenseCategory.name).all()
 
-    operating_expenses_usd = float(expenses_q.total_expenses_usd or 0) if expenses_q else 0
-    operating_expenses_original = float(expenses_q.total_expenses_original or 0) if expenses_q else 0
+    operating_expenses_usd = sum(float(row.amount_usd or 0) for row in expenses_by_category)
+    operating_expenses_original = sum(float(row.amount_original or 0) for row in expenses_by_category)
 
-    if expenses_q and expenses_q.total_expenses_original and float(expenses_q.total_expenses_original or 0) > 0:
-        operating_expenses_exchange_rate = float(expenses_q.total_expenses_usd or 0) / float(expenses_q.total_expenses_original or 1)
+    if operating_expenses_original > 0:
+        operating_expenses_exchange_rate = operating_expenses_usd / operating_expenses_original
     else:
         operating_expenses_exchange_rate = 1.0
 
@@ -347,21 +305,21 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
     net_profit_original = gross_profit_original - operating_expenses_original
 
     # 🆕 NEW: REFUND CALCULATIONS
-    
-    refunds_data = db.query(
-        func.coalesce(func.sum(Refund.total_amount), 0).label('total_refunds_usd'),
-        func.coalesce(func.sum(Refund.original_amount), 0).label('total_refunds_original'),
-        func.count(Refund.id).label('refund_count')
+    # Refunds with their sale, items and products in a single joined query;
+    # the totals and the breakdown are both built from these rows
+    refunds_breakdown = db.query(Refund).options(
+        joinedload(Refund.sale),
+        joinedload(Refund.refund_items).joinedload(RefundItem.sale_item).joinedload(SaleItem.product)
     ).filter(
         Refund.created_at >= start_dt,
         Refund.created_at <= end_dt,
         Refund.status == 'processed',
         refund_business_filter
-    ).first()
+    ).order_by(Refund.id).all()
 
-    total_refunds_usd = float(refunds_data.total_refunds_usd or 0) if refunds_data else 0
-    total_refunds_original = float(refunds_data.total_refunds_original or 0) if refunds_data else 0
-    refund_count = int(refunds_data.refund_count or 0) if refunds_data else 0
+    total_refunds_usd = sum(float(refund.total_amount or 0) for refund in refunds_breakdown)
+    total_refunds_original = sum(float(refund.original_amount or 0) for refund in refunds_breakdown)
+    refund_count = len(refunds_breakdown)
 
     # Calculate net revenue (sales minus refunds)
     net_revenue_usd = total_revenue_usd - total_refunds_usd
@@ -369,13 +327,6 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
     refund_rate = (refund_count / total_transactions * 100) if total_transactions > 0 else 0
 
     # 🆕 NEW: REFUND BREAKDOWN
-    refunds_breakdown = db.query(Refund).filter(
-        Refund.created_at >= start_dt,
-        Refund.created_at <= end_dt,
-        Refund.status == 'processed',
-        refund_business_filter
-    ).all()
-
     refund_details = []
     for refund in refunds_breakdown:
         # Get sale business number for display
@@ -446,17 +397,8 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
 
     # [KEEP ALL EXISTING CASH FLOW CALCULATIONS...]
     # Cash flow analysis
-    cash_in_usd_query = db.query(
-        func.coalesce(func.sum(Payment.amount), 0).label('total_amount_usd')
-    ).join(Sale, Sale.id == Payment.sale_id)\
-     .filter(
-        Sale.created_at >= start_dt,
-        Sale.created_at <= end_dt,
-        Payment.status == 'completed',
-        business_filter
-     ).first()
-
-    cash_in_original_query = db.query(
+    cash_in_query = db.query(
+        func.coalesce(func.sum(Payment.amount), 0).label('total_amount_usd'),
         func.coalesce(func.sum(Payment.amount / Sale.exchange_rate_at_sale), 0).label('total_amount_original')
     ).join(Sale, Sale.id == Payment.sale_id)\
      .filter(
@@ -466,8 +408,8 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
         business_filter
      ).first()
 
-    cash_in_usd = float(cash_in_usd_query.total_amount_usd or 0) if cash_in_usd_query else 0
-    cash_in_original = float(cash_in_original_query.total_amount_original or 0) if cash_in_original_query else 0
+    cash_in_usd = float(cash_in_query.total_amount_usd or 0) if cash_in_query else 0
+    cash_in_original = float(cash_in_query.total_amount_original or 0) if cash_in_query else 0
     exchange_rate_cash_in = cash_in_usd / cash_in_original if cash_in_original > 0 else 1.0
 
     cash_out_usd = cogs_usd + operating_expenses_usd
@@ -479,21 +421,15 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
     exchange_rate_net_cash_flow = net_cash_flow_usd / net_cash_flow_original if net_cash_flow_original > 0 else 1.0
 
     # [KEEP ALL EXISTING EXPENSE BREAKDOWN CALCULATIONS...]
-    # Expense breakdown (simplified)
-    expenses_in_period = db.query(Expense).filter(
-        Expense.date >= start_date,
-        Expense.date <= end_date,
-        expense_business_filter
-    ).all()
-
+    # Expense breakdown from the per-category totals above
     expense_breakdown_map = {}
-    for expense in expenses_in_period:
-        category_name = "Unknown"
-        if expense.category:
-            category_name = expense.category.name
-        elif expense.category_id:
-            category = db.query(ExpenseCategory).filter(ExpenseCategory.id == expense.category_id).first()
-            category_name = category.name if category else f"Category_{expense.category_id}"
+    for row in expenses_by_category:
+        if row.category_name:
+            category_name = row.category_name
+        elif row.category_id:
+            category_name = f"Category_{row.category_id}"
+        else:
+            category_name = "Unknown"
 
         if category_name not in expense_breakdown_map:
             expense_breakdown_map[category_name] = {
@@ -501,8 +437,8 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
                 'amount_original': 0,
             }
 
-        expense_breakdown_map[category_name]['amount_usd'] += expense.amount
-        expense_breakdown_map[category_name]['amount_original'] += expense.original_amount
+        expense_breakdown_map[category_name]['amount_usd'] += float(row.amount_usd or 0)
+        expense_breakdown_map[category_name]['amount_original'] += float(row.amount_original or 0)
 
     expense_breakdown_list = []
     total_expenses_correct = sum(data['amount_original'] for data in expense_breakdown_map.values())
@@ -517,20 +453,8 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
         })
 
     # Calculate average exchange rate
-    exchange_rate_data = db.query(
-        func.sum(Sale.original_amount).label('total_original'),
-        func.sum(Sale.total_amount).label('total_usd')
-    ).filter(
-        Sale.created_at >= start_dt,
-        Sale.created_at <= end_dt,
-        Sale.payment_status == 'completed',
-        Sale.original_amount.isnot(None),
-        business_filter
-    ).first()
-
-    if (exchange_rate_data and exchange_rate_data.total_original and
-        float(exchange_rate_data.total_original or 0) > 0):
-        avg_exchange_rate = float(exchange_rate_data.total_usd or 0) / float(exchange_rate_data.total_original or 1)
+    if total_revenue_original > 0:
+        avg_exchange_rate = float(sales_data.rated_revenue_usd or 0) / total_revenue_original
     else:
         avg_exchange_rate = 1.0
 
@@ -565,7 +489,8 @@ def get_financial_report(db: Session, start_date: date, end_date: date, business
             'refund_count': refund_count,
             'net_revenue': net_revenue_usd,
             'net_revenue_original': net_revenue_original,
-            'refund_rate': refund_rate
+            'refund_rate': refund_rate,
+            'total_transactions': total_transactions
         },
         'profitability': profitability_list,
         'cash_flow': {
@@ -3,9 +3,9 @@ from sqlalchemy.sql import func
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional, Dict, Any
 from app.models.supplier import Supplier, PurchaseOrder, PurchaseOrderItem
-from app.models.product import Product
-from app.models.inventory import InventoryHistory
 from app.schemas.supplier_schema import SupplierCreate, PurchaseOrderCreate, PurchaseOrder as PurchaseOrderSchema
+from app.services.inventory_ledger import InventoryLedger
+from app.utils.pagination import keyset_paginate
 import random
 import string
 
@@ -161,8 +161,9 @@ def _purchase_order_to_dict(po: PurchaseOrder) -> Dict[str, Any]:
 
     return po_dict
 
-def get_purchase_orders(db: Session, skip: int = 0, limit: int = 100, business_id: int = None):
-    """Get all purchase orders for a specific business"""
+def get_purchase_orders(db: Session, skip: int = 0, limit: int = 100, business_id: int = None,
+                        cursor: Optional[str] = None):
+    """Get all purchase orders for a specific business. Pass `cursor` for keyset paging"""
     query = db.query(PurchaseOrder).options(
         joinedload(PurchaseOrder.po_items)
     )
@@ -171,7 +172,7 @@ def get_purchase_orders(db: Session, skip: int = 0, limit: int = 100, business_i
     if business_id is not None:
         query = query.filter(PurchaseOrder.business_id == business_id)
     
-    pos = query.order_by(PurchaseOrder.created_at.desc()).offset(skip).limit(limit).all()
+    pos = keyset_paginate(query, (PurchaseOrder.created_at, PurchaseOrder.id), cursor, skip, limit)
     return [_purchase_order_to_dict(po) for po in pos]
 
 def get_purchase_order(db: Session, po_id: int, business_id: int = None):
@@ -228,33 +229,18 @@ def receive_po_items(db: Session, po_id: int, received_items: List[dict], user_i
         raise ValueError("Purchase order not found")
 
     try:
+        po_items = {item.id: item for item in po.po_items}
+        restock_entries = []
         for received_item in received_items:
-            po_item = db.query(PurchaseOrderItem).filter(
-                PurchaseOrderItem.id == received_item['item_id'],
-                PurchaseOrderItem.po_id == po_id
-            ).first()
+            po_item = po_items.get(received_item['item_id'])
 
             if po_item:
                 # Update received quantity
                 po_item.received_quantity = received_item['quantity']
+                restock_entries.append((po_item.product_id, received_item['quantity']))
 
-                # Update product inventory
-                product = db.query(Product).filter(Product.id == po_item.product_id).first()
-                if product:
-                    previous_quantity = product.stock_quantity
-                    product.stock_quantity += received_item['quantity']
-
-                    # Record inventory history
-                    inventory_history = InventoryHistory(
-                        product_id=product.id,
-                        change_type="restock",
-                        quantity_change=received_item['quantity'],
-                        previous_quantity=previous_quantity,
-                        new_quantity=product.stock_quantity,
-                        reason=f"PO #{po.po_number}",
-                        changed_by=user_id
-                    )
-                    db.add(inventory_history)
+        # Update product inventory and record history in one conditional update
+        InventoryLedger.move(db, po.business_id, user_id, "restock", f"PO #{po.po_number}", restock_entries)
 
         # Update PO status if all items received
         all_received = all(item.received_quantity >= item.quantity for item in po.po_items)
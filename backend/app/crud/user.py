@@ -7,9 +7,17 @@ from app.models.inventory import InventoryHistory
 from app.models.sale import Sale
 from app.models.business import Business
 from app.models import Permission, Role
+from app.core.permission_cache import permission_cache
+import logging
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+def bump_role_version(db_user: User):
+    """Mark the user's roles/active flag as changed so claims tokens issued before now are rejected"""
+    db_user.role_version = (db_user.role_version or 0) + 1
+
 def get_user(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
 
@@ -77,12 +85,9 @@ def update_user(db: Session, user_id: int, user_update):
     Update a user's information.
     Now accepts either a UserCreate object or a dictionary.
     """
-    print(f"DEBUG update_user: Starting update for user_id={user_id}")
-    print(f"DEBUG update_user: Received update data: {user_update}")
-    
     db_user = get_user(db, user_id)
     if not db_user:
-        print(f"DEBUG update_user: User with ID {user_id} not found!")
+        logger.debug("update_user: user %s not found", user_id)
         return None
 
     # Convert Pydantic model to dict, or use the dict if that's what was passed in
@@ -91,27 +96,29 @@ def update_user(db: Session, user_id: int, user_update):
     else:
         update_data = user_update
 
-    print(f"DEBUG update_user: Processed update data: {update_data}")
-
     # If password is being updated, hash it
     if 'password' in update_data:
         update_data['hashed_password'] = pwd_context.hash(update_data['password'])
         del update_data['password']
 
+    if 'is_active' in update_data:
+        bump_role_version(db_user)
+
     for field, value in update_data.items():
         if hasattr(db_user, field):
-            print(f"DEBUG update_user: Setting {field} = {value}")
             setattr(db_user, field, value)
         else:
-            print(f"DEBUG update_user: Field {field} does not exist on User model!")
+            logger.warning("update_user: User has no field %r, ignored", field)
 
     try:
         db.commit()
+        permission_cache.invalidate_user(user_id)
         db.refresh(db_user)
-        print(f"DEBUG update_user: Update successful for user_id={user_id}")
+        # Field names only: values can be password hashes or reset tokens
+        logger.debug("update_user: updated %s for user %s", sorted(update_data), user_id)
         return db_user
     except Exception as e:
-        print(f"DEBUG update_user: Error during commit: {e}")
+        logger.error("update_user: commit failed for user %s: %s", user_id, e)
         db.rollback()
         return None
 
@@ -133,6 +140,7 @@ def delete_user(db: Session, user_id: int):
     # db.query(Business).filter(Business.user_id == user_id).delete()
     db.delete(db_user)
     db.commit()
+    permission_cache.invalidate_user(user_id)
     return True
 
 def authenticate_user(db: Session, identifier: str, password: str):
@@ -158,7 +166,9 @@ def toggle_user_status(db: Session, user_id: int):
         return None
 
     db_user.is_active = not db_user.is_active
+    bump_role_version(db_user)
     db.commit()
+    permission_cache.invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
 
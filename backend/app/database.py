@@ -1,18 +1,182 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from app.models.base import Base
+from app.core.metrics import pool_metrics
 from dotenv import load_dotenv  # ← ADD THIS IMPORT
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()  # ← ADD THIS LINE
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")  # ← UPDATE THIS LINE
+# Optional read replica; read sessions use the primary when unset
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL")
+# Read from the primary while the replica is further behind than this (0 disables the check)
+DATABASE_READ_MAX_LAG_SECONDS = float(os.getenv("DATABASE_READ_MAX_LAG_SECONDS", "0"))
+# How often the replica's reachability and lag are re-checked
+DATABASE_READ_CHECK_INTERVAL = float(os.getenv("DATABASE_READ_CHECK_INTERVAL", "5"))
+
+# Connection pool - per worker process, so the database sees
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections at most
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Reopen connections older than this many seconds (-1 disables)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test each connection on checkout so ones dropped by the server are replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Postgres statement_timeout for every connection, in milliseconds (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection"""
+
+    metrics_name = None  # set by create_db_engine
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        pool_metrics.register(self.metrics_name, pool)
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_metrics.observe_checkout(self.metrics_name, time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.observe_checkout(self.metrics_name, time.perf_counter() - started)
+        return connection
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def create_db_engine(url: str, name: str = "primary", **overrides):
+    """
+    Engine with the pool settings above; keyword arguments override them.
+
+    In-memory SQLite keeps SQLAlchemy's default single-connection pool, and
+    statement_timeout is only sent to Postgres.
+    """
+    url_info = make_url(url)
+    backend = url_info.get_backend_name()
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    connect_args = {}
+
+    if backend == "sqlite":
+        connect_args["check_same_thread"] = False
+    if not (backend == "sqlite" and url_info.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    statement_timeout = overrides.pop("statement_timeout_ms", DB_STATEMENT_TIMEOUT_MS)
+    if backend == "postgresql" and statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={int(statement_timeout)}"
+
+    options.update(overrides)
+    engine = create_engine(url, connect_args=connect_args, **options)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics_name = name
+        pool_metrics.register(name, engine.pool)
+    return engine
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def replication_lag(connection) -> Optional[float]:
+    """
+    Seconds a Postgres standby is behind its primary; 0 when it has replayed
+    everything it received. None when the database cannot tell (SQLite, or
+    a server that is not in recovery).
+    """
+    if connection.dialect.name != "postgresql":
+        return None
+    return connection.execute(text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN NULL "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )).scalar()
+
+class ReplicaMonitor:
+    """
+    Whether reads may go to the replica: it must be reachable and, when
+    max_lag is set, no further behind than that. The answer is cached for
+    `interval` seconds so requests do not pay for the check.
+    """
+
+    def __init__(self, replica_engine, max_lag: float = DATABASE_READ_MAX_LAG_SECONDS,
+                 interval: float = DATABASE_READ_CHECK_INTERVAL):
+        self.engine = replica_engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._usable = False
+
+    def usable(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.interval:
+                self._checked_at = now
+                self._usable = self._check()
+            return self._usable
+
+    def _check(self) -> bool:
+        try:
+            with self.engine.connect() as connection:
+                lag = replication_lag(connection)
+        except Exception as e:
+            logger.warning("Read replica unavailable, reading from the primary: %s", e)
+            return False
+        if self.max_lag and lag is not None and float(lag) > self.max_lag:
+            logger.warning("Read replica is %.1fs behind (limit %.1fs), reading from the primary", lag, self.max_lag)
+            return False
+        return True
+
+class RoutingSession(Session):
+    """
+    Session for read-only endpoints. Queries go to the replica when the
+    monitor allows it, decided once per session so a request never mixes
+    the two; flushes and INSERT/UPDATE/DELETE statements always go to the
+    primary.
+    """
+
+    def __init__(self, *args, primary=None, replica=None, monitor: Optional[ReplicaMonitor] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+        use_replica = replica is not None and replica is not primary and (monitor is None or monitor.usable())
+        self.read_bind = replica if use_replica else primary
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            return self.primary
+        return self.read_bind
+
+# Read-only work can be pointed at a replica without touching the primary's pool
+read_engine = (
+    create_db_engine(SQLALCHEMY_READ_DATABASE_URL, name="replica")
+    if SQLALCHEMY_READ_DATABASE_URL else engine
+)
+replica_monitor = ReplicaMonitor(read_engine)
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False,
+    primary=engine, replica=read_engine, monitor=replica_monitor
+)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -21,6 +185,14 @@ def get_db():
     finally:
         db.close()
 
+# Dependency for read-only endpoints (reports, analytics, activity)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def init_db():
     # Base.metadata.create_all(bind=engine)
     pass
@@ -10,6 +10,14 @@ from app.routers import roles
 from app.routers import expense
 from app.routers import activity
 from app.routers import currency
+from app.routers import metrics
+from app.routers import report_jobs
+from app.core import metrics as request_metrics
+from app.database import engine, read_engine
+from app.core.logging_config import configure_logging
+
+# Queue-backed, level-gated logging (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
+configure_logging()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -27,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # keyset pagination cursor on list endpoints
 )
 
 app.include_router(users.router)
@@ -35,6 +44,7 @@ app.include_router(products.router)
 app.include_router(inventory.router)
 app.include_router(sales.router)
 app.include_router(reports.router)
+app.include_router(report_jobs.router)
 app.include_router(business.router)
 app.include_router(two_factor.router)
 app.include_router(customers.router)
@@ -46,6 +56,10 @@ app.include_router(expense.router)
 app.include_router(scanner.router)
 app.include_router(analytics.router)
 app.include_router(activity.router)
+app.include_router(metrics.router)
+
+# Per-route latency and SQL profiling (PROFILING_ENABLED); adds nothing when disabled
+request_metrics.install(app, engine, read_engine)
 
 # Add this function to print all routes on startup
 @app.on_event("startup")
@@ -13,9 +13,13 @@ from .permission import Permission, Role
 from .expense import Expense, ExpenseCategory
 from .currency import Currency, ExchangeRate
 from .analytics import BarcodeScanEvent
+from .sales_rollup import DailySalesRollup
+from .sale_ingest import SaleIngestKey
+from .report_job import ReportJob
 
 # This ensures all models are imported and their relationships can be resolved
 __all__ = ['Base', 'metadata', 'User', 'Product', 'InventoryHistory', 'Sale', 'SaleItem', 'Payment', 'Business', 'Customer', 'Refund',
-    'Supplier', 'PurchaseOrder', 'PurchaseOrderItem', 'Permission', 'Role', 'Expense', 'ExpenseCategory', 'Currency', 'ExchangeRate']
+    'Supplier', 'PurchaseOrder', 'PurchaseOrderItem', 'Permission', 'Role', 'Expense', 'ExpenseCategory', 'Currency', 'ExchangeRate', 'DailySalesRollup',
+    'SaleIngestKey', 'ReportJob']
 
 metadata = Base.metadata
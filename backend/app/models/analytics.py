@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class BarcodeScanEvent(Base):
     __tablename__ = "barcode_scan_events"
+    __table_args__ = (
+        Index('ix_barcode_scan_events_created_at', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     barcode = Column(String(50), index=True)
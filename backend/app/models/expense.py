@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -16,6 +16,9 @@ class ExpenseCategory(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index('ix_expenses_business_date', 'business_id', 'date'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     # The calculated USD amount for internal reporting
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class InventoryHistory(Base):
     __tablename__ = "inventory_history"
+    __table_args__ = (
+        Index('ix_inventory_history_business_changed_at', 'business_id', 'changed_at'),
+        Index('ix_inventory_history_product_changed_at', 'product_id', 'changed_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index('ix_payments_sale_id', 'sale_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sale_id = Column(Integer, ForeignKey("sales.id"))
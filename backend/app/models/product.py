@@ -1,11 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, event, false, inspect, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey  # ADD ForeignKey here
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index  # ADD ForeignKey here
 
 class Product(Base):
     __tablename__ = "products"  # Must match exactly
+    __table_args__ = (
+        # Barcode scans and catalog listings are always scoped to one business
+        Index('ix_products_business_barcode', 'business_id', 'barcode'),
+        # Low-stock lists and counts read only the flagged rows
+        Index('ix_products_business_low_stock', 'business_id',
+              postgresql_where=text("is_low_stock"),
+              sqlite_where=text("is_low_stock = 1")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), index=True)
@@ -15,6 +23,8 @@ class Product(Base):
     barcode = Column(String(50), unique=True)
     stock_quantity = Column(Integer, default=0)
     min_stock_level = Column(Integer, default=5)  # Minimum stock before alert
+    # stock_quantity <= min_stock_level; kept by InventoryLedger.apply and on ORM writes
+    is_low_stock = Column(Boolean, nullable=False, default=False, server_default=false())
     last_restocked = Column(DateTime, default=func.now())  # Last restock date
     created_at = Column(DateTime, default=func.now())  # Creation timestamp
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())  # Update timestamp
@@ -32,3 +42,20 @@ class Product(Base):
 
     # Add business-scoped numbering
     business_product_number = Column(Integer)  # Business-scoped product number
+
+def is_below_minimum(stock_quantity, min_stock_level) -> bool:
+    return min_stock_level is not None and (stock_quantity or 0) <= min_stock_level
+
+@event.listens_for(Product, "before_insert")
+def _flag_new_product(mapper, connection, product):
+    min_stock_level = product.min_stock_level
+    if min_stock_level is None:
+        min_stock_level = Product.__table__.c.min_stock_level.default.arg
+    product.is_low_stock = is_below_minimum(product.stock_quantity, min_stock_level)
+
+@event.listens_for(Product, "before_update")
+def _reflag_product(mapper, connection, product):
+    # Stock set through the ORM (edits, imports); the ledger sets the flag in its own UPDATE
+    state = inspect(product)
+    if state.attrs.stock_quantity.history.has_changes() or state.attrs.min_stock_level.history.has_changes():
+        product.is_low_stock = is_below_minimum(product.stock_quantity, product.min_stock_level)
@@ -1,10 +1,18 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class Refund(Base):
     __tablename__ = "refunds"
+    __table_args__ = (
+        # Refund listings and the processed-refund totals in reports
+        Index('ix_refunds_business_created_at', 'business_id', 'created_at'),
+        Index('ix_refunds_business_processed_created_at', 'business_id', 'created_at',
+              postgresql_where=text("status = 'processed'"),
+              sqlite_where=text("status = 'processed'")),
+        Index('ix_refunds_sale_id', 'sale_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sale_id = Column(Integer, ForeignKey("sales.id"))
@@ -27,6 +35,9 @@ class Refund(Base):
 
 class RefundItem(Base):
     __tablename__ = "refund_items"
+    __table_args__ = (
+        Index('ix_refund_items_refund_id', 'refund_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     refund_id = Column(Integer, ForeignKey("refunds.id"))
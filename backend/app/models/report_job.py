@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, JSON, ForeignKey, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class ReportJob(Base):
+    """
+    A report computed in the background. The table is also the queue: workers
+    claim 'queued' rows (or 'running' rows whose worker stopped heartbeating)
+    and store the result on the row. `cache_key` is business, report type,
+    date range and the data version the report was computed against.
+    """
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        Index('ix_report_jobs_status_id', 'status', 'id'),
+        Index('ix_report_jobs_business_cache_key', 'business_id', 'cache_key'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    report_type = Column(String(20), nullable=False)  # 'sales', 'financial', 'inventory'
+    start_date = Column(Date, nullable=True)
+    end_date = Column(Date, nullable=True)
+    cache_key = Column(String(200), nullable=False)
+
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100), nullable=True)
+    error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,10 +1,18 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Tenant-scoped listings and date-range reports
+        Index('ix_sales_business_created_at', 'business_id', 'created_at'),
+        # Reports only ever look at completed sales
+        Index('ix_sales_business_completed_created_at', 'business_id', 'created_at',
+              postgresql_where=text("payment_status = 'completed'"),
+              sqlite_where=text("payment_status = 'completed'")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -41,6 +49,10 @@ class Sale(Base):
 
 class SaleItem(Base):
     __tablename__ = "sale_items"
+    __table_args__ = (
+        Index('ix_sale_items_sale_id', 'sale_id'),
+        Index('ix_sale_items_product_id', 'product_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sale_id = Column(Integer, ForeignKey("sales.id"))
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from .base import Base
+
+class SaleIngestKey(Base):
+    """
+    Client-generated idempotency key of a sale uploaded through the bulk
+    ingestion endpoint. A key is claimed in the transaction that creates its
+    sale, so a till can resend a batch after a lost response without
+    selling twice.
+    """
+    __tablename__ = "sale_ingest_keys"
+    __table_args__ = (
+        UniqueConstraint('business_id', 'idempotency_key', name='uq_sale_ingest_keys_business_key'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
+    idempotency_key = Column(String(64), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=True)
+    created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from .base import Base
+
+class DailySalesRollup(Base):
+    """
+    Pre-aggregated sales facts: one row per business, day, currency and payment method.
+
+    Sale totals are attributed to the sale's primary (first) payment method; payment
+    counts and amounts are attributed to each payment's own method. Maintained in the
+    same transaction as checkout and refunds by RollupService.
+    """
+    __tablename__ = "daily_sales_rollup"
+    __table_args__ = (
+        UniqueConstraint('business_id', 'sale_date', 'currency_code', 'payment_method',
+                         name='uq_daily_sales_rollup_bucket'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
+    sale_date = Column(Date, nullable=False)
+    currency_code = Column(String(3), nullable=False)
+    payment_method = Column(String(50), nullable=False)
+
+    # Completed sales (USD and local currency)
+    sales_usd = Column(Float, nullable=False, default=0.0)
+    sales_original = Column(Float, nullable=False, default=0.0)
+    tax_usd = Column(Float, nullable=False, default=0.0)
+    tax_original = Column(Float, nullable=False, default=0.0)
+    transactions = Column(Integer, nullable=False, default=0)
+    items_sold = Column(Integer, nullable=False, default=0)
+    cogs_usd = Column(Float, nullable=False, default=0.0)
+    cogs_original = Column(Float, nullable=False, default=0.0)
+
+    # Completed payments
+    payment_count = Column(Integer, nullable=False, default=0)
+    payments_usd = Column(Float, nullable=False, default=0.0)
+    payments_original = Column(Float, nullable=False, default=0.0)
+
+    # Processed refunds, bucketed by refund date
+    refunds_usd = Column(Float, nullable=False, default=0.0)
+    refunds_original = Column(Float, nullable=False, default=0.0)
+    refund_count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
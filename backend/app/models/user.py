@@ -19,6 +19,8 @@ class User(Base):
     two_factor_enabled = Column(Boolean, default=False)
     two_factor_secret = Column(String(32), nullable=True)
     two_factor_backup_codes = Column(JSON, nullable=True)
+    # Bumped whenever roles or the active flag change; tokens carrying an older value are rejected
+    role_version = Column(Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     sales = relationship("Sale", back_populates="user")
@@ -1,28 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_read_db
 from app.core.auth import get_current_user
 from app.services.activity_service import ActivityService
+from app.services.event_bus import event_bus
 from app.schemas.activity_schema import ActivityResponse
 
 router = APIRouter(prefix="/api/activity", tags=["activity"])
 
+# Seconds between keep-alive comments on an idle stream
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Milliseconds a disconnected browser waits before reconnecting
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+
 @router.get("/recent", response_model=ActivityResponse)
 def get_recent_activities(
     hours: int = 24,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get recent business activities for the current user's business"""
     try:
-        # 🚨 CRITICAL FIX: Pass business_id to the service
-        activities = ActivityService.get_recent_activities(
-            db, 
-            business_id=current_user["business_id"],  # Pass the business_id from current_user
-            hours=hours, 
+        activities = ActivityService.get_feed(
+            db,
+            business_id=current_user["business_id"],
+            hours=hours,
             limit=limit
         )
         return {"activities": activities}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching activities: {str(e)}")
+
+@router.get("/stream")
+async def stream_activities(
+    request: Request,
+    last_event_id: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Server-sent events for the current user's business as they commit: sale,
+    inventory, expense and low_stock. A reconnect sending Last-Event-ID gets
+    what it missed, or a `reset` event when that is no longer available.
+    """
+    business_id = current_user["business_id"]
+
+    async def events():
+        subscription = event_bus.subscribe(business_id, last_event_id)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            if subscription.replay is None:
+                yield "event: reset\ndata: {}\n\n"
+            for bus_event in subscription.replay or ():
+                yield _format(bus_event)
+            while not await request.is_disconnected():
+                if subscription.overflowed:
+                    # Too far behind: the client reloads and reconnects
+                    yield "event: reset\ndata: {}\n\n"
+                    break
+                bus_event = await subscription.get(SSE_HEARTBEAT_SECONDS)
+                yield ": keep-alive\n\n" if bus_event is None else _format(bus_event)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _format(bus_event) -> str:
+    return f"id: {event_bus.event_id(bus_event)}\nevent: {bus_event.type}\ndata: {json.dumps(bus_event.data)}\n\n"
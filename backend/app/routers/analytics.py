@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_read_db
 from app.core.auth import get_current_user
 from app.core.permissions import requires_permission
 from app.services.analytics_service import analytics_service
@@ -15,7 +15,7 @@ router = APIRouter(
 
 @router.get("/daily-scans", dependencies=[Depends(requires_permission("report:view"))])
 async def get_daily_scan_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -40,7 +40,7 @@ async def get_daily_scan_stats(
 
 @router.get("/user-activity", dependencies=[Depends(requires_permission("report:view"))])
 async def get_user_activity_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
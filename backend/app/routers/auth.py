@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 import secrets
 from typing import Union
 
-from app.core.auth import create_access_token, verify_password, oauth2_scheme
+from app.core.auth import create_access_token, build_token_claims, verify_password, oauth2_scheme
 from app.crud.user import get_user_by_email_or_username, get_user_by_email, update_user
 from app.database import get_db
 from app.schemas.user_schema import Token, UserLogin, PasswordResetRequest, PasswordResetConfirm, TwoFactorRequiredResponse, TwoFactorVerifyRequest, UserCreate
@@ -13,6 +13,9 @@ from app.utils.email import send_password_reset_email
 from app.models.user import User
 from app.crud.business import create_business_with_owner
 from app.schemas.business_schema import BusinessCreate
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api",
@@ -43,7 +46,7 @@ def login_for_token(login_data: UserLogin, db: Session = Depends(get_db)):
         # We use a temporary token that is just the user's email for now.
         # Later, this should be a proper JWT with a short lifespan.
         
-        print(f"DEBUG: 2FA is enabled for user {user.email}. Requiring verification.")
+        logger.debug("2FA required for user %s", user.id)
         return TwoFactorRequiredResponse(
             requires_2fa=True,
             message="2FA verification required",
@@ -53,9 +56,7 @@ def login_for_token(login_data: UserLogin, db: Session = Depends(get_db)):
     # END NEW
 
     # NEW CODE: Include business_id in the token data
-    token_data = {"sub": user.email}
-    if user.business_id:
-        token_data["business_id"] = user.business_id
+    token_data = build_token_claims(user)
 
     access_token = create_access_token(data=token_data)
     return {"access_token": access_token, "token_type": "bearer"}
@@ -70,29 +71,21 @@ def login_oauth(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"}
         )
     # NEW CODE: Include business_id in the token data
-    token_data = {"sub": user.email}
-    if user.business_id:
-        token_data["business_id"] = user.business_id
+    token_data = build_token_claims(user)
 
     access_token = create_access_token(data=token_data)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/auth/forgot-password")
 async def forgot_password(request: PasswordResetRequest, db: Session = Depends(get_db)):
-    # DEBUG: Print the incoming request
-    print(f"DEBUG: Password reset request for email: {request.email}")
-    
     user = get_user_by_email(db, request.email)
 
     if not user:
-        print(f"DEBUG: User not found for email: {request.email}")
-        print(f"Password reset requested for non-existent email: {request.email}")
+        logger.info("Password reset requested for unknown email")
         return {"msg": "If the email is registered, a password reset link has been sent."}
 
-    print(f"DEBUG: Found user - ID: {user.id}, Email: {user.email}, Active: {user.is_active}")
-
     if not user.is_active:
-        print(f"DEBUG: User account is disabled, cannot reset password")
+        logger.info("Password reset refused for disabled user %s", user.id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Account is disabled. Please contact administrator."
@@ -101,27 +94,20 @@ async def forgot_password(request: PasswordResetRequest, db: Session = Depends(g
     reset_token = secrets.token_urlsafe(16)
     reset_token_expires = datetime.utcnow() + timedelta(hours=1)
 
-    print(f"DEBUG: Generated token: {reset_token}")
-    print(f"DEBUG: Token expires at: {reset_token_expires}")
-
     user_update_data = {
         "reset_token": reset_token,
         "reset_token_expires": reset_token_expires
     }
 
-    print(f"DEBUG: Sending update data to update_user: {user_update_data}")
-
     updated_user = update_user(db, user.id, user_update_data)
 
     if not updated_user:
-        print(f"DEBUG: update_user returned None - update failed!")
+        logger.error("Could not store password reset token for user %s", user.id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not process password reset request."
         )
 
-    print(f"DEBUG: User updated successfully.")
-
     email_sent = send_password_reset_email(
         email_to=user.email,
         username=user.username,
@@ -129,9 +115,9 @@ async def forgot_password(request: PasswordResetRequest, db: Session = Depends(g
     )
 
     if not email_sent:
-        print(f"ERROR: Failed to send password reset email to {user.email}")
+        logger.error("Failed to send password reset email to user %s", user.id)
     else:
-        print(f"DEBUG: Password reset email sent successfully to {user.email}")
+        logger.info("Password reset email sent to user %s", user.id)
 
     return {"msg": "If the email is registered, a password reset link has been sent."}
 
@@ -191,9 +177,7 @@ async def verify_2fa_login(verify_request: TwoFactorVerifyRequest, db: Session =
 
     # If code is valid, generate the final access token
     # NEW CODE: Include business_id in the token data
-    token_data = {"sub": user.email}
-    if user.business_id:
-        token_data["business_id"] = user.business_id
+    token_data = build_token_claims(user)
 
     access_token = create_access_token(data=token_data)
     return {"access_token": access_token, "token_type": "bearer"}
@@ -213,9 +197,7 @@ async def register_new_business(
         result = create_business_with_owner(db, business_data, owner_data)
 
         # Generate JWT token for the new owner
-        token_data = {"sub": result["owner"].email}
-        if result["owner"].business_id:
-            token_data["business_id"] = result["owner"].business_id
+        token_data = build_token_claims(result["owner"])
 
         access_token = create_access_token(data=token_data)
 
@@ -4,6 +4,7 @@ from typing import List
 from app.database import get_db
 from app.models.currency import Currency, ExchangeRate
 from app.services.currency_service import CurrencyService
+from app.services.rate_book import rate_book
 
 router = APIRouter(prefix="/api/currencies", tags=["currencies"])
 
@@ -13,6 +14,11 @@ async def get_currencies(db: Session = Depends(get_db)):
     currencies = db.query(Currency).filter(Currency.is_active == True).all()
     return currencies
 
+@router.get("/rates/metrics")
+async def get_rate_metrics():
+    """Exchange-rate refresher health: last refresh, staleness and failure counts"""
+    return rate_book.metrics()
+
 @router.get("/{currency_code}")
 async def get_currency(currency_code: str, db: Session = Depends(get_db)):
     """Get specific currency details"""
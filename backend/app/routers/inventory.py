@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.crud.inventory import (
     get_inventory_history,
@@ -9,6 +9,7 @@ from app.crud.inventory import (
     get_stock_levels
 )
 from app.crud.product import get_product
+from app.services.inventory_ledger import InsufficientStock
 from app.schemas.inventory_schema import (
     InventoryAdjustment,
     InventoryHistory,
@@ -18,6 +19,7 @@ from app.schemas.inventory_schema import (
 from app.database import get_db
 from app.core.auth import get_current_user
 from app.core.permissions import requires_permission
+from app.utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter(
     prefix="/api/inventory",
@@ -27,9 +29,11 @@ router = APIRouter(
 # Get inventory history - Requires inventory:read permission
 @router.get("/history", response_model=List[InventoryHistory], dependencies=[Depends(requires_permission("inventory:read"))])
 def read_inventory_history(
+    response: Response,
     product_id: int = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header; replaces skip"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -40,7 +44,12 @@ def read_inventory_history(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User not associated with a business"
         )
-    return get_inventory_history(db, product_id, skip, limit, business_id)
+    try:
+        history = get_inventory_history(db, product_id, skip, limit, business_id, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, history, limit, lambda entry: (entry['changed_at'], entry['id']))
+    return history
 
 # Adjust inventory - Requires inventory:update permission
 @router.post("/adjust", response_model=StockLevel, dependencies=[Depends(requires_permission("inventory:update"))])
@@ -71,7 +80,14 @@ def adjust_inventory_quantity(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient stock for this adjustment"
         )
-    updated_product = adjust_inventory(db, adjustment, current_user["id"], current_user.get("business_id"))
+    try:
+        updated_product = adjust_inventory(db, adjustment, current_user["id"], current_user.get("business_id"))
+    except InsufficientStock:
+        # Another writer took the stock between the check above and the update
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient stock for this adjustment"
+        )
     if not updated_product:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import PROFILING_ENABLED, metrics_registry, pool_metrics
+from app.core.permissions import requires_permission
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"]
+)
+
+# Per-route latency and SQL profile plus pool usage - Requires role:manage permission
+@router.get("/metrics", dependencies=[Depends(requires_permission("role:manage"))])
+def read_request_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    """
+    Request latency, SQL statement counts and DB time per route, and
+    connection pool usage.
+
+    Prometheus text by default; ?format=json adds the slowest statements seen
+    on each route. Pool metrics are always collected; the per-route section is
+    only filled when the API runs with PROFILING_ENABLED.
+    """
+    if format == "json":
+        return {
+            "profiling_enabled": PROFILING_ENABLED,
+            "routes": metrics_registry.snapshot() if PROFILING_ENABLED else [],
+            "pool": pool_metrics.snapshot()
+        }
+    routes = metrics_registry.render_prometheus() if PROFILING_ENABLED else ""
+    return PlainTextResponse(routes + pool_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# Connection pool usage - Requires role:manage permission
+@router.get("/metrics/pool", dependencies=[Depends(requires_permission("role:manage"))])
+def read_pool_metrics():
+    """
+    Size, connections in use, overflow, checkouts, timeouts and checkout
+    wait per database engine. Collected whether or not profiling is on.
+    """
+    return pool_metrics.snapshot()
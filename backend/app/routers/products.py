@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.crud.product import (
     get_product,
@@ -12,6 +13,8 @@ from app.schemas.product_schema import ProductCreate, ProductUpdate, Product
 from app.database import get_db
 from app.core.permissions import requires_permission
 from app.core.auth import get_current_user
+from app.services.currency_service import CurrencyService
+from app.utils.pagination import InvalidCursor, set_next_cursor
 from typing import List, Optional
 
 router = APIRouter(
@@ -21,13 +24,13 @@ router = APIRouter(
 
 # Create a product - Requires product:create permission
 @router.post("/", response_model=Product, dependencies=[Depends(requires_permission("product:create"))])
-def create_new_product(
+async def create_new_product(
     product: ProductCreate,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Create a product (requires product:create permission)"""
-    db_product = get_product_by_barcode(db, barcode=product.barcode)
+    db_product = await run_in_threadpool(get_product_by_barcode, db, barcode=product.barcode)
     if db_product:
         raise HTTPException(status_code=400, detail="Barcode already registered")
     
@@ -35,15 +38,23 @@ def create_new_product(
     business_id = current_user.get("business_id")
     if not business_id:
         raise HTTPException(status_code=400, detail="Your account is not associated with a business")
-    
+
+    # Resolve the rate on the event loop so a slow provider doesn't hold a worker thread
+    exchange_rate = await CurrencyService(db).get_business_rate_to_usd(business_id)
+
     # PASS BUSINESS_ID TO CREATE_PRODUCT
-    return create_product(db=db, product_data=product, user_id=current_user["id"], business_id=business_id)
+    return await run_in_threadpool(
+        create_product, db=db, product_data=product, user_id=current_user["id"],
+        business_id=business_id, exchange_rate=exchange_rate
+    )
 
 # List all products with optional barcode filtering - Requires product:read permission
 @router.get("/", response_model=List[Product], dependencies=[Depends(requires_permission("product:read"))])
 def read_products(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header; replaces skip"),
     barcode: Optional[str] = Query(None, description="Filter by barcode"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
@@ -57,7 +68,12 @@ def read_products(
         product = get_product_by_barcode(db, barcode=barcode, business_id=business_id)
         return [product] if product else []
     else:
-        return get_products(db, skip=skip, limit=limit, business_id=business_id)
+        try:
+            products = get_products(db, skip=skip, limit=limit, business_id=business_id, cursor=cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        set_next_cursor(response, products, limit, lambda product: (product.id,))
+        return products
 
 # Get product details - Requires product:read permission
 @router.get("/{product_id}", response_model=Product)
@@ -80,14 +96,20 @@ def read_product(
 
 # Update product details - Requires product:update permission
 @router.put("/{product_id}", response_model=Product, dependencies=[Depends(requires_permission("product:update"))])
-def update_existing_product(
+async def update_existing_product(
     product_id: int,
     product: ProductUpdate,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Update product details (requires product:update permission)"""
-    return update_product(db=db, product_id=product_id, product=product, user_id=current_user["id"])
+    exchange_rate = None
+    if product.dict(exclude_unset=True).keys() & {"price", "cost_price"}:
+        exchange_rate = await CurrencyService(db).get_business_rate_to_usd(current_user.get("business_id"))
+    return await run_in_threadpool(
+        update_product, db=db, product_id=product_id, product=product,
+        user_id=current_user["id"], exchange_rate=exchange_rate
+    )
 
 # Delete a product - Requires product:delete permission
 @router.delete("/{product_id}", dependencies=[Depends(requires_permission("product:delete"))])
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.crud.refund import process_refund, get_refunds_by_sale, get_refund, get_refunds_by_business
 from app.schemas.refund_schema import RefundCreate, Refund, SaleWithRefunds
 from app.database import get_db
 from app.core.auth import get_current_user
 from app.core.permissions import requires_permission
+from app.utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter(
     prefix="/api/refunds",
@@ -68,8 +69,10 @@ def read_refund(
 # Get all refunds for current user's business - Requires sale:read permission
 @router.get("/", response_model=List[Refund], dependencies=[Depends(requires_permission("sale:read"))])
 def read_refunds(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header; replaces skip"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -79,6 +82,10 @@ def read_refunds(
         raise HTTPException(status_code=400, detail="Business ID required")
 
     # We need to create this function in crud/refund.py
-    refunds = get_refunds_by_business(db, business_id, skip=skip, limit=limit)
+    try:
+        refunds = get_refunds_by_business(db, business_id, skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, refunds, limit, lambda refund: (refund.created_at, refund.id))
     return refunds
 
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.core.auth import get_current_user
+from app.core.permissions import requires_permission
+from app.database import SessionLocal, get_db, get_read_db
+from app.schemas.report_schema import ReportFormat, ReportJobCreate, ReportJobStatus
+from app.services.export_service import ExportService
+from app.services.report_job_service import ReportJobService
+
+router = APIRouter(
+    prefix="/api/reports/jobs",
+    tags=["reports"]
+)
+
+# Seconds between status checks while a client waits on a job
+WAIT_POLL_SECONDS = 0.5
+
+EXPORTERS = {
+    "sales": (ExportService.export_sales_to_csv, ExportService.export_sales_to_excel),
+    "financial": (ExportService.export_financial_to_csv, ExportService.export_financial_to_excel),
+    "inventory": (ExportService.export_inventory_to_csv, ExportService.export_inventory_to_excel),
+}
+
+def job_status(job, cached: bool = False) -> ReportJobStatus:
+    return ReportJobStatus.model_validate(job).model_copy(update={"cached": cached})
+
+# Queue a report - Requires report:view permission
+@router.post("/", response_model=ReportJobStatus, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(requires_permission("report:view"))])
+def submit_report_job(
+    spec: ReportJobCreate,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue a sales, financial or inventory report; a finished report for unchanged data is returned at once"""
+    end_date = spec.end_date or date.today()
+    start_date = spec.start_date or end_date - timedelta(days=30)
+    try:
+        job, cached = ReportJobService.submit(db, read_db, current_user.get("business_id"), current_user["id"],
+                                              spec.report_type, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return job_status(job, cached)
+
+# Poll a report job - Requires report:view permission
+@router.get("/{job_id}", response_model=ReportJobStatus, dependencies=[Depends(requires_permission("report:view"))])
+async def get_report_job(
+    job_id: int,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for the job to finish before answering"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Job status; with `wait`, the response is held until the job finishes or the wait runs out"""
+    business_id = current_user.get("business_id")
+    deadline = asyncio.get_running_loop().time() + wait
+    while True:
+        job = await asyncio.to_thread(_load_job, job_id, business_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report job not found")
+        if job.status in ("done", "failed") or asyncio.get_running_loop().time() >= deadline:
+            return job_status(job)
+        await asyncio.sleep(WAIT_POLL_SECONDS)
+
+# Download a finished report - Requires report:view permission
+@router.get("/{job_id}/result", dependencies=[Depends(requires_permission("report:view"))])
+def get_report_job_result(
+    job_id: int,
+    format: ReportFormat = Query(default=ReportFormat.JSON),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """The finished report as JSON, CSV or Excel"""
+    job = ReportJobService.get_job(db, job_id, current_user.get("business_id"))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report job not found")
+    if job.status != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Report job is {job.status}")
+
+    if format == ReportFormat.JSON:
+        return job.result
+    to_csv, to_excel = EXPORTERS[job.report_type]
+    filename = f"{job.report_type}_report_{job.start_date or date.today()}_{job.end_date or date.today()}"
+    return (to_excel if format == ReportFormat.EXCEL else to_csv)(job.result, filename)
+
+def _load_job(job_id: int, business_id: int):
+    db = SessionLocal()
+    try:
+        job = ReportJobService.get_job(db, job_id, business_id)
+        if job is not None:
+            db.expunge(job)
+        return job
+    finally:
+        db.close()
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import date, datetime, timedelta
 from typing import Optional
@@ -9,10 +10,13 @@ from app.models.sale import Sale, SaleItem
 from app.models.product import Product
 from app.schemas.report_schema import SalesTrend, TopProduct
 
-from app.database import get_db
+from app.database import ReadSessionLocal, get_read_db
 from app.core.auth import get_current_user
+from app.core.dashboard_cache import dashboard_cache
+from app.crud.inventory import count_low_stock_items
 from app.crud.report import get_sales_report, get_inventory_report, get_financial_report
-from app.services.export_service import ExportService
+from app.services.export_service import EXPORT_DATASETS, ExportService
+from app.services.rollup_service import RollupService
 from app.schemas.report_schema import ReportFormat, SalesReportResponse, InventoryReportResponse, FinancialReportResponse, FinancialReportResponseWithRefunds
 # ADD THIS IMPORT
 from app.core.permissions import requires_permission
@@ -28,7 +32,7 @@ def get_sales_analysis(
     start_date: date = Query(default=date.today() - timedelta(days=30)),
     end_date: date = Query(default=date.today()),
     format: ReportFormat = Query(default=ReportFormat.JSON),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get sales analysis report with multiple export options (requires report:view permission)"""
@@ -52,7 +56,7 @@ def get_sales_analysis(
 @router.get("/inventory", response_model=InventoryReportResponse, dependencies=[Depends(requires_permission("report:view"))])
 def get_inventory_analysis(
     format: ReportFormat = Query(default=ReportFormat.JSON),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get inventory analysis report (requires report:view permission)"""
@@ -65,8 +69,7 @@ def get_inventory_analysis(
             return ExportService.export_inventory_to_excel(report_data, filename)
         elif format == ReportFormat.CSV:
             filename = f"inventory_report_{date.today()}"
-            # Implement CSV export for inventory
-            raise HTTPException(status_code=501, detail="CSV export for inventory not implemented yet")
+            return ExportService.export_inventory_to_csv(report_data, filename)
         else:
             return report_data
 
@@ -80,7 +83,7 @@ def get_financial_analysis(
     start_date: date = Query(default=date.today() - timedelta(days=30)),
     end_date: date = Query(default=date.today()),
     format: ReportFormat = Query(default=ReportFormat.JSON),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get financial analysis report with refund breakdown (requires report:view permission)"""
@@ -95,49 +98,76 @@ def get_financial_analysis(
             return ExportService.export_financial_to_excel(report_data, filename)
         elif format == ReportFormat.CSV:
             filename = f"financial_report_{start_date}_{end_date}"
-            # Implement CSV export for financial
-            raise HTTPException(status_code=501, detail="CSV export for financial not implemented yet")
+            return ExportService.export_financial_to_csv(report_data, filename)
         else:
             return report_data
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Financial report generation failed: {str(e)}")
 
-# In the dashboard endpoint, update line ~120:
+# Stream a detail export - Requires report:view permission
+@router.get("/export/{dataset}", dependencies=[Depends(requires_permission("report:view"))])
+def export_dataset(
+    dataset: str,
+    start_date: date = Query(default=date.today() - timedelta(days=30)),
+    end_date: date = Query(default=date.today()),
+    format: ReportFormat = Query(default=ReportFormat.CSV),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream raw rows as CSV or XLSX (requires report:view permission).
+    Datasets: sales-lines, inventory-history, financial, refunds.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{dataset}'")
+    if format == ReportFormat.JSON:
+        raise HTTPException(status_code=400, detail="Exports are available as csv or excel")
+    fmt = "xlsx" if format == ReportFormat.EXCEL else "csv"
+    return ExportService.export_dataset(ReadSessionLocal, dataset, fmt, current_user.get('business_id'), start_date, end_date)
+
+def build_dashboard_metrics(db: Session, business_id: int, today: date) -> dict:
+    """Today's sales, low-stock alert count and the last 7 days' financials"""
+    sales_today = get_sales_report(db, today, today, business_id)
+    week_ago = today - timedelta(days=7)
+    financial = get_financial_report(db, week_ago, today, business_id)
+    return {
+        "sales_today": sales_today['summary'],
+        "inventory_alerts": count_low_stock_items(db, business_id),
+        "weekly_financial": financial['summary'],
+    }
+
 @router.get("/dashboard", dependencies=[Depends(requires_permission("report:view"))])
 def get_dashboard_metrics(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get dashboard metrics for real-time display (requires report:view permission)"""
+    """
+    Get dashboard metrics for real-time display (requires report:view permission).
+    Served from a per-business snapshot; a poll sending the snapshot's ETag in
+    If-None-Match gets 304 Not Modified while nothing has changed.
+    """
     try:
-        # Today's sales
+        business_id = current_user.get('business_id')
         today = date.today()
-        sales_today = get_sales_report(db, today, today, current_user.get('business_id'))
-
-        # Inventory status
-        inventory = get_inventory_report(db, current_user.get('business_id'))
-
-        # Financial snapshot (last 7 days) - ADD business_id parameter
-        week_ago = today - timedelta(days=7)
-        financial = get_financial_report(db, week_ago, today, current_user.get('business_id'))
-
-        return {
-            "sales_today": sales_today['summary'],
-            "inventory_alerts": len(inventory['low_stock_alerts']),
-            "weekly_financial": financial['summary'],
-            "timestamp": datetime.now()
-        }  # ← ADD MISSING CLOSING BRACE
-
+        snapshot = dashboard_cache.get(business_id, today.isoformat(),
+                                       lambda: build_dashboard_metrics(db, business_id, today))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dashboard metrics failed: {str(e)}")
 
+    headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    content = {**snapshot.data, "timestamp": snapshot.built_at}
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
 # Get sales trends data - Requires report:view permission
 @router.get("/sales/trends", response_model=List[SalesTrend], dependencies=[Depends(requires_permission("report:view"))])
 def get_sales_trends(
     start_date: date = Query(default=date.today() - timedelta(days=7)),
     end_date: date = Query(default=date.today()),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get sales trends data for charts (requires report:view permission)"""
@@ -149,34 +179,8 @@ def get_sales_trends(
                 detail="User not associated with a business"
             )
         
-        # Convert dates to datetime for proper comparison with Sale.created_at
-        start_dt = datetime.combine(start_date, datetime.min.time())
-        end_dt = datetime.combine(end_date, datetime.max.time())
-
-        # Query sales data grouped by date - INCLUDING ORIGINAL AMOUNTS
-        sales_data = db.query(
-            func.date(Sale.created_at).label('date'),
-            func.sum(Sale.total_amount).label('daily_sales'),
-            func.sum(Sale.original_amount).label('daily_sales_original'),
-            func.count(Sale.id).label('transactions'),
-            func.avg(Sale.total_amount).label('average_order_value')
-        ).filter(
-            Sale.created_at >= start_dt,
-            Sale.created_at <= end_dt,
-            Sale.payment_status == 'completed',
-            Sale.business_id == business_id  # ← CRITICAL SECURITY FIX
-        ).group_by(func.date(Sale.created_at)).order_by('date').all()
-
-        # Format the response
-        trends = []
-        for data in sales_data:
-            trends.append({
-                "date": data.date,
-                "daily_sales": float(data.daily_sales or 0),
-                "daily_sales_original": float(data.daily_sales_original or 0),
-                "transactions": data.transactions or 0,
-                "average_order_value": float(data.average_order_value or 0)
-            })
+        # Daily totals come straight from the rollup - one row per day, not per sale
+        trends = RollupService.daily_trends(db, start_date, end_date, business_id)
 
         return trends
 
@@ -189,7 +193,7 @@ def get_top_products(
     start_date: date = Query(default=date.today() - timedelta(days=30)),
     end_date: date = Query(default=date.today()),
     limit: int = Query(default=10, ge=1, le=50),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get top selling products (requires report:view permission)"""
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
 
 from app.crud.sale import create_sale, get_sale, get_sales, get_daily_sales_report
-from app.schemas.sale_schema import SaleCreate, Sale, SaleSummary, DailySalesReport
+from app.schemas.sale_schema import SaleCreate, Sale, SaleSummary, DailySalesReport, SaleBatchCreate, SaleBatchResponse
 from app.database import get_db
 from app.core.auth import get_current_user
+from app.services.currency_service import CurrencyService
+from app.services.sale_ingest_service import SaleIngestService
+from app.crud.business import get_business_by_user_id
 from app.schemas.refund_schema import SaleWithRefunds
 # ADD THIS IMPORT
 from app.core.permissions import requires_permission
+from app.utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter(
     prefix="/api/sales",
@@ -18,14 +23,16 @@ router = APIRouter(
 
 # Create a new sale - Requires sale:create permission
 @router.post("/", response_model=Sale, status_code=status.HTTP_201_CREATED, dependencies=[Depends(requires_permission("sale:create"))])
-def create_new_sale(
+async def create_new_sale(
     sale: SaleCreate,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Create a new sale transaction (requires sale:create permission)"""
     try:
-        return create_sale(db, sale, current_user["id"])
+        # Await the rate on the event loop; only the checkout itself takes a worker thread
+        exchange_rate = await CurrencyService(db).get_business_rate_to_usd(current_user.get("business_id"))
+        return await run_in_threadpool(create_sale, db, sale, current_user["id"], exchange_rate)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,10 +44,38 @@ def create_new_sale(
             detail="Failed to create sale"
         )
 
+# Upload sales queued by an offline till - Requires sale:create permission
+@router.post("/batch", response_model=SaleBatchResponse, dependencies=[Depends(requires_permission("sale:create"))])
+async def ingest_sale_batch(
+    batch: SaleBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Create up to 1000 queued sales, each identified by a client-generated idempotency key
+    (requires sale:create permission). Resending a key returns the sale it already created.
+    Sales that cannot be made are rejected one by one; the response has a result per sale.
+    """
+    business = await run_in_threadpool(get_business_by_user_id, db, current_user["id"])
+    if not business:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User business not found")
+
+    exchange_rate = await CurrencyService(db).get_business_rate_to_usd(business.id)
+    results = await run_in_threadpool(SaleIngestService.ingest, db, business, current_user["id"], batch.sales, exchange_rate)
+    return {
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "rejected": sum(1 for result in results if result["status"] == "rejected"),
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "results": results
+    }
+
 @router.get("/", response_model=List[SaleSummary], dependencies=[Depends(requires_permission("sale:read"))])
 def read_sales(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header; replaces skip"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     db: Session = Depends(get_db),
@@ -51,7 +86,11 @@ def read_sales(
     business_id = current_user.get("business_id")
 
     # UPDATE THIS LINE to pass business_id to get_sales
-    sales = get_sales(db, skip, limit, start_date, end_date, business_id)
+    try:
+        sales = get_sales(db, skip, limit, start_date, end_date, business_id, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, sales, limit, lambda sale: (sale.created_at, sale.id))
 
     # 🎯 FIX: Use the Sale objects directly (they already have virtual numbers from CRUD)
     # Convert to summary format while preserving virtual numbers
@@ -38,11 +38,12 @@ async def scan_barcode(
     if not clean_barcode:
         raise HTTPException(status_code=400, detail="Barcode must contain numbers")
 
-    logger.info(f"📦 Scanner endpoint called with barcode: {clean_barcode}")
+    logger.debug("Scan requested", extra={"event": "scanner.lookup", "barcode": clean_barcode, "user_id": current_user["id"]})
 
     try:
         # Pass the user_id to the barcode service for analytics tracking
-        result = await barcode_service.lookup_barcode(db, clean_barcode, current_user["id"])
+        result = await barcode_service.lookup_barcode(db, clean_barcode, current_user["id"],
+                                                      current_user.get("business_id"))
 
         if result:
             return {
@@ -58,5 +59,5 @@ async def scan_barcode(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in scanner endpoint: {e}")
+        logger.error("Unexpected error in scanner endpoint: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error during barcode scan")
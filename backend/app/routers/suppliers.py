@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.crud.supplier import (
     create_supplier, get_suppliers, get_supplier, update_supplier, delete_supplier,
@@ -11,6 +11,7 @@ from app.schemas.supplier_schema import Supplier, SupplierCreate, PurchaseOrder,
 from app.database import get_db
 from app.core.auth import get_current_user
 from app.core.permissions import requires_permission
+from app.utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter(
     prefix="/api/suppliers",
@@ -33,14 +34,20 @@ def create_new_purchase_order(
 
 @router.get("/purchase-orders", response_model=List[PurchaseOrder])
 def read_purchase_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header; replaces skip"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all purchase orders"""
     try:
-        return get_purchase_orders(db, skip, limit, business_id=current_user["business_id"])
+        purchase_orders = get_purchase_orders(db, skip, limit, business_id=current_user["business_id"], cursor=cursor)
+        set_next_cursor(response, purchase_orders, limit, lambda po: (po["created_at"], po["id"]))
+        return purchase_orders
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -86,7 +93,7 @@ def receive_purchase_order_items(
         raise HTTPException(status_code=404, detail="Purchase order not found")
     
     try:
-        return receive_po_items(db, po_id, received_items)
+        return receive_po_items(db, po_id, received_items, current_user["id"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
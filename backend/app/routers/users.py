@@ -15,11 +15,13 @@ from app.crud.user import (
     get_user_by_username,
     get_all_users,
     update_user,
-    delete_user
+    delete_user,
+    bump_role_version
 )
 from app.database import get_db
 from app.core.auth import get_current_user
 from app.core.permissions import requires_permission
+from app.core.permission_cache import permission_cache
 
 router = APIRouter(
     prefix="/api/users",
@@ -198,7 +200,9 @@ def toggle_user_status(
 
     # Toggle the status
     db_user.is_active = not db_user.is_active
+    bump_role_version(db_user)
     db.commit()
+    permission_cache.invalidate_user(user_id)
     db.refresh(db_user)
 
     return db_user
@@ -227,7 +231,9 @@ def assign_user_role(
     try:
         # Replace all of the user's current roles with the new one
         db_user.roles = [db_role]
+        bump_role_version(db_user)
         db.commit()
+        permission_cache.invalidate_user(user_id)
         db.refresh(db_user)
         return {"msg": f"Role '{db_role.name}' assigned successfully to user '{db_user.username}'"}
     except Exception as e:
@@ -14,6 +14,7 @@ class Activity(ActivityBase):
     exchange_rate: Optional[float] = None
     usd_amount: Optional[float] = None
     product_id: Optional[int] = None
+    business_inventory_number: Optional[int] = None
     user_id: Optional[int] = None
     username: Optional[str] = None
     created_at: Optional[datetime] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import date, datetime
 from enum import Enum
 
@@ -164,3 +164,24 @@ class FinancialReportResponse(BaseModel):
     cash_flow: CashFlowSummary
     expense_breakdown: List['ExpenseBreakdown']
     date_range: DateRange
+
+# Background report jobs
+class ReportJobCreate(BaseModel):
+    report_type: Literal["sales", "financial", "inventory"]
+    start_date: Optional[date] = None  # Defaults to 30 days ago; ignored for inventory
+    end_date: Optional[date] = None    # Defaults to today; ignored for inventory
+
+class ReportJobStatus(BaseModel):
+    id: int
+    report_type: str
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    status: str  # queued, running, done, failed
+    cached: bool = False  # True when a finished job for the same data was reused
+    attempts: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
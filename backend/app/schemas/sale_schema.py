@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 # Sale Item Schemas
@@ -62,6 +62,28 @@ class SaleCreate(SaleBase):
     payments: List[PaymentCreate]
     tax_rate: float = Field(0.0, ge=0, le=100)
 
+# Bulk ingestion from offline tills
+class QueuedSaleCreate(SaleCreate):
+    idempotency_key: str = Field(..., min_length=1, max_length=64)
+    occurred_at: Optional[datetime] = None  # When the till made the sale; defaults to upload time
+
+class SaleBatchCreate(BaseModel):
+    sales: List[QueuedSaleCreate] = Field(..., min_length=1, max_length=1000)
+
+class SaleBatchResult(BaseModel):
+    idempotency_key: str
+    status: Literal["created", "duplicate", "rejected", "failed"]
+    sale_id: Optional[int] = None
+    business_sale_number: Optional[int] = None
+    error: Optional[str] = None
+
+class SaleBatchResponse(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int
+    failed: int
+    results: List[SaleBatchResult]  # In request order
+
 class Sale(SaleBase):
     id: int
     # 🎯 ADD VIRTUAL BUSINESS NUMBERING
@@ -1,14 +1,82 @@
+import os
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from app.models.sale import Sale
 from app.models.inventory import InventoryHistory
 from app.models.expense import Expense
+from app.services.event_bus import EVENT_FEED_SIZE, event_bus
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Hours of history loaded into a business's activity feed
+ACTIVITY_FEED_HOURS = int(os.getenv("ACTIVITY_FEED_HOURS", "24"))
+
 class ActivityService:
+    @staticmethod
+    def get_feed(db: Session, business_id: int, hours: int = 24, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Recent activities from the business's in-memory feed, which commits keep
+        current; the feed is loaded from the database on first use, and windows
+        it cannot cover are queried directly
+        """
+        since = datetime.now() - timedelta(hours=hours)
+        if hours > ACTIVITY_FEED_HOURS:
+            return ActivityService.get_recent_activities(db, business_id, hours, limit)
+        activities = event_bus.recent(business_id, since, limit)
+        if activities is None:
+            event_bus.load_feed(business_id, ActivityService.get_recent_activities(
+                db, business_id, ACTIVITY_FEED_HOURS, EVENT_FEED_SIZE))
+            activities = event_bus.recent(business_id, since, limit)
+        if activities is None:
+            return ActivityService.get_recent_activities(db, business_id, hours, limit)
+        return activities
+
+    @staticmethod
+    def sale_activity(sale: Sale, timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+        # Use original_amount and original_currency for display
+        amount_display = sale.original_amount if sale.original_amount is not None else sale.total_amount
+        return {
+            'type': 'sale',
+            'id': sale.id,
+            'description': 'Sale completed',
+            'amount': float(amount_display),
+            'currency_code': sale.original_currency if sale.original_currency else 'UGX',
+            'exchange_rate': getattr(sale, 'exchange_rate_at_creation', None),
+            'usd_amount': float(sale.total_amount),  # This is already in USD
+            'timestamp': timestamp or sale.created_at,
+            'user_id': sale.user_id
+        }
+
+    @staticmethod
+    def inventory_activity(change: Dict[str, Any], timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+        """`change` holds inventory_history columns"""
+        return {
+            'type': 'inventory',
+            'id': change['id'],
+            'business_inventory_number': change.get('business_inventory_number'),
+            'description': f"Stock {change['change_type']}: {change['quantity_change']} units",
+            'product_id': change['product_id'],
+            'timestamp': timestamp or change.get('changed_at'),
+            'user_id': change.get('changed_by')
+        }
+
+    @staticmethod
+    def expense_activity(expense: Expense, timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+        return {
+            'type': 'expense',
+            'id': expense.id,
+            'description': f'Expense: {expense.description}',
+            # Use currency_code from expense for display
+            'amount': float(getattr(expense, 'original_amount', expense.amount)),
+            'currency_code': getattr(expense, 'currency_code', 'UGX'),
+            'exchange_rate': getattr(expense, 'exchange_rate', 1.0),
+            'usd_amount': float(expense.amount),  # This is already in USD
+            'timestamp': timestamp or expense.date,
+            'user_id': getattr(expense, 'created_by', None)
+        }
+
     @staticmethod
     def get_recent_activities(db: Session, business_id: int, hours: int = 24, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent sales, inventory changes, and expenses for a specific business"""
@@ -24,26 +92,7 @@ class ActivityService:
                     Sale.payment_status == 'completed'
                 ).order_by(Sale.created_at.desc()).limit(limit).all()
 
-                for sale in recent_sales:
-                    # Use original_amount and original_currency for display
-                    amount_display = sale.original_amount if sale.original_amount is not None else sale.total_amount
-                    currency_code = sale.original_currency if sale.original_currency else 'UGX'
-
-                    # Calculate USD equivalent using exchange rate if available
-                    usd_amount = sale.total_amount  # This is already in USD
-                    exchange_rate = sale.exchange_rate_at_creation if hasattr(sale, 'exchange_rate_at_creation') else None
-
-                    all_activities.append({
-                        'type': 'sale',
-                        'id': sale.id,
-                        'description': 'Sale completed',
-                        'amount': float(amount_display),
-                        'currency_code': currency_code,
-                        'exchange_rate': exchange_rate,
-                        'usd_amount': float(usd_amount),
-                        'timestamp': sale.created_at,
-                        'user_id': sale.user_id
-                    })
+                all_activities.extend(ActivityService.sale_activity(sale) for sale in recent_sales)
             except Exception as e:
                 logger.error(f"Error fetching sales activities: {e}")
 
@@ -54,15 +103,9 @@ class ActivityService:
                     InventoryHistory.changed_at >= since
                 ).order_by(InventoryHistory.changed_at.desc()).limit(limit).all()
 
-                for change in inventory_changes:
-                    all_activities.append({
-                        'type': 'inventory',
-                        'id': change.id,
-                        'description': f'Stock {change.change_type}: {change.quantity_change} units',
-                        'product_id': change.product_id,
-                        'timestamp': change.changed_at,
-                        'user_id': change.changed_by
-                    })
+                all_activities.extend(
+                    ActivityService.inventory_activity(change.__dict__) for change in inventory_changes
+                )
             except Exception as e:
                 logger.error(f"Error fetching inventory activities: {e}")
 
@@ -73,24 +116,7 @@ class ActivityService:
                     Expense.date >= since
                 ).order_by(Expense.date.desc()).limit(limit).all()
 
-                for expense in recent_expenses:
-                    # Use currency_code from expense for display
-                    currency_code = getattr(expense, 'currency_code', 'UGX')
-                    amount_display = getattr(expense, 'original_amount', expense.amount)
-                    exchange_rate = getattr(expense, 'exchange_rate', 1.0)
-                    usd_amount = expense.amount  # This is already in USD
-
-                    all_activities.append({
-                        'type': 'expense',
-                        'id': expense.id,
-                        'description': f'Expense: {expense.description}',
-                        'amount': float(amount_display),
-                        'currency_code': currency_code,
-                        'exchange_rate': exchange_rate,
-                        'usd_amount': float(usd_amount),
-                        'timestamp': expense.date,
-                        'user_id': getattr(expense, 'created_by', None)
-                    })
+                all_activities.extend(ActivityService.expense_activity(expense) for expense in recent_expenses)
             except Exception as e:
                 logger.error(f"Error fetching expense activities: {e}")
 
@@ -1,6 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import Optional
+from datetime import date, timedelta
+from typing import Dict, Optional
+from app.core.barcode_cache import BARCODE_CACHE_WARM_DAYS, barcode_cache
 from app.crud.product import get_product_by_barcode, create_product
+from app.models.product import Product
+from app.models.sales_rollup import DailySalesRollup
 from app.schemas.product_schema import ProductCreate
 from .external_api_service import external_api_service
 from .analytics_service import analytics_service
@@ -11,48 +15,61 @@ logger = logging.getLogger(__name__)
 class BarcodeService:
     """
     Service orchestrating the barcode lookup strategy:
+    0. Per-business barcode cache (products and recently unknown barcodes)
     1. Local database lookup
     2. External API lookup (if not found locally)
     3. Save external results to local database
     """
 
-    async def lookup_barcode(self, db: Session, barcode: str, user_id: Optional[int] = None):
+    async def lookup_barcode(self, db: Session, barcode: str, user_id: Optional[int] = None,
+                             business_id: Optional[int] = None):
         """
         Main barcode lookup method implementing the strategy.
         Returns product data if found, None otherwise.
+        Lookups for a business only see its own products and use its barcode cache.
         """
-        logger.info(f"🔍 Starting lookup for barcode: {barcode}")
+        # 0. Try the barcode cache
+        cached = barcode_cache.get(business_id, barcode)
+        if cached is not None:
+            source = "local_database" if cached.product is not None else "not_found"
+            logger.debug("Barcode %s served from cache", barcode, extra={"event": "scanner.lookup", "source": source})
+            await analytics_service.track_scan_event(
+                db, barcode, cached.product is not None, source, user_id
+            )
+            return cached.product
 
-        # 1. Try local database first
-        local_product = get_product_by_barcode(db, barcode)
+        # 1. Try local database
+        generation = barcode_cache.generation(business_id)
+        local_product = get_product_by_barcode(db, barcode, business_id)
         if local_product:
-            logger.info(f"✅ Product found in local database: {local_product.name}")
+            logger.debug("Barcode %s found locally", barcode, extra={"event": "scanner.lookup", "source": "local_database"})
+            product = self._format_db_product(local_product)
+            barcode_cache.put(business_id, barcode, product, generation)
             # Track successful local scan
             await analytics_service.track_scan_event(
                 db, barcode, True, "local_database", user_id
             )
-            return self._format_db_product(local_product)
+            return product
 
         # 2. If not found locally, try external API
-        logger.info(f"ℹ️ Product not found locally. Trying external lookup for: {barcode}")
+        logger.info("Barcode %s not found locally, trying external lookup", barcode)
         external_product_data = await external_api_service.lookup_barcode(barcode)
         
         if external_product_data:
             # 3. Save external product to local database
-            logger.info(f"💾 Saving external product to local database: {external_product_data['name']}")
             try:
                 product_create = ProductCreate(**external_product_data)
                 saved_product = create_product(db, product_create)
                 db.commit()
                 db.refresh(saved_product)
-                logger.info(f"✅ Successfully saved product: {saved_product.name} with ID: {saved_product.id}")
+                logger.info("Saved external product %s for barcode %s", saved_product.id, barcode)
                 # Track successful external scan
                 await analytics_service.track_scan_event(
                     db, barcode, True, "external_api", user_id
                 )
                 return self._format_db_product(saved_product)
             except Exception as e:
-                logger.error(f"❌ Failed to save external product to database: {e}")
+                logger.error("Failed to save external product for barcode %s: %s", barcode, e)
                 db.rollback()
                 # Track failed external scan (found externally but couldn't save)
                 await analytics_service.track_scan_event(
@@ -61,13 +78,53 @@ class BarcodeService:
                 return external_product_data
 
         # 4. Product not found anywhere
-        logger.info(f"❌ Product not found in any database for barcode: {barcode}")
+        logger.info("Barcode %s not found in any source", barcode)
+        barcode_cache.put(business_id, barcode, None, generation)
         # Track failed scan
         await analytics_service.track_scan_event(
             db, barcode, False, "not_found", user_id
         )
         return None
 
+    def warm_cache(self, session_factory, days: int = BARCODE_CACHE_WARM_DAYS) -> int:
+        """
+        Load the barcodes of every business that sold in the last `days` days
+        into the barcode cache (newest products first, up to the cache size).
+        Returns the number of barcodes loaded.
+        """
+        db = session_factory()
+        try:
+            since = date.today() - timedelta(days=days)
+            business_ids = [business_id for (business_id,) in db.query(DailySalesRollup.business_id).filter(
+                DailySalesRollup.sale_date >= since
+            ).distinct()]
+            generations = {business_id: barcode_cache.generation(business_id) for business_id in business_ids}
+            rows = db.query(
+                Product.id, Product.name, Product.description, Product.price, Product.barcode,
+                Product.stock_quantity, Product.min_stock_level, Product.business_id
+            ).filter(
+                Product.business_id.in_(business_ids),
+                Product.barcode.isnot(None),
+                Product.barcode != ""
+            ).order_by(Product.business_id, Product.id.desc()).yield_per(1000)
+
+            loaded: Dict[int, int] = {}
+            for row in rows:
+                if loaded.get(row.business_id, 0) >= barcode_cache.max_entries:
+                    continue
+                barcode_cache.put(row.business_id, row.barcode, self._format_db_product(row),
+                                  generations[row.business_id])
+                loaded[row.business_id] = loaded.get(row.business_id, 0) + 1
+            count = sum(loaded.values())
+            logger.info("Warmed barcode cache with %s barcodes for %s businesses", count, len(loaded),
+                        extra={"event": "scanner.cache_warmed"})
+            return count
+        except Exception as e:
+            logger.error("Failed to warm barcode cache: %s", e)
+            return 0
+        finally:
+            db.close()
+
     def _format_db_product(self, db_product):
         """Format database product object into response dictionary."""
         return {
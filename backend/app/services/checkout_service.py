@@ -0,0 +1,175 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.models.sale import Sale, SaleItem
+from app.models.payment import Payment
+from app.models.business import Business
+from app.schemas.sale_schema import SaleCreate
+from app.services.activity_service import ActivityService
+from app.services.event_bus import event_bus
+from app.services.sequence_service import SequenceService
+from app.services.rollup_service import RollupService
+from app.services.inventory_ledger import InsufficientStock, InventoryLedger
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CheckoutService:
+    """
+    Batched checkout engine.
+
+    A basket costs the same number of round trips whatever its size:
+    one locked product fetch, one conditional stock update, one sequence bump
+    per numbering type, one bulk insert each for items, history and payments,
+    and one daily rollup upsert per payment method.
+
+    The sale number and the daily rollup are rows every checkout of the
+    business updates, and each stays locked until commit. They are touched
+    last, after all per-sale work, so concurrent checkouts only queue for
+    the final few statements. Inventory history numbers come from
+    SequenceService.allocate and take no lock at all.
+    """
+
+    @staticmethod
+    def calculate_totals(sale_data: SaleCreate) -> Dict[str, float]:
+        """Compute subtotal, tax and final total in local currency and verify the payments cover it"""
+        total_amount = sum(item.quantity * item.unit_price for item in sale_data.sale_items)
+
+        tax_rate = sale_data.tax_rate if sale_data.tax_rate else 0.0
+        tax_amount = total_amount * (tax_rate / 100)
+        final_total = total_amount + tax_amount
+
+        # Verify payment amounts match total
+        payment_total = sum(payment.amount for payment in sale_data.payments)
+        if abs(payment_total - final_total) > 0.01:
+            raise ValueError("Payment total does not match sale total")
+
+        return {"subtotal": total_amount, "tax_amount": tax_amount, "final_total": final_total}
+
+    @staticmethod
+    def build_sale(sale_data: SaleCreate, totals: Dict[str, float], user_id: int, business: Business,
+                   current_rate: float = 1.0, created_at: Optional[datetime] = None) -> Sale:
+        """An unnumbered, unsaved Sale row for `sale_data`, in USD with the local amounts kept alongside"""
+        final_total = totals["final_total"]
+        tax_amount = totals["tax_amount"]
+        final_total_usd = final_total * current_rate if current_rate != 0 else final_total
+        tax_amount_usd = tax_amount * current_rate if current_rate != 0 else tax_amount
+
+        db_sale = Sale(
+            user_id=user_id,
+            business_id=business.id,
+            total_amount=final_total_usd,
+            tax_amount=tax_amount_usd,
+            usd_amount=final_total_usd,
+            usd_tax_amount=tax_amount_usd,
+            original_amount=final_total,
+            original_currency=business.currency_code or 'USD',
+            exchange_rate_at_sale=current_rate,
+            payment_status="completed"
+        )
+        if created_at is not None:
+            db_sale.created_at = created_at
+        return db_sale
+
+    @staticmethod
+    def item_rows(sale_id: int, sale_data: SaleCreate, current_rate: float = 1.0) -> List[dict]:
+        rows = []
+        for item in sale_data.sale_items:
+            subtotal = item.quantity * item.unit_price
+            rows.append({
+                "sale_id": sale_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price * current_rate,
+                "subtotal": subtotal * current_rate,
+                "original_unit_price": item.unit_price,
+                "original_subtotal": subtotal,
+                "exchange_rate_at_creation": current_rate,
+                "refunded_quantity": 0
+            })
+        return rows
+
+    @staticmethod
+    def payment_rows(sale_id: int, sale_data: SaleCreate, local_currency: str, current_rate: float = 1.0) -> List[dict]:
+        return [
+            {
+                "sale_id": sale_id,
+                "amount": payment.amount * current_rate,
+                "payment_method": payment.payment_method,
+                "transaction_id": payment.transaction_id,
+                "status": "completed",
+                "original_amount": payment.amount,
+                "original_currency_code": local_currency,
+                "exchange_rate_at_payment": current_rate
+            }
+            for payment in sale_data.payments
+        ]
+
+    @staticmethod
+    def create_sale(db: Session, sale_data: SaleCreate, user_id: int, business: Business,
+                    current_rate: float = 1.0) -> Sale:
+        """
+        Stage a complete sale in the current transaction without committing.
+        `current_rate` converts the business's local currency to USD.
+        """
+        totals = CheckoutService.calculate_totals(sale_data)
+        local_currency = business.currency_code or 'USD'
+
+        # Aggregate quantities so repeated lines of the same product are checked together
+        requested: Dict[int, int] = {}
+        for item in sale_data.sale_items:
+            requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+
+        products = InventoryLedger.lock(db, requested)
+        for item in sale_data.sale_items:
+            if item.product_id not in products:
+                raise ValueError(f"Product with ID {item.product_id} not found")
+        for product_id, quantity in requested.items():
+            product = products[product_id]
+            if product.stock_quantity < quantity:
+                raise ValueError(f"Insufficient stock for product {product.name}")
+
+        db_sale = CheckoutService.build_sale(sale_data, totals, user_id, business, current_rate)
+        db.add(db_sale)
+        db.flush()  # Get sale ID without committing
+
+        # One conditional UPDATE for every product in the basket; it refuses to oversell
+        # even if the check above saw stale stock
+        try:
+            levels = InventoryLedger.apply(db, {product_id: -quantity for product_id, quantity in requested.items()},
+                                           lock=False)
+        except InsufficientStock as e:
+            raise InsufficientStock(e.product_ids, f"Insufficient stock for product {products[e.product_ids[0]].name}")
+
+        item_rows = CheckoutService.item_rows(db_sale.id, sale_data, current_rate)
+        payment_rows = CheckoutService.payment_rows(db_sale.id, sale_data, local_currency, current_rate)
+
+        db.execute(insert(SaleItem), item_rows)
+        if payment_rows:
+            db.execute(insert(Payment), payment_rows)
+
+        # Business-wide rows from here on: the caller commits right after
+        business_sale_number = SequenceService.get_next_number(db, business.id, 'sale')
+        db_sale.business_sale_number = business_sale_number
+        db.flush()
+
+        line_count = len(sale_data.sale_items)
+        InventoryLedger.record(
+            db, business.id, user_id, "sale", f"Sale #{business_sale_number}",
+            [(item.product_id, -item.quantity) for item in sale_data.sale_items], levels
+        )
+
+        lines = [
+            (item.quantity, products[item.product_id].cost_price, products[item.product_id].original_cost_price)
+            for item in sale_data.sale_items
+        ]
+        RollupService.record_sale(
+            db, db_sale, RollupService.sale_deltas(db_sale, lines),
+            [(row["payment_method"], row["amount"], row["original_amount"]) for row in payment_rows]
+        )
+
+        event_bus.publish(db, business.id, "sale", ActivityService.sale_activity(db_sale, datetime.now()))
+
+        logger.debug("Staged sale #%s with %s lines for business %s", business_sale_number, line_count, business.id)
+        return db_sale
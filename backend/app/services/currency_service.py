@@ -1,9 +1,14 @@
-import httpx
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+import asyncio
 from typing import Optional
+import logging
 import os
+from app.models.business import Business
 from app.models.currency import Currency, ExchangeRate
+from app.services.rate_book import rate_book
+
+logger = logging.getLogger(__name__)
 
 class CurrencyService:
     def __init__(self, db: Session):
@@ -11,43 +16,64 @@ class CurrencyService:
         self.openexchangerates_api_key = os.getenv('OPENEXCHANGERATES_API_KEY')
 
     async def get_latest_exchange_rate(self, base_currency: str, target_currency: str) -> Optional[float]:
-        """Get the latest exchange rate, fetching from API if needed."""
+        """Get the latest exchange rate from the in-memory rate book, refreshing it if needed."""
+        if base_currency == target_currency:
+            return 1.0
+
+        # Every pair, USD or cross, is derived from the same cached USD-base table
+        rate = await rate_book.aget_rate(base_currency, target_currency)
+        if rate is not None and rate != 0:
+            return float(rate)
+
+        # Final fallback: get any known rate from database (off the event loop)
+        return await asyncio.to_thread(self.get_last_known_rate, base_currency, target_currency)
+
+    def get_latest_exchange_rate_sync(self, base_currency: str, target_currency: str) -> Optional[float]:
+        """Synchronous lookup for code running in a worker thread - never spins up an event loop"""
         if base_currency == target_currency:
             return 1.0
 
-        # Check for cached rate first
-        cached_rate = self.get_cached_rate(base_currency, target_currency)
-        if cached_rate is not None:
-            return float(cached_rate)
-
-        # SPECIAL CASE: Direct conversions involving USD
-        if base_currency == 'USD':
-            rate = await self.fetch_usd_base_rate(target_currency)
-            if rate is not None:
-                self.cache_rate(base_currency, target_currency, rate)
-                return rate
-        elif target_currency == 'USD':
-            # For non-USD → USD conversion: get USD→base rate and invert it
-            usd_to_base = await self.fetch_usd_base_rate(base_currency)
-            if usd_to_base is not None and usd_to_base != 0:
-                rate = 1.0 / usd_to_base
-                self.cache_rate(base_currency, target_currency, rate)
-                return rate
-
-        # GENERAL CASE: Use USD as intermediary for non-USD conversions
+        rate = rate_book.get_rate(base_currency, target_currency)
+        if rate is not None and rate != 0:
+            return float(rate)
+
+        return self.get_last_known_rate(base_currency, target_currency)
+
+    async def get_rate_to_usd(self, currency_code: str) -> Optional[float]:
+        """Local currency → USD multiplier, resolved on the event loop"""
+        if currency_code == 'USD':
+            return 1.0
+        return self._rate_to_usd(await self.get_latest_exchange_rate('USD', currency_code))
+
+    def get_rate_to_usd_sync(self, currency_code: str) -> Optional[float]:
+        """Local currency → USD multiplier for synchronous callers"""
+        if currency_code == 'USD':
+            return 1.0
+        return self._rate_to_usd(self.get_latest_exchange_rate_sync('USD', currency_code))
+
+    async def get_business_rate_to_usd(self, business_id: Optional[int]) -> float:
+        """Local → USD multiplier for a business. Only the currency lookup uses a worker thread."""
+        currency_code = await asyncio.to_thread(self._get_business_currency, business_id)
+        if currency_code == 'USD':
+            return 1.0
         try:
-            usd_to_base = await self.fetch_usd_base_rate(base_currency)
-            usd_to_target = await self.fetch_usd_base_rate(target_currency)
-            
-            if usd_to_base is not None and usd_to_target is not None and usd_to_base != 0:
-                rate = usd_to_target / usd_to_base
-                self.cache_rate(base_currency, target_currency, rate)
-                return rate
+            return await self.get_rate_to_usd(currency_code) or 1.0
         except Exception as e:
-            print(f"Failed to calculate rate via USD intermediary: {e}")
+            logger.warning("Could not get exchange rate for %s->USD: %s. Using 1.0", currency_code, e, exc_info=True)
+            return 1.0
 
-        # Final fallback: get any known rate from database
-        return self.get_last_known_rate(base_currency, target_currency)
+    def _get_business_currency(self, business_id: Optional[int]) -> str:
+        if business_id is None:
+            return 'USD'
+        row = self.db.query(Business.currency_code).filter(Business.id == business_id).first()
+        return row[0] if row and row[0] else 'USD'
+
+    @staticmethod
+    def _rate_to_usd(usd_to_local_rate: Optional[float]) -> Optional[float]:
+        # Stored rates are USD -> X, so invert them
+        if not usd_to_local_rate:
+            return None
+        return 1.0 / usd_to_local_rate
 
     async def convert_amount(self, amount: float, from_currency: str, to_currency: str) -> float:
         """Convert amount between currencies - PROPER ERROR HANDLING"""
@@ -80,35 +106,11 @@ class CurrencyService:
         return self.apply_symbol_formatting(formatted_amount, currency)
 
     async def fetch_usd_base_rate(self, target_currency: str) -> Optional[float]:
-        """Fetch live rate from OpenExchangeRates API (USD -> Target Currency)"""
-        if not self.openexchangerates_api_key:
-            print("OpenExchangeRates API key not configured")
-            return None
-            
+        """Live rate from OpenExchangeRates (USD -> Target Currency), served by the shared rate book"""
         if target_currency == 'USD':
             return 1.0  # EXPLICITLY return 1.0 for USD→USD
 
-        try:
-            async with httpx.AsyncClient() as client:
-                url = f"https://openexchangerates.org/api/latest.json?app_id={self.openexchangerates_api_key}"
-                response = await client.get(url, timeout=10.0)
-                data = response.json()
-
-                if 'rates' not in data:
-                    print("API response missing 'rates' field")
-                    return None
-
-                if target_currency in data['rates']:
-                    rate = float(data['rates'][target_currency])
-                    # Store the rate in database (USD -> Target)
-                    self.store_exchange_rate('USD', target_currency, rate)
-                    return rate
-                else:
-                    print(f"Currency {target_currency} not found in API response.")
-                    return None
-        except Exception as e:
-            print(f"OpenExchangeRates API error: {e}")
-            return None
+        return await rate_book.aget_rate('USD', target_currency)
 
     def get_cached_rate(self, base: str, target: str, max_age_hours: int = 4) -> Optional[float]:
         """Get recently cached exchange rate"""
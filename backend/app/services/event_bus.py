@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, NamedTuple, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Events kept per business for the activity feed and for replay to reconnecting streams
+EVENT_FEED_SIZE = int(os.getenv("EVENT_FEED_SIZE", "100"))
+# Events a slow stream may fall behind by before it is told to resync
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "500"))
+# Fan events out to every worker through Postgres LISTEN/NOTIFY
+EVENT_BUS_NOTIFY = os.getenv("EVENT_BUS_NOTIFY", "false").lower() in ("1", "true", "yes")
+# NOTIFY channel shared by the workers
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "bizzy_events")
+# Without NOTIFY a worker only sees its own commits, so its feed is reloaded this often
+EVENT_FEED_RELOAD_SECONDS = float(os.getenv("EVENT_FEED_RELOAD_SECONDS", "60"))
+
+# Event types that make up the activity feed; the rest are stream-only
+ACTIVITY_TYPES = ("sale", "inventory", "expense")
+
+# Session.info key holding the events a transaction publishes when it commits
+_PENDING_KEY = "bus_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+_MAX_NOTIFY_BYTES = 7900
+
+class BusEvent(NamedTuple):
+    id: int  # per business and process; 0 for activities loaded from the database
+    business_id: int
+    type: str
+    data: dict
+    timestamp: datetime
+
+class Subscription:
+    """One open stream: events for its business, queued on the stream's event loop"""
+
+    def __init__(self, business_id: int, queue_size: int):
+        self.business_id = business_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+        # Events the client missed since its Last-Event-ID; None when they cannot be replayed
+        self.replay: Optional[List[BusEvent]] = []
+
+    def put(self, bus_event: BusEvent):
+        try:
+            self.queue.put_nowait(bus_event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[BusEvent]:
+        """Next event, or None when `timeout` passes first"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventBus:
+    """
+    In-process publish/subscribe of business events, with a bounded feed per business.
+
+    Writers call `publish` inside their transaction; the event is delivered
+    when that transaction commits and dropped if it rolls back. Delivery
+    numbers the event, appends it to the business's feed and hands it to
+    every open stream of that business.
+
+    With EVENT_BUS_NOTIFY on a Postgres database, `publish` also sends the
+    event with pg_notify, which Postgres only delivers on commit, and each
+    worker's `listen` thread delivers the other workers' events locally.
+    """
+
+    def __init__(self, feed_size: int = EVENT_FEED_SIZE, queue_size: int = EVENT_QUEUE_SIZE,
+                 notify: bool = EVENT_BUS_NOTIFY):
+        self.feed_size = feed_size
+        self.queue_size = queue_size
+        self.notify = notify
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._sequences: Dict[int, int] = {}
+        self._feeds: Dict[int, Deque[BusEvent]] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------ publishing
+
+    def publish(self, db: Session, business_id: Optional[int], event_type: str, data: dict):
+        """Deliver the event once `db`'s transaction commits"""
+        if business_id is None:
+            return
+        data = jsonable_encoder(data)
+        db.info.setdefault(_PENDING_KEY, []).append((business_id, event_type, data))
+        if self.notify and db.get_bind().dialect.name == "postgresql":
+            payload = json.dumps({"origin": self.origin, "business_id": business_id, "type": event_type, "data": data})
+            if len(payload.encode()) < _MAX_NOTIFY_BYTES:
+                db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                           {"channel": EVENT_BUS_CHANNEL, "payload": payload})
+            else:
+                logger.warning("Event %s for business %s too large to NOTIFY", event_type, business_id,
+                               extra={"event": "event_bus.payload_too_large"})
+
+    def deliver(self, business_id: int, event_type: str, data: dict) -> BusEvent:
+        """Number the event, add it to the feed and pass it to the business's streams"""
+        timestamp = data.get("timestamp")
+        timestamp = datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else datetime.now()
+        with self._lock:
+            sequence = self._sequences[business_id] = self._sequences.get(business_id, 0) + 1
+            bus_event = BusEvent(sequence, business_id, event_type, data, timestamp)
+            self._feed(business_id).append(bus_event)
+            subscribers = list(self._subscribers.get(business_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, bus_event)
+            except RuntimeError:
+                # The stream's event loop is gone
+                self.unsubscribe(subscription)
+        return bus_event
+
+    # ------------------------------------------------------------ streams
+
+    def subscribe(self, business_id: int, last_event_id: Optional[str] = None) -> Subscription:
+        """Register a stream (call from its event loop) with the events it missed since `last_event_id`"""
+        subscription = Subscription(business_id, self.queue_size)
+        with self._lock:
+            if last_event_id:
+                subscription.replay = self._missed(business_id, last_event_id)
+            self._subscribers.setdefault(business_id, set()).add(subscription)
+        return subscription
+
+    def event_id(self, bus_event: BusEvent) -> str:
+        """SSE id of an event; ids from another process or an earlier run are not replayed"""
+        return f"{self.origin[:12]}.{bus_event.id}"
+
+    def _missed(self, business_id: int, last_event_id: str) -> Optional[List[BusEvent]]:
+        origin, _, number = last_event_id.partition(".")
+        if origin != self.origin[:12] or not number.isdigit():
+            return None
+        last = int(number)
+        if last > self._sequences.get(business_id, 0):
+            return None
+        live = [bus_event for bus_event in self._feeds.get(business_id, ()) if bus_event.id]
+        if last < self._sequences.get(business_id, 0) and (not live or live[0].id > last + 1):
+            # Some of what was missed has already been evicted
+            return None
+        return [bus_event for bus_event in live if bus_event.id > last]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.business_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.business_id]
+
+    # ------------------------------------------------------------ activity feed
+
+    def recent(self, business_id: int, since: datetime, limit: int) -> Optional[List[dict]]:
+        """
+        The newest `limit` activities since `since`, newest first, or None when
+        the feed cannot answer: not loaded yet, due for reload, or too short
+        """
+        with self._lock:
+            loaded_at = self._loaded_at.get(business_id)
+            if loaded_at is None or limit > self.feed_size:
+                return None
+            if not self.notify and time.monotonic() - loaded_at > EVENT_FEED_RELOAD_SECONDS:
+                return None
+            feed = list(self._feeds.get(business_id, ()))
+        activities = [bus_event for bus_event in feed if bus_event.type in ACTIVITY_TYPES and bus_event.timestamp >= since]
+        activities.sort(key=lambda bus_event: bus_event.timestamp, reverse=True)
+        if len(activities) < limit and len(feed) >= self.feed_size and feed[0].timestamp >= since:
+            # Older activities in the window have been evicted
+            return None
+        return [bus_event.data for bus_event in activities[:limit]]
+
+    def load_feed(self, business_id: int, activities: List[dict]):
+        """Seed the feed with activities read from the database, keeping events delivered meanwhile"""
+        with self._lock:
+            live = [bus_event for bus_event in self._feeds.get(business_id, ()) if bus_event.id]
+            seen = {(bus_event.type, bus_event.data.get("id")) for bus_event in live}
+            loaded = []
+            for activity in jsonable_encoder(activities):
+                if (activity["type"], activity.get("id")) not in seen:
+                    loaded.append(BusEvent(0, business_id, activity["type"], activity,
+                                           datetime.fromisoformat(activity["timestamp"])))
+            loaded.sort(key=lambda bus_event: bus_event.timestamp)
+            feed = self._feed(business_id)
+            feed.clear()
+            feed.extend(loaded + live)
+            self._loaded_at[business_id] = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._feeds.clear()
+            self._loaded_at.clear()
+
+    def _feed(self, business_id: int) -> Deque[BusEvent]:
+        feed = self._feeds.get(business_id)
+        if feed is None:
+            feed = self._feeds[business_id] = deque(maxlen=self.feed_size)
+        return feed
+
+    # ------------------------------------------------------------ LISTEN/NOTIFY
+
+    def start_listener(self, engine):
+        """Deliver other workers' events from NOTIFY on a daemon thread (Postgres only)"""
+        if not self.notify or engine.dialect.name != "postgresql":
+            return None
+        self._stop.clear()
+        thread = threading.Thread(target=self.listen, args=(engine,), name="event-bus-listener", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_listener(self):
+        self._stop.set()
+
+    def listen(self, engine, poll_seconds: float = 5.0):
+        while not self._stop.is_set():
+            try:
+                raw = engine.raw_connection()
+                try:
+                    connection = raw.driver_connection
+                    connection.autocommit = True
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"LISTEN {EVENT_BUS_CHANNEL}")
+                    logger.info("Listening for events on %s", EVENT_BUS_CHANNEL, extra={"event": "event_bus.listening"})
+                    while not self._stop.is_set():
+                        if select.select([connection], [], [], poll_seconds) == ([], [], []):
+                            continue
+                        connection.poll()
+                        while connection.notifies:
+                            self._on_notify(connection.notifies.pop(0).payload)
+                finally:
+                    raw.invalidate()
+            except Exception as e:
+                logger.warning("Event listener lost its connection: %s", e, extra={"event": "event_bus.listener_error"})
+                self._stop.wait(poll_seconds)
+
+    def _on_notify(self, payload: str):
+        message = json.loads(payload)
+        if message.get("origin") != self.origin:
+            self.deliver(message["business_id"], message["type"], message["data"])
+
+# Global event bus instance
+event_bus = EventBus()
+
+@event.listens_for(Session, "after_commit")
+def _deliver_committed(session: Session):
+    # Savepoint commits fire this too; only the outermost commit publishes the events
+    if not session.in_nested_transaction():
+        for business_id, event_type, data in session.info.pop(_PENDING_KEY, ()):
+            event_bus.deliver(business_id, event_type, data)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session: Session):
+    if not session.in_nested_transaction():
+        session.info.pop(_PENDING_KEY, None)
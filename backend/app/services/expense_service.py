@@ -24,11 +24,13 @@ class ExpenseService:
             print(f"DEBUG: Converting {original_amount} {original_currency_code} to USD")
             try:
                 # Get the current exchange rate first
-                exchange_rate = await self.currency_service.get_exchange_rate(
+                exchange_rate = await self.currency_service.get_latest_exchange_rate(
                     original_currency_code,
                     "USD"
                 )
                 print(f"DEBUG: Current exchange rate: {exchange_rate}")
+                if exchange_rate is None:
+                    raise ValueError(f"No exchange rate available for {original_currency_code}→USD")
                 
                 # Convert using the live rate
                 converted_amount = original_amount * exchange_rate
@@ -1,117 +1,333 @@
-import pandas as pd
-from io import BytesIO
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import xlsxwriter
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.models.refund import Refund, RefundItem
+from app.models.sale import Sale, SaleItem
+from app.models.user import User
+
+# Rows fetched per round trip while streaming an export (a server-side cursor on Postgres)
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "5000"))
+# Bytes read per chunk when sending a finished XLSX file
+EXPORT_XLSX_CHUNK_BYTES = 256 * 1024
+
+CSV_MEDIA_TYPE = "text/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Data rows per worksheet; Excel stops at 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+# A section is (title, header, row batches); summary reports are small lists of sections,
+# dataset exports one section whose batches come straight from the cursor
+Section = Tuple[Optional[str], Sequence[str], Iterable[Sequence[Sequence]]]
+
+class ExportDataset:
+    """A detail export: labelled columns over one business's rows in a date range"""
+
+    def __init__(self, name: str, title: str, columns: Sequence[Tuple[str, object]],
+                 build: Callable[[Select, int, datetime, datetime], Select]):
+        self.name = name
+        self.title = title
+        self.header = [label for label, _ in columns]
+        self.expressions = [expression for _, expression in columns]
+        self.build = build
+
+    def query(self, business_id: int, start_date: date, end_date: date) -> Select:
+        """Rows from start_date through end_date inclusive, in export order"""
+        start = datetime.combine(start_date, datetime.min.time())
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        return self.build(select(*self.expressions), business_id, start, end)
+
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    dataset.name: dataset for dataset in (
+        ExportDataset("sales-lines", "Sales Lines", [
+            ("Sale #", Sale.business_sale_number),
+            ("Date", Sale.created_at),
+            ("Status", Sale.payment_status),
+            ("Product", Product.name),
+            ("Barcode", Product.barcode),
+            ("Quantity", SaleItem.quantity),
+            ("Refunded Quantity", SaleItem.refunded_quantity),
+            ("Unit Price (USD)", SaleItem.unit_price),
+            ("Subtotal (USD)", SaleItem.subtotal),
+            ("Unit Price (Local)", SaleItem.original_unit_price),
+            ("Subtotal (Local)", SaleItem.original_subtotal),
+            ("Currency", Sale.original_currency),
+            ("Exchange Rate", SaleItem.exchange_rate_at_creation),
+        ], lambda query, business_id, start, end: query
+            .select_from(SaleItem)
+            .join(Sale, Sale.id == SaleItem.sale_id)
+            .outerjoin(Product, Product.id == SaleItem.product_id)
+            .where(Sale.business_id == business_id, Sale.created_at >= start, Sale.created_at < end)
+            .order_by(Sale.created_at, Sale.id, SaleItem.id)),
+
+        ExportDataset("inventory-history", "Inventory History", [
+            ("Entry #", InventoryHistory.business_inventory_number),
+            ("Date", InventoryHistory.changed_at),
+            ("Product", Product.name),
+            ("Barcode", Product.barcode),
+            ("Change Type", InventoryHistory.change_type),
+            ("Quantity Change", InventoryHistory.quantity_change),
+            ("Previous Quantity", InventoryHistory.previous_quantity),
+            ("New Quantity", InventoryHistory.new_quantity),
+            ("Reason", InventoryHistory.reason),
+            ("Changed By", User.username),
+        ], lambda query, business_id, start, end: query
+            .select_from(InventoryHistory)
+            .outerjoin(Product, Product.id == InventoryHistory.product_id)
+            .outerjoin(User, User.id == InventoryHistory.changed_by)
+            .where(InventoryHistory.business_id == business_id,
+                   InventoryHistory.changed_at >= start, InventoryHistory.changed_at < end)
+            .order_by(InventoryHistory.changed_at, InventoryHistory.id)),
+
+        ExportDataset("financial", "Financial Detail", [
+            ("Sale #", Sale.business_sale_number),
+            ("Date", Sale.created_at),
+            ("Product", Product.name),
+            ("Quantity", SaleItem.quantity),
+            ("Refunded Quantity", SaleItem.refunded_quantity),
+            ("Revenue (USD)", SaleItem.subtotal),
+            ("COGS (USD)", SaleItem.quantity * Product.cost_price),
+            ("Gross Profit (USD)", SaleItem.subtotal - SaleItem.quantity * Product.cost_price),
+            ("Revenue (Local)", SaleItem.original_subtotal),
+            ("COGS (Local)", SaleItem.quantity * Product.original_cost_price),
+            ("Gross Profit (Local)", SaleItem.original_subtotal - SaleItem.quantity * Product.original_cost_price),
+            ("Currency", Sale.original_currency),
+        ], lambda query, business_id, start, end: query
+            .select_from(SaleItem)
+            .join(Sale, Sale.id == SaleItem.sale_id)
+            .outerjoin(Product, Product.id == SaleItem.product_id)
+            .where(Sale.business_id == business_id, Sale.payment_status == "completed",
+                   Sale.created_at >= start, Sale.created_at < end)
+            .order_by(Sale.created_at, Sale.id, SaleItem.id)),
+
+        ExportDataset("refunds", "Refund Detail", [
+            ("Refund #", Refund.business_refund_number),
+            ("Date", Refund.created_at),
+            ("Status", Refund.status),
+            ("Sale #", Sale.business_sale_number),
+            ("Product", Product.name),
+            ("Quantity", RefundItem.quantity),
+            ("Amount (USD)", RefundItem.quantity * SaleItem.unit_price),
+            ("Amount (Local)", RefundItem.quantity * SaleItem.original_unit_price),
+            ("Currency", Refund.original_currency),
+            ("Reason", Refund.reason),
+        ], lambda query, business_id, start, end: query
+            .select_from(RefundItem)
+            .join(Refund, Refund.id == RefundItem.refund_id)
+            .join(Sale, Sale.id == Refund.sale_id)
+            .outerjoin(SaleItem, SaleItem.id == RefundItem.sale_item_id)
+            .outerjoin(Product, Product.id == SaleItem.product_id)
+            .where(Refund.business_id == business_id, Refund.created_at >= start, Refund.created_at < end)
+            .order_by(Refund.created_at, Refund.id, RefundItem.id)),
+    )
+}
 
 class ExportService:
+    """
+    Streaming CSV and XLSX exports.
+
+    Nothing is materialised: detail rows are read in EXPORT_FETCH_SIZE batches
+    through a streaming cursor and each batch is written out before the next
+    is fetched. CSV goes to the client batch by batch. XLSX is written by
+    xlsxwriter in constant-memory mode to a temporary file, which is then
+    sent in chunks, so the first byte leaves once the workbook is finished.
+    """
+
+    # ------------------------------------------------------------------ writers
+
     @staticmethod
-    def export_sales_to_excel(data: dict, filename: str):
+    def csv_chunks(sections: Iterable[Section]) -> Iterator[bytes]:
+        """Encode sections as CSV, one chunk per row batch; titled sections are separated by a blank line"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def drain() -> bytes:
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+
+        for index, (title, header, batches) in enumerate(sections):
+            if title:
+                if index:
+                    writer.writerow([])
+                writer.writerow([title.upper()])
+            writer.writerow(header)
+            for batch in batches:
+                writer.writerows(batch)
+                yield drain()
+        tail = drain()
+        if tail:
+            yield tail
+
+    @staticmethod
+    def xlsx_chunks(sections: Iterable[Section]) -> Iterator[bytes]:
+        """Write sections to one worksheet each (continued on new sheets past Excel's row limit)"""
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as target:
+            workbook = xlsxwriter.Workbook(target.name, {
+                "constant_memory": True, "remove_timezone": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"
+            })
+            header_format = workbook.add_format({"bold": True})
+            used_names = set()
+
+            def new_sheet(title: str, header: Sequence[str]):
+                name, suffix = title[:31], 2
+                while name.lower() in used_names:
+                    name = f"{title[:26]} ({suffix})"
+                    suffix += 1
+                used_names.add(name.lower())
+                sheet = workbook.add_worksheet(name)
+                sheet.write_row(0, 0, header, header_format)
+                return sheet
+
+            for index, (title, header, batches) in enumerate(sections):
+                title = title or f"Sheet {index + 1}"
+                sheet, row_number = new_sheet(title, header), 0
+                for batch in batches:
+                    for row in batch:
+                        if row_number == XLSX_MAX_ROWS:
+                            sheet, row_number = new_sheet(title, header), 0
+                        row_number += 1
+                        sheet.write_row(row_number, 0, row)
+            workbook.close()
+
+            target.seek(0)
+            while True:
+                chunk = target.read(EXPORT_XLSX_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+    # ------------------------------------------------------------------ detail exports
+
+    @staticmethod
+    def stream_rows(db: Session, query: Select, fetch_size: int = EXPORT_FETCH_SIZE) -> Iterator[List[tuple]]:
+        """Row batches from a streaming cursor; only one batch is held at a time"""
+        result = db.execute(query.execution_options(yield_per=fetch_size))
+        for partition in result.partitions():
+            yield partition
+
+    @staticmethod
+    def dataset_chunks(session_factory: Callable[[], Session], dataset: ExportDataset, fmt: str,
+                       business_id: int, start_date: date, end_date: date,
+                       fetch_size: int = EXPORT_FETCH_SIZE) -> Iterator[bytes]:
+        """
+        Encoded export of one dataset. The session is opened and closed by the
+        generator itself because the response is streamed after the request's
+        own dependencies have been torn down.
+        """
+        db = session_factory()
         try:
-            output = BytesIO()
-            
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                # Sales Summary
-                summary_data = {
-                    'Metric': ['Total Sales', 'Total Tax', 'Transactions', 'Avg Transaction Value'],
-                    'Value': [
-                        data['summary']['total_sales'],
-                        data['summary']['total_tax'],
-                        data['summary']['total_transactions'],
-                        data['summary']['average_transaction_value']
-                    ]
-                }
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Payment Methods
-                payment_data = []
-                for method, count in data['summary']['payment_methods'].items():
-                    payment_data.append({'Payment Method': method, 'Count': count})
-                payment_df = pd.DataFrame(payment_data)
-                payment_df.to_excel(writer, sheet_name='Payment Methods', index=False)
-                
-                # Top Products
-                products_df = pd.DataFrame(data['top_products'])
-                products_df.to_excel(writer, sheet_name='Top Products', index=False)
-                
-                # Sales Trends
-                trends_df = pd.DataFrame(data['sales_trends'])
-                trends_df.to_excel(writer, sheet_name='Sales Trends', index=False)
-                
-                # Formatting
-                workbook = writer.book
-                money_format = workbook.add_format({'num_format': '$#,##0.00'})
-                percent_format = workbook.add_format({'num_format': '0.00%'})
-                
-                for sheet_name in writer.sheets:
-                    worksheet = writer.sheets[sheet_name]
-                    if 'Value' in worksheet.get_name():
-                        worksheet.set_column('B:B', 15, money_format)
-                    if 'Margin' in worksheet.get_name():
-                        worksheet.set_column('E:E', 15, percent_format)
-            
-            output.seek(0)
-            
-            return StreamingResponse(
-                output,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"}
-            )
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Excel export failed: {str(e)}")
+            rows = ExportService.stream_rows(db, dataset.query(business_id, start_date, end_date), fetch_size)
+            sections = [(dataset.title, dataset.header, rows)]
+            if fmt == "xlsx":
+                yield from ExportService.xlsx_chunks(sections)
+            else:
+                yield from ExportService.csv_chunks([(None, dataset.header, rows)])
+        finally:
+            db.close()
+
+    @staticmethod
+    def export_dataset(session_factory: Callable[[], Session], dataset_name: str, fmt: str, business_id: int,
+                       start_date: date, end_date: date) -> StreamingResponse:
+        dataset = EXPORT_DATASETS.get(dataset_name)
+        if dataset is None:
+            raise HTTPException(status_code=404, detail=f"Unknown export '{dataset_name}'")
+        filename = f"{dataset_name.replace('-', '_')}_{start_date}_{end_date}"
+        return ExportService._response(
+            ExportService.dataset_chunks(session_factory, dataset, fmt, business_id, start_date, end_date),
+            filename, fmt
+        )
+
+    # ------------------------------------------------------------------ report exports
+
+    @staticmethod
+    def export_sales_to_excel(data: dict, filename: str):
+        return ExportService._response(ExportService.xlsx_chunks(ExportService._sales_sections(data)), filename, "xlsx")
 
     @staticmethod
     def export_sales_to_csv(data: dict, filename: str):
-        try:
-            # Create CSV content
-            csv_content = []
-            
-            # Summary section
-            csv_content.append("SALES SUMMARY")
-            csv_content.append(f"Total Sales,${data['summary']['total_sales']:,.2f}")
-            csv_content.append(f"Total Tax,${data['summary']['total_tax']:,.2f}")
-            csv_content.append(f"Transactions,{data['summary']['total_transactions']}")
-            csv_content.append(f"Avg Transaction Value,${data['summary']['average_transaction_value']:,.2f}")
-            csv_content.append("")
-            
-            # Payment methods
-            csv_content.append("PAYMENT METHODS")
-            for method, count in data['summary']['payment_methods'].items():
-                csv_content.append(f"{method},{count}")
-            csv_content.append("")
-            
-            # Top products
-            csv_content.append("TOP PRODUCTS")
-            csv_content.append("Product,Quantity Sold,Revenue,Margin")
-            for product in data['top_products']:
-                csv_content.append(f"{product['product_name']},{product['quantity_sold']},${product['total_revenue']:,.2f},{product['profit_margin']:.1f}%")
-            csv_content.append("")
-            
-            # Sales trends
-            csv_content.append("SALES TRENDS")
-            csv_content.append("Date,Daily Sales,Transactions,Avg Order Value")
-            for trend in data['sales_trends']:
-                csv_content.append(f"{trend['date']},${trend['daily_sales']:,.2f},{trend['transactions']},${trend['average_order_value']:,.2f}")
-            
-            csv_output = "\n".join(csv_content)
-            
-            return StreamingResponse(
-                iter([csv_output]),
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
-            )
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"CSV export failed: {str(e)}")
+        return ExportService._response(ExportService.csv_chunks(ExportService._sales_sections(data)), filename, "csv")
 
     @staticmethod
     def export_inventory_to_excel(data: dict, filename: str):
-        # Similar implementation for inventory reports
-        pass
+        return ExportService._response(ExportService.xlsx_chunks(ExportService._report_sections(data)), filename, "xlsx")
+
+    @staticmethod
+    def export_inventory_to_csv(data: dict, filename: str):
+        return ExportService._response(ExportService.csv_chunks(ExportService._report_sections(data)), filename, "csv")
 
     @staticmethod
     def export_financial_to_excel(data: dict, filename: str):
-        # Similar implementation for financial reports
-        pass
+        return ExportService._response(ExportService.xlsx_chunks(ExportService._report_sections(data)), filename, "xlsx")
+
+    @staticmethod
+    def export_financial_to_csv(data: dict, filename: str):
+        return ExportService._response(ExportService.csv_chunks(ExportService._report_sections(data)), filename, "csv")
+
+    @staticmethod
+    def _sales_sections(data: dict) -> List[Section]:
+        summary = data['summary']
+        return [
+            ("Summary", ["Metric", "Value"], [[
+                ["Total Sales", summary['total_sales']],
+                ["Total Tax", summary['total_tax']],
+                ["Transactions", summary['total_transactions']],
+                ["Avg Transaction Value", summary['average_transaction_value']],
+            ]]),
+            ("Payment Methods", ["Payment Method", "Count"], [list(summary['payment_methods'].items())]),
+            ("Top Products", ["Product", "Quantity Sold", "Revenue", "Margin"], [[
+                [product['product_name'], product['quantity_sold'], product['total_revenue'], product.get('profit_margin')]
+                for product in data['top_products']
+            ]]),
+            ("Sales Trends", ["Date", "Daily Sales", "Transactions", "Avg Order Value"], [[
+                [str(trend['date']), trend['daily_sales'], trend['transactions'], trend['average_order_value']]
+                for trend in data['sales_trends']
+            ]]),
+        ]
+
+    @staticmethod
+    def _report_sections(data: dict) -> List[Section]:
+        """Generic layout for report dicts: a Metric/Value section per dict, a table per list of dicts"""
+        sections: List[Section] = []
+        for key, value in data.items():
+            title = key.replace('_', ' ').title()
+            if isinstance(value, dict):
+                sections.append((title, ["Metric", "Value"], [[
+                    [name.replace('_', ' ').title(), ExportService._cell(item)] for name, item in value.items()
+                ]]))
+            elif isinstance(value, list) and value and isinstance(value[0], dict):
+                header = list(value[0].keys())
+                sections.append((title, [name.replace('_', ' ').title() for name in header], [[
+                    [ExportService._cell(row.get(name)) for name in header] for row in value
+                ]]))
+        return sections
+
+    @staticmethod
+    def _cell(value):
+        if isinstance(value, (dict, list)):
+            return str(value)
+        if isinstance(value, date) and not isinstance(value, datetime):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _response(chunks: Iterator[bytes], filename: str, fmt: str) -> StreamingResponse:
+        media_type, extension = (XLSX_MEDIA_TYPE, "xlsx") if fmt == "xlsx" else (CSV_MEDIA_TYPE, "csv")
+        return StreamingResponse(
+            chunks,
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}.{extension}"}
+        )
@@ -0,0 +1,168 @@
+from sqlalchemy import and_, case, insert, or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.barcode_cache import barcode_cache
+from app.core.dashboard_cache import dashboard_cache
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.services.activity_service import ActivityService
+from app.services.event_bus import event_bus
+from app.services.sequence_service import SequenceService
+import logging
+
+logger = logging.getLogger(__name__)
+
+class InsufficientStock(ValueError):
+    """A decrement would have taken stock below zero; nothing was applied for `product_ids`"""
+
+    def __init__(self, product_ids: List[int], message: Optional[str] = None):
+        self.product_ids = product_ids
+        super().__init__(message or f"Insufficient stock for product {', '.join(map(str, product_ids))}")
+
+class InventoryLedger:
+    """
+    The one way product stock changes.
+
+    Stock is never read into Python and written back: every change is a
+    conditional UPDATE evaluated by the database, so concurrent writers can
+    neither lose each other's updates nor take stock below zero. Rows are
+    locked in ascending product id order before they are updated, so two
+    transactions touching overlapping products cannot deadlock.
+
+    Nothing here commits: a failed decrement leaves the caller's transaction
+    to be rolled back.
+    """
+
+    @staticmethod
+    def lock(db: Session, product_ids: Iterable[int]) -> Dict[int, Product]:
+        """Load products with row locks taken in ascending id order"""
+        products = db.query(Product).filter(
+            Product.id.in_(sorted(set(product_ids)))
+        ).order_by(Product.id).with_for_update().all()
+        return {product.id: product for product in products}
+
+    @staticmethod
+    def apply(db: Session, changes: Dict[int, int], lock: bool = True) -> Dict[int, Tuple[int, int]]:
+        """
+        Add `changes` ({product_id: quantity_change}) to stock with one statement:
+
+            UPDATE products SET stock_quantity = stock_quantity + <change>,
+                                is_low_stock = (stock_quantity + <change> <= min_stock_level)
+            WHERE id IN (...) AND (<change> >= 0 OR stock_quantity >= -<change>)
+            RETURNING id, stock_quantity, ...
+
+        Returns {product_id: (previous_quantity, new_quantity)}; products that
+        no longer exist are left out. Raises InsufficientStock when any
+        decrement could not be applied. Pass lock=False when the rows were
+        already locked with `lock`. Products taken down to their minimum stock
+        level publish a low_stock event when the transaction commits, and the
+        scanner's cached stock quantities are updated then too.
+        """
+        changes = {product_id: change for product_id, change in changes.items() if change}
+        if not changes:
+            return {}
+        if lock:
+            db.query(Product.id).filter(Product.id.in_(sorted(changes))).order_by(Product.id).with_for_update().all()
+
+        delta = case(changes, value=Product.id, else_=0)
+        decrements = {product_id: -change for product_id, change in changes.items() if change < 0}
+        guard = Product.id.in_(list(changes))
+        if decrements:
+            guard &= or_(
+                Product.id.notin_(list(decrements)),
+                Product.stock_quantity >= case(decrements, value=Product.id, else_=0)
+            )
+        new_quantity = Product.stock_quantity + delta
+        rows = db.execute(
+            update(Product).where(guard)
+            .values(stock_quantity=new_quantity,
+                    is_low_stock=and_(Product.min_stock_level.isnot(None), new_quantity <= Product.min_stock_level))
+            .returning(Product.id, Product.stock_quantity, Product.is_low_stock, Product.business_id, Product.name,
+                       Product.min_stock_level),
+            execution_options={"synchronize_session": False}
+        ).all()
+
+        levels = {row.id: (row.stock_quantity - changes[row.id], row.stock_quantity) for row in rows}
+        refused = sorted(set(decrements) - set(levels))
+        if refused:
+            raise InsufficientStock(refused)
+
+        # Alert on the crossing only, not on every sale of an already low product
+        for row in rows:
+            if row.is_low_stock and row.stock_quantity - changes[row.id] > row.min_stock_level:
+                event_bus.publish(db, row.business_id, "low_stock", {
+                    "product_id": row.id, "name": row.name,
+                    "stock_quantity": row.stock_quantity, "min_stock_level": row.min_stock_level
+                })
+
+        # Keep products already loaded in this session in step without marking them dirty
+        for row in rows:
+            barcode_cache.stock_changed(db, row.business_id, row.id, row.stock_quantity)
+            product = db.identity_map.get(identity_key(Product, row.id))
+            if product is not None:
+                set_committed_value(product, "stock_quantity", row.stock_quantity)
+                set_committed_value(product, "is_low_stock", row.is_low_stock)
+        return levels
+
+    @staticmethod
+    def record(db: Session, business_id: int, user_id: Optional[int], change_type: str, reason: Optional[str],
+               entries: List[Tuple[int, int]], levels: Dict[int, Tuple[int, int]]) -> List[dict]:
+        """
+        Bulk insert one history row per (product_id, quantity_change) entry, in
+        order. `levels` is what `apply` returned; products listed more than once
+        get running previous/new quantities.
+        """
+        return InventoryLedger.record_batches(db, business_id, user_id, change_type, [(reason, entries)], levels)
+
+    @staticmethod
+    def record_batches(db: Session, business_id: int, user_id: Optional[int], change_type: str,
+                       batches: List[Tuple[Optional[str], List[Tuple[int, int]]]],
+                       levels: Dict[int, Tuple[int, int]]) -> List[dict]:
+        """`record` several (reason, entries) batches covered by one `apply`, with a single insert"""
+        count = sum(len(entries) for _, entries in batches)
+        if not count:
+            return []
+        running = {product_id: previous for product_id, (previous, _) in levels.items()}
+        numbers = iter(SequenceService.allocate(db, business_id, 'inventory', count))
+        rows = []
+        for reason, entries in batches:
+            for product_id, quantity_change in entries:
+                previous_quantity = running[product_id]
+                running[product_id] = previous_quantity + quantity_change
+                rows.append({
+                    "product_id": product_id,
+                    "business_id": business_id,
+                    "business_inventory_number": next(numbers),
+                    "change_type": change_type,
+                    "quantity_change": quantity_change,
+                    "previous_quantity": previous_quantity,
+                    "new_quantity": running[product_id],
+                    "reason": reason,
+                    "changed_by": user_id
+                })
+        ids = dict(db.execute(
+            insert(InventoryHistory).returning(InventoryHistory.business_inventory_number, InventoryHistory.id), rows
+        ).all())
+        for row in rows:
+            row["id"] = ids[row["business_inventory_number"]]
+        dashboard_cache.mark_changed(db, business_id)
+        now = datetime.now()
+        for row in rows:
+            event_bus.publish(db, business_id, "inventory", ActivityService.inventory_activity(row, now))
+        return rows
+
+    @staticmethod
+    def move(db: Session, business_id: int, user_id: Optional[int], change_type: str, reason: Optional[str],
+             entries: List[Tuple[int, int]]) -> Dict[int, Tuple[int, int]]:
+        """`apply` the summed entries, then `record` them"""
+        changes: Dict[int, int] = {}
+        for product_id, quantity_change in entries:
+            changes[product_id] = changes.get(product_id, 0) + quantity_change
+        levels = InventoryLedger.apply(db, changes)
+        InventoryLedger.record(db, business_id, user_id, change_type, reason,
+                               [entry for entry in entries if entry[0] in levels], levels)
+        logger.debug("Moved stock for %s products (%s) in business %s", len(levels), change_type, business_id)
+        return levels
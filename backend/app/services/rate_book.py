@@ -0,0 +1,386 @@
+import asyncio
+import httpx
+import os
+import threading
+import logging
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from app.models.business import Business
+from app.models.currency import Currency, ExchangeRate
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+OPENEXCHANGERATES_URL = "https://openexchangerates.org/api/latest.json"
+
+class RateSnapshot:
+    """One USD-base rate table (1 USD = rates[code]) captured at a point in time"""
+
+    def __init__(self, rates: Dict[str, float], fetched_at: datetime, source: str):
+        self.rates = rates
+        self.fetched_at = fetched_at
+        self.source = source
+
+    def age_seconds(self) -> float:
+        return (datetime.utcnow() - self.fetched_at).total_seconds()
+
+    def usd_rate(self, currency_code: str) -> Optional[float]:
+        if currency_code == 'USD':
+            return 1.0
+        return self.rates.get(currency_code)
+
+    def cross_rate(self, base_currency: str, target_currency: str) -> Optional[float]:
+        """Derive base→target from the USD table: (USD→target) / (USD→base)"""
+        if base_currency == target_currency:
+            return 1.0
+        usd_to_base = self.usd_rate(base_currency)
+        usd_to_target = self.usd_rate(target_currency)
+        if not usd_to_base or usd_to_target is None:
+            return None
+        return usd_to_target / usd_to_base
+
+class RateBook:
+    """
+    Process-wide, in-memory book of exchange rates.
+
+    The whole USD-base table from OpenExchangeRates is cached for `ttl_seconds`.
+    Concurrent misses share a single fetch, whether they come from worker
+    threads or the event loop: the first caller publishes an in-flight future
+    and downloads the table, everyone else waits on that future (async callers
+    through `asyncio.wrap_future`) and gets its snapshot. No lock is held while
+    the download runs. Each successful refresh is written to `exchange_rates`
+    in one transaction.
+
+    Once the background refresher has started (`background_refresh`), lookups
+    never go to the network: they serve the current snapshot, stale or not,
+    and the scheduler is responsible for keeping it fresh.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, retry_seconds: Optional[int] = None,
+                 session_factory: Optional[Callable] = None,
+                 fetcher: Optional[Callable[[], Optional[Dict[str, float]]]] = None,
+                 async_fetcher: Optional[Callable[[], Awaitable[Optional[Dict[str, float]]]]] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("EXCHANGE_RATE_TTL_SECONDS", str(4 * 3600)))
+        # After a failed fetch, callers keep using what we have for this long before trying again
+        self.retry_seconds = retry_seconds if retry_seconds is not None else int(os.getenv("EXCHANGE_RATE_RETRY_SECONDS", "60"))
+        self.api_key = os.getenv('OPENEXCHANGERATES_API_KEY')
+        self._session_factory = session_factory
+        self._fetcher = fetcher
+        self._async_fetcher = async_fetcher
+        self._snapshot: Optional[RateSnapshot] = None
+        # Guards `_inflight` only; never held across network or database I/O
+        self._lock = threading.Lock()
+        # The refresh under way, shared by sync and async callers
+        self._inflight: Optional[Future] = None
+        # Serializes cold-start loads from the database
+        self._load_lock = threading.Lock()
+        self._last_failure: Optional[datetime] = None
+        self._client: Optional[httpx.Client] = None
+
+        self.background_refresh = False
+        self.tracked_currencies: Set[str] = set()
+        # Refresh metrics
+        self.last_refresh_at: Optional[datetime] = None
+        self.last_attempt_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.refresh_successes = 0
+        self.refresh_failures = 0
+        self.consecutive_failures = 0
+
+    # ------------------------------------------------------------------ lookups
+
+    @property
+    def snapshot(self) -> Optional[RateSnapshot]:
+        return self._snapshot
+
+    def is_fresh(self, snapshot: Optional[RateSnapshot] = None) -> bool:
+        snapshot = snapshot or self._snapshot
+        return snapshot is not None and snapshot.age_seconds() < self.ttl_seconds
+
+    def get_rate(self, base_currency: str, target_currency: str) -> Optional[float]:
+        """Return base→target, refreshing the table first if it has expired"""
+        if base_currency == target_currency:
+            return 1.0
+        snapshot = self._snapshot
+        if self.background_refresh:
+            snapshot = snapshot or self.ensure_loaded()
+        elif not self.is_fresh(snapshot):
+            snapshot = self.refresh() or snapshot
+        return snapshot.cross_rate(base_currency, target_currency) if snapshot else None
+
+    async def aget_rate(self, base_currency: str, target_currency: str) -> Optional[float]:
+        """Async variant of get_rate; a refresh is awaited on the event loop"""
+        if base_currency == target_currency:
+            return 1.0
+        snapshot = self._snapshot
+        if self.background_refresh:
+            snapshot = snapshot or await asyncio.to_thread(self.ensure_loaded)
+        elif not self.is_fresh(snapshot):
+            snapshot = await self.arefresh() or snapshot
+        return snapshot.cross_rate(base_currency, target_currency) if snapshot else None
+
+    # ------------------------------------------------------------------ refresh
+
+    def refresh(self, force: bool = False) -> Optional[RateSnapshot]:
+        """Single-flight refresh of the rate table. Returns the current snapshot."""
+        future, owner = self._claim(force)
+        if future is None:
+            return self._snapshot
+        if not owner:
+            # Someone else is refreshing; share their result
+            return future.result()
+
+        try:
+            self._begin_attempt()
+            rates = self._fetch_rates()
+            snapshot = self._record_success(rates) if rates else self._fallback()
+        except BaseException:
+            self._release(future, self._snapshot)
+            raise
+        self._release(future, snapshot)
+        if rates:
+            self.persist(rates, self.tracked_currencies or None)
+        return snapshot
+
+    async def arefresh(self, force: bool = False) -> Optional[RateSnapshot]:
+        """Single-flight refresh for async callers: the download is awaited, only DB work uses a thread"""
+        future, owner = self._claim(force)
+        if future is None:
+            return self._snapshot
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            self._begin_attempt()
+            rates = await self._afetch_rates()
+            snapshot = self._record_success(rates) if rates else await asyncio.to_thread(self._fallback)
+        except BaseException:
+            self._release(future, self._snapshot)
+            raise
+        self._release(future, snapshot)
+        if rates:
+            await asyncio.to_thread(self.persist, rates, self.tracked_currencies or None)
+        return snapshot
+
+    def _claim(self, force: bool) -> Tuple[Optional[Future], bool]:
+        """
+        (future, owner): the refresh in flight to wait on, or a new one the
+        caller must run and `_release`; (None, False) when no refresh is due
+        """
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight, False
+            if not self._needs_refresh(force):
+                return None, False
+            self._inflight = Future()
+            return self._inflight, True
+
+    def _release(self, future: Future, snapshot: Optional[RateSnapshot]):
+        with self._lock:
+            self._inflight = None
+        future.set_result(snapshot)
+
+    def _fallback(self) -> Optional[RateSnapshot]:
+        """After a failed fetch: keep what we have, or seed a cold start from the last rates we stored"""
+        self._record_failure()
+        return self._snapshot or self.ensure_loaded()
+
+    def _needs_refresh(self, force: bool) -> bool:
+        if force:
+            return True
+        return not self.is_fresh() and not self._in_retry_backoff()
+
+    def _begin_attempt(self):
+        self.last_attempt_at = datetime.utcnow()
+        self.last_error = None
+
+    def _record_success(self, rates: Dict[str, float]) -> RateSnapshot:
+        snapshot = RateSnapshot(rates, self.last_attempt_at, "openexchangerates")
+        self._snapshot = snapshot
+        self._last_failure = None
+        self.last_refresh_at = self.last_attempt_at
+        self.refresh_successes += 1
+        self.consecutive_failures = 0
+        return snapshot
+
+    def _record_failure(self):
+        self._last_failure = self.last_attempt_at
+        self.refresh_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = self.last_error or "No rates returned"
+
+    def ensure_loaded(self) -> Optional[RateSnapshot]:
+        """Make sure some snapshot is in memory, reading the stored rates if needed. Never fetches."""
+        with self._load_lock:
+            if self._snapshot is None:
+                self._snapshot = self.load_from_db()
+            return self._snapshot
+
+    def refresh_active_currencies(self) -> Optional[RateSnapshot]:
+        """Scheduled job: fetch the table and store rates for every currency an active business uses"""
+        try:
+            self.tracked_currencies = self.load_active_currencies()
+        except Exception as e:
+            logger.error(f"Failed to load active business currencies: {e}")
+        snapshot = self.refresh(force=True)
+        missing = [code for code in self.tracked_currencies if snapshot is None or snapshot.usd_rate(code) is None]
+        if missing:
+            logger.warning(f"No exchange rate available for: {', '.join(sorted(missing))}")
+        return snapshot
+
+    def _in_retry_backoff(self) -> bool:
+        if self._last_failure is None:
+            return False
+        return (datetime.utcnow() - self._last_failure).total_seconds() < self.retry_seconds
+
+    def _fetch_rates(self) -> Optional[Dict[str, float]]:
+        """Download the full USD-base table"""
+        if self._fetcher is not None:
+            return self._fetcher()
+
+        if not self.api_key:
+            logger.warning("OpenExchangeRates API key not configured")
+            return None
+
+        try:
+            if self._client is None:
+                self._client = httpx.Client(timeout=10.0)
+            response = self._client.get(OPENEXCHANGERATES_URL, params={"app_id": self.api_key})
+            return self._parse_rates(response.json())
+        except Exception as e:
+            self.last_error = f"OpenExchangeRates API error: {e}"
+            logger.error(self.last_error)
+            return None
+
+    async def _afetch_rates(self) -> Optional[Dict[str, float]]:
+        """Download the full USD-base table without blocking the event loop"""
+        if self._async_fetcher is not None:
+            return await self._async_fetcher()
+        if self._fetcher is not None:
+            return await asyncio.to_thread(self._fetcher)
+
+        if not self.api_key:
+            logger.warning("OpenExchangeRates API key not configured")
+            return None
+
+        try:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.get(OPENEXCHANGERATES_URL, params={"app_id": self.api_key})
+            return self._parse_rates(response.json())
+        except Exception as e:
+            self.last_error = f"OpenExchangeRates API error: {e}"
+            logger.error(self.last_error)
+            return None
+
+    def _parse_rates(self, data: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        if 'rates' not in data:
+            self.last_error = "API response missing 'rates' field"
+            logger.error(self.last_error)
+            return None
+        return {code: float(rate) for code, rate in data['rates'].items()}
+
+    # ------------------------------------------------------------------ storage
+
+    def _open_session(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal  # Imported lazily: the engine needs DATABASE_URL
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def persist(self, rates: Dict[str, float], codes: Optional[Iterable[str]] = None) -> int:
+        """Write USD→X rows for every currency we know about (or just `codes`) in one transaction"""
+        db = self._open_session()
+        try:
+            known_codes = {code for (code,) in db.query(Currency.code).all()}
+            if codes is not None:
+                known_codes &= set(codes)
+            rows = [
+                {
+                    "base_currency": "USD",
+                    "target_currency": code,
+                    "rate": rate,
+                    "source": "openexchangerates",
+                    "is_active": True
+                }
+                for code, rate in rates.items()
+                if code in known_codes and code != 'USD'
+            ]
+            if not rows:
+                return 0
+
+            # Deactivate old rates
+            db.query(ExchangeRate).filter(
+                ExchangeRate.base_currency == 'USD',
+                ExchangeRate.target_currency.in_([row["target_currency"] for row in rows]),
+                ExchangeRate.is_active == True
+            ).update({"is_active": False}, synchronize_session=False)
+
+            db.bulk_insert_mappings(ExchangeRate, rows)
+            db.commit()
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store exchange rates: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def load_from_db(self) -> Optional[RateSnapshot]:
+        """Rebuild a snapshot from the latest active USD→X rows"""
+        db = self._open_session()
+        try:
+            rows = db.query(ExchangeRate.target_currency, ExchangeRate.rate, ExchangeRate.effective_date).filter(
+                ExchangeRate.base_currency == 'USD',
+                ExchangeRate.is_active == True,
+                ExchangeRate.rate != 0
+            ).order_by(ExchangeRate.effective_date).all()
+            if not rows:
+                return None
+
+            # Ordered oldest first, so the newest row per currency wins
+            rates = {target: float(rate) for target, rate, _ in rows}
+            fetched_at = min(effective_date for _, _, effective_date in rows)
+            return RateSnapshot(rates, fetched_at, "database")
+        except Exception as e:
+            logger.error(f"Failed to load exchange rates from database: {e}")
+            return None
+        finally:
+            db.close()
+
+    def load_active_currencies(self) -> Set[str]:
+        """Currencies of every business that still has an active user"""
+        db = self._open_session()
+        try:
+            rows = db.query(Business.currency_code).join(
+                User, User.business_id == Business.id
+            ).filter(
+                User.is_active == True,
+                Business.currency_code.isnot(None)
+            ).distinct().all()
+            return {code for (code,) in rows}
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------ metrics
+
+    def metrics(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "background_refresh": self.background_refresh,
+            "source": snapshot.source if snapshot else None,
+            "snapshot_taken_at": snapshot.fetched_at.isoformat() if snapshot else None,
+            "staleness_seconds": round(snapshot.age_seconds(), 1) if snapshot else None,
+            "ttl_seconds": self.ttl_seconds,
+            "is_stale": not self.is_fresh(snapshot),
+            "last_refresh_at": self.last_refresh_at.isoformat() if self.last_refresh_at else None,
+            "last_attempt_at": self.last_attempt_at.isoformat() if self.last_attempt_at else None,
+            "refresh_successes": self.refresh_successes,
+            "refresh_failures": self.refresh_failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "tracked_currencies": sorted(self.tracked_currencies)
+        }
+
+# Process-wide instance shared by every request
+rate_book = RateBook()
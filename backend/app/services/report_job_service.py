@@ -0,0 +1,246 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.crud.report import get_financial_report, get_inventory_report, get_sales_report
+from app.models.expense import Expense
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.models.report_job import ReportJob
+from app.models.sales_rollup import DailySalesRollup
+
+logger = logging.getLogger(__name__)
+
+# In-process workers started with the app (0 leaves the queue to other processes)
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "1"))
+# Seconds an idle worker waits before looking at the queue again
+REPORT_JOB_POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", "2"))
+# A running job whose worker has not been heard from for this long is taken over
+REPORT_JOB_STALE_SECONDS = int(os.getenv("REPORT_JOB_STALE_SECONDS", "600"))
+# Seconds between heartbeats of a running job; keep well under REPORT_JOB_STALE_SECONDS
+REPORT_JOB_HEARTBEAT_SECONDS = float(os.getenv("REPORT_JOB_HEARTBEAT_SECONDS", "30"))
+# Runs (including taken-over ones) before a job is marked failed
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+
+# report_type -> (needs a date range, builder(read_db, job))
+REPORT_BUILDERS: Dict[str, Tuple[bool, Callable[[Session, ReportJob], dict]]] = {
+    "sales": (True, lambda db, job: get_sales_report(db, job.start_date, job.end_date, job.business_id)),
+    "financial": (True, lambda db, job: get_financial_report(db, job.start_date, job.end_date, job.business_id)),
+    "inventory": (False, lambda db, job: get_inventory_report(db, job.business_id)),
+}
+
+class ReportJobService:
+    """
+    Background reports with the `report_jobs` table as queue and result cache.
+
+    Submitting a report computes its data version: a few aggregates over the
+    rows the report reads (daily rollup buckets and expenses in the range, or
+    inventory history and products). A job already done, running or queued
+    for the same business, report, range and version is returned instead of
+    a new one, so a closed period is computed once. Workers claim jobs with a
+    single UPDATE (SKIP LOCKED on Postgres) and heartbeat from a side thread
+    while the report is built; a job whose worker died is taken over once it
+    stops heartbeating. Only the worker still holding a job records its outcome.
+    """
+
+    @staticmethod
+    def submit(db: Session, read_db: Session, business_id: int, user_id: int, report_type: str,
+               start_date: Optional[date], end_date: Optional[date]) -> Tuple[ReportJob, bool]:
+        """Queue a report, or return the job that already has it. The flag is True for a finished cached result."""
+        needs_range, _ = REPORT_BUILDERS[report_type]
+        if not needs_range:
+            start_date = end_date = None
+        elif start_date > end_date:
+            raise ValueError("Start date must be before end date")
+
+        version = ReportJobService.data_version(read_db, business_id, report_type, start_date, end_date)
+        cache_key = f"{report_type}:{start_date}:{end_date}:{version}"
+        existing = db.query(ReportJob).filter(
+            ReportJob.business_id == business_id,
+            ReportJob.cache_key == cache_key,
+            ReportJob.status.in_(("queued", "running", "done"))
+        ).order_by(ReportJob.id.desc()).first()
+        if existing:
+            return existing, existing.status == "done"
+
+        job = ReportJob(business_id=business_id, user_id=user_id, report_type=report_type,
+                        start_date=start_date, end_date=end_date, cache_key=cache_key, status="queued")
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        logger.info("Queued %s report job %s for business %s", report_type, job.id, business_id,
+                    extra={"event": "report_job.queued", "job_id": job.id})
+        return job, False
+
+    @staticmethod
+    def data_version(db: Session, business_id: int, report_type: str,
+                     start_date: Optional[date], end_date: Optional[date]) -> str:
+        """Short digest that changes whenever data the report reads changes"""
+        if REPORT_BUILDERS[report_type][0]:
+            parts = list(db.query(
+                func.count(DailySalesRollup.id),
+                func.sum(DailySalesRollup.transactions),
+                func.sum(DailySalesRollup.refund_count),
+                func.sum(DailySalesRollup.sales_usd),
+                func.max(DailySalesRollup.updated_at)
+            ).filter(
+                DailySalesRollup.business_id == business_id,
+                DailySalesRollup.sale_date >= start_date,
+                DailySalesRollup.sale_date <= end_date
+            ).one())
+            if report_type == "financial":
+                parts += db.query(func.count(Expense.id), func.max(Expense.id), func.sum(Expense.amount)).filter(
+                    Expense.business_id == business_id,
+                    Expense.date >= datetime.combine(start_date, datetime.min.time()),
+                    Expense.date <= datetime.combine(end_date, datetime.max.time())
+                ).one()
+        else:
+            parts = [
+                db.query(func.max(InventoryHistory.id)).filter(InventoryHistory.business_id == business_id).scalar(),
+                *db.query(func.count(Product.id), func.sum(Product.stock_quantity), func.max(Product.updated_at))
+                .filter(Product.business_id == business_id).one()
+            ]
+        return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:16]
+
+    @staticmethod
+    def claim(db: Session, worker_id: str) -> Optional[int]:
+        """Take the oldest claimable job for `worker_id` and commit; None when the queue is empty"""
+        now = datetime.now()
+        claimable = or_(
+            ReportJob.status == "queued",
+            and_(ReportJob.status == "running",
+                 ReportJob.heartbeat_at < now - timedelta(seconds=REPORT_JOB_STALE_SECONDS))
+        )
+        next_job = select(ReportJob.id).where(claimable).order_by(ReportJob.id).limit(1) \
+            .with_for_update(skip_locked=True).scalar_subquery()
+        job_id = db.execute(
+            update(ReportJob).where(ReportJob.id == next_job, claimable).values(
+                status="running", worker_id=worker_id, attempts=ReportJob.attempts + 1,
+                started_at=now, heartbeat_at=now, error=None
+            ).returning(ReportJob.id),
+            execution_options={"synchronize_session": False}
+        ).scalar()
+        db.commit()
+        return job_id
+
+    @staticmethod
+    def heartbeat(db: Session, job_id: int, worker_id: str) -> bool:
+        """Mark the job as still being worked on; False once another worker has taken it over"""
+        updated = db.execute(
+            update(ReportJob).where(
+                ReportJob.id == job_id, ReportJob.worker_id == worker_id, ReportJob.status == "running"
+            ).values(heartbeat_at=datetime.now()),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        db.commit()
+        return updated == 1
+
+    @staticmethod
+    @contextmanager
+    def _heartbeating(session_factory: Callable[[], Session], job_id: int, worker_id: str):
+        """Heartbeat `job_id` every REPORT_JOB_HEARTBEAT_SECONDS from a side thread while the block runs"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(REPORT_JOB_HEARTBEAT_SECONDS):
+                db = session_factory()
+                try:
+                    if not ReportJobService.heartbeat(db, job_id, worker_id):
+                        return
+                except Exception as e:
+                    logger.warning("Report job %s heartbeat failed: %s", job_id, e)
+                finally:
+                    db.close()
+
+        ticker = threading.Thread(target=beat, name=f"report-job-{job_id}-heartbeat", daemon=True)
+        ticker.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            ticker.join()
+
+    @staticmethod
+    def run_next(session_factory: Callable[[], Session], read_session_factory: Callable[[], Session],
+                 worker_id: str) -> Optional[int]:
+        """Claim and run one job; returns its id, or None when there was nothing to do"""
+        db = session_factory()
+        try:
+            job_id = ReportJobService.claim(db, worker_id)
+            if job_id is None:
+                return None
+            job = db.get(ReportJob, job_id)
+            if job.attempts > REPORT_JOB_MAX_ATTEMPTS:
+                ReportJobService._finish(db, job, worker_id, "failed",
+                                         error=f"Gave up after {job.attempts - 1} attempts")
+                return job_id
+
+            started = time.perf_counter()
+            try:
+                with ReportJobService._heartbeating(session_factory, job_id, worker_id):
+                    read_db = read_session_factory()
+                    try:
+                        result = jsonable_encoder(REPORT_BUILDERS[job.report_type][1](read_db, job))
+                    finally:
+                        read_db.close()
+            except Exception as e:
+                db.rollback()
+                status = "failed" if job.attempts >= REPORT_JOB_MAX_ATTEMPTS else "queued"
+                logger.warning("Report job %s attempt %s failed: %s", job_id, job.attempts, e,
+                               extra={"event": "report_job.failed", "job_id": job_id})
+                ReportJobService._finish(db, job, worker_id, status, error=str(e))
+                return job_id
+
+            if ReportJobService._finish(db, job, worker_id, "done", result=result):
+                logger.info("Report job %s (%s) done in %.2fs", job_id, job.report_type, time.perf_counter() - started,
+                            extra={"event": "report_job.done", "job_id": job_id})
+            return job_id
+        finally:
+            db.close()
+
+    @staticmethod
+    def run_pending(session_factory: Callable[[], Session], read_session_factory: Callable[[], Session],
+                    limit: Optional[int] = None) -> int:
+        """Run jobs until the queue is empty (or `limit` jobs ran); returns how many ran"""
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        ran = 0
+        while limit is None or ran < limit:
+            if ReportJobService.run_next(session_factory, read_session_factory, worker_id) is None:
+                break
+            ran += 1
+        return ran
+
+    @staticmethod
+    def get_job(db: Session, job_id: int, business_id: int) -> Optional[ReportJob]:
+        return db.query(ReportJob).filter(ReportJob.id == job_id, ReportJob.business_id == business_id).first()
+
+    @staticmethod
+    def _finish(db: Session, job: ReportJob, worker_id: str, status: str, result: Optional[dict] = None,
+                error: Optional[str] = None) -> bool:
+        """Record the outcome of this worker's run; False (and nothing written) if the job was taken over"""
+        values = {"status": status, "error": error}
+        if status == "done":
+            values["result"] = result
+        if status in ("done", "failed"):
+            values["finished_at"] = datetime.now()
+        updated = db.execute(
+            update(ReportJob).where(
+                ReportJob.id == job.id, ReportJob.worker_id == worker_id, ReportJob.status == "running"
+            ).values(**values),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        db.commit()
+        if not updated:
+            logger.warning("Report job %s was taken over by another worker; dropping this run's outcome", job.id,
+                           extra={"event": "report_job.lost", "job_id": job.id})
+        return updated == 1
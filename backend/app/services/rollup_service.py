@@ -0,0 +1,386 @@
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.dashboard_cache import dashboard_cache
+from app.models.sale import Sale, SaleItem
+from app.models.payment import Payment
+from app.models.product import Product
+from app.models.refund import Refund
+from app.models.sales_rollup import DailySalesRollup
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEYS = ("business_id", "sale_date", "currency_code", "payment_method")
+METRICS = (
+    "sales_usd", "sales_original", "tax_usd", "tax_original", "transactions", "items_sold",
+    "cogs_usd", "cogs_original", "payment_count", "payments_usd", "payments_original",
+    "refunds_usd", "refunds_original", "refund_count"
+)
+UNKNOWN_METHOD = "unknown"
+
+class RollupService:
+    """
+    Maintains and reads the `daily_sales_rollup` fact table.
+
+    Writers add deltas to a bucket with one upsert per payment method, inside the
+    caller's transaction. The bucket's day is taken from the source row's own
+    `created_at` in SQL, so it always matches `func.date(Sale.created_at)`.
+    COGS uses product cost at the time the delta is written; `rebuild` uses current cost.
+    """
+
+    # ------------------------------------------------------------------ writers
+
+    @staticmethod
+    def add(db: Session, source_model, source_id: int, business_id: int, currency_code: Optional[str],
+            payment_method: Optional[str], deltas: Dict[str, float]):
+        """Add `deltas` to the bucket of the day `source_model` row `source_id` was created"""
+        dashboard_cache.mark_changed(db, business_id)
+        table = DailySalesRollup.__table__
+        currency_code = currency_code or 'USD'
+        payment_method = payment_method or UNKNOWN_METHOD
+        dialect = db.get_bind().dialect.name
+
+        if dialect not in ("postgresql", "sqlite"):
+            RollupService._add_portable(db, source_model, source_id, business_id, currency_code, payment_method, deltas)
+            return
+
+        source_row = select(
+            literal(business_id, table.c.business_id.type),
+            func.date(source_model.created_at),
+            literal(currency_code, table.c.currency_code.type),
+            literal(payment_method, table.c.payment_method.type),
+            *[literal(deltas.get(metric, 0), table.c[metric].type) for metric in METRICS]
+        ).where(source_model.id == source_id)
+
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table).from_select(list(BUCKET_KEYS) + list(METRICS), source_row)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(BUCKET_KEYS),
+            set_={
+                **{metric: table.c[metric] + stmt.excluded[metric] for metric in METRICS},
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def _add_portable(db: Session, source_model, source_id: int, business_id: int, currency_code: str,
+                      payment_method: str, deltas: Dict[str, float]):
+        sale_date = db.query(func.date(source_model.created_at)).filter(source_model.id == source_id).scalar()
+        if isinstance(sale_date, str):
+            sale_date = date.fromisoformat(sale_date)
+        bucket = db.query(DailySalesRollup).filter(
+            DailySalesRollup.business_id == business_id,
+            DailySalesRollup.sale_date == sale_date,
+            DailySalesRollup.currency_code == currency_code,
+            DailySalesRollup.payment_method == payment_method
+        ).with_for_update().first()
+        if bucket is None:
+            bucket = DailySalesRollup(
+                business_id=business_id, sale_date=sale_date, currency_code=currency_code,
+                payment_method=payment_method, **{metric: 0 for metric in METRICS}
+            )
+            db.add(bucket)
+        for metric, value in deltas.items():
+            setattr(bucket, metric, getattr(bucket, metric) + value)
+        db.flush()
+
+    @staticmethod
+    def record_sale(db: Session, sale: Sale, sale_deltas: Dict[str, float],
+                    payments: List[Tuple[str, float, float]]):
+        """
+        Add a completed sale. `payments` is [(method, usd_amount, original_amount)] in
+        payment order; the first payment's method carries the sale totals.
+        """
+        for method, deltas in RollupService._sale_buckets(sale_deltas, payments).items():
+            RollupService.add(db, Sale, sale.id, sale.business_id, sale.original_currency, method, deltas)
+
+    @staticmethod
+    def record_sales(db: Session, sales: List[Tuple[Sale, Dict[str, float], List[Tuple[str, float, float]]]]):
+        """
+        `record_sale` for many flushed sales of one business: deltas are summed
+        per day, currency and payment method, so each bucket gets one upsert.
+        """
+        if not sales:
+            return
+        sale_dates = dict(db.query(Sale.id, func.date(Sale.created_at)).filter(
+            Sale.id.in_([sale.id for sale, _, _ in sales])
+        ).all())
+
+        buckets: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        representatives: Dict[tuple, int] = {}
+        for sale, sale_deltas, payments in sales:
+            for method, deltas in RollupService._sale_buckets(sale_deltas, payments).items():
+                key = (sale_dates[sale.id], sale.original_currency, method)
+                # Any sale of the bucket's day names the day for `add`
+                representatives.setdefault(key, sale.id)
+                for metric, value in deltas.items():
+                    buckets[key][metric] += value
+
+        business_id = sales[0][0].business_id
+        for key, deltas in buckets.items():
+            _, currency_code, method = key
+            RollupService.add(db, Sale, representatives[key], business_id, currency_code, method, deltas)
+
+    @staticmethod
+    def _sale_buckets(sale_deltas: Dict[str, float],
+                      payments: List[Tuple[str, float, float]]) -> Dict[str, Dict[str, float]]:
+        per_method: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        primary_method = payments[0][0] if payments else UNKNOWN_METHOD
+        for key, value in sale_deltas.items():
+            per_method[primary_method][key] += value
+        for method, usd_amount, original_amount in payments:
+            per_method[method]["payment_count"] += 1
+            per_method[method]["payments_usd"] += usd_amount
+            per_method[method]["payments_original"] += original_amount
+        return per_method
+
+    @staticmethod
+    def sale_deltas(sale: Sale, lines: Iterable[Tuple[int, Optional[float], Optional[float]]], sign: int = 1) -> Dict[str, float]:
+        """Sale-level facts; `lines` is [(quantity, cost_price_usd, cost_price_original)]"""
+        rate = sale.exchange_rate_at_sale or 0
+        tax_usd = sale.tax_amount or 0.0
+        deltas = {
+            "sales_usd": sale.total_amount or 0.0,
+            "sales_original": sale.original_amount or 0.0,
+            "tax_usd": tax_usd,
+            "tax_original": tax_usd / rate if rate else tax_usd,
+            "transactions": 1,
+            "items_sold": 0,
+            "cogs_usd": 0.0,
+            "cogs_original": 0.0
+        }
+        for quantity, cost_usd, cost_original in lines:
+            deltas["items_sold"] += quantity
+            deltas["cogs_usd"] += quantity * (cost_usd or 0)
+            deltas["cogs_original"] += quantity * (cost_original or 0)
+        return {key: value * sign for key, value in deltas.items()}
+
+    @staticmethod
+    def primary_payment_method(sale: Sale) -> str:
+        if not sale.payments:
+            return UNKNOWN_METHOD
+        return min(sale.payments, key=lambda payment: payment.id).payment_method
+
+    @staticmethod
+    def record_refund(db: Session, refund: Refund, payment_method: str):
+        """Add a processed refund to the bucket of the day it was processed"""
+        RollupService.add(db, Refund, refund.id, refund.business_id, refund.original_currency, payment_method, {
+            "refunds_usd": refund.total_amount or 0.0,
+            "refunds_original": refund.original_amount or 0.0,
+            "refund_count": 1
+        })
+
+    @staticmethod
+    def reverse_sale(db: Session, sale: Sale, payment_method: str):
+        """Take a sale that left the 'completed' state out of its day's sales totals"""
+        lines = [
+            (item.quantity, item.product.cost_price if item.product else 0,
+             item.product.original_cost_price if item.product else 0)
+            for item in sale.sale_items
+        ]
+        RollupService.add(db, Sale, sale.id, sale.business_id, sale.original_currency, payment_method,
+                          RollupService.sale_deltas(sale, lines, sign=-1))
+
+    # ------------------------------------------------------------------ readers
+
+    @staticmethod
+    def _range_filter(start_date: date, end_date: date, business_id: Optional[int]):
+        filters = [DailySalesRollup.sale_date >= start_date, DailySalesRollup.sale_date <= end_date]
+        if business_id is not None:
+            filters.append(DailySalesRollup.business_id == business_id)
+        return filters
+
+    @staticmethod
+    def sales_summary(db: Session, start_date: date, end_date: date, business_id: Optional[int] = None) -> Dict:
+        """Totals, payment method counts and primary currency for a date range"""
+        filters = RollupService._range_filter(start_date, end_date, business_id)
+        rows = db.query(
+            DailySalesRollup.currency_code,
+            DailySalesRollup.payment_method,
+            func.sum(DailySalesRollup.sales_usd),
+            func.sum(DailySalesRollup.sales_original),
+            func.sum(DailySalesRollup.tax_usd),
+            func.sum(DailySalesRollup.transactions),
+            func.sum(DailySalesRollup.payment_count)
+        ).filter(*filters).group_by(
+            DailySalesRollup.currency_code, DailySalesRollup.payment_method
+        ).all()
+
+        total_sales = total_sales_original = total_tax = 0.0
+        total_transactions = 0
+        payment_methods: Dict[str, int] = defaultdict(int)
+        transactions_by_currency: Dict[str, int] = defaultdict(int)
+        for currency_code, method, sales_usd, sales_original, tax_usd, transactions, payment_count in rows:
+            total_sales += float(sales_usd or 0)
+            total_sales_original += float(sales_original or 0)
+            total_tax += float(tax_usd or 0)
+            total_transactions += int(transactions or 0)
+            transactions_by_currency[currency_code] += int(transactions or 0)
+            if payment_count:
+                payment_methods[method] += int(payment_count)
+
+        primary_currency = 'USD'
+        if any(transactions_by_currency.values()):
+            primary_currency = max(transactions_by_currency.items(), key=lambda item: item[1])[0]
+
+        return {
+            "total_sales": total_sales,
+            "total_sales_original": total_sales_original,
+            "total_tax": total_tax,
+            "total_transactions": total_transactions,
+            "average_transaction_value": total_sales / total_transactions if total_transactions else 0.0,
+            "payment_methods": dict(payment_methods),
+            "primary_currency": primary_currency
+        }
+
+    @staticmethod
+    def daily_trends(db: Session, start_date: date, end_date: date, business_id: Optional[int] = None) -> List[Dict]:
+        """One entry per day with completed sales, ordered by date"""
+        rows = db.query(
+            DailySalesRollup.sale_date,
+            func.sum(DailySalesRollup.sales_usd).label('daily_sales'),
+            func.sum(DailySalesRollup.sales_original).label('daily_sales_original'),
+            func.sum(DailySalesRollup.transactions).label('transactions')
+        ).filter(
+            *RollupService._range_filter(start_date, end_date, business_id)
+        ).group_by(DailySalesRollup.sale_date).having(
+            func.sum(DailySalesRollup.transactions) > 0
+        ).order_by(DailySalesRollup.sale_date).all()
+
+        return [
+            {
+                "date": row.sale_date,
+                "daily_sales": float(row.daily_sales or 0),
+                "daily_sales_original": float(row.daily_sales_original or 0),
+                "transactions": int(row.transactions or 0),
+                "average_order_value": float(row.daily_sales or 0) / row.transactions if row.transactions else 0.0
+            }
+            for row in rows
+        ]
+
+    # ------------------------------------------------------------------ rebuild
+
+    @staticmethod
+    def rebuild(db: Session, business_id: Optional[int] = None, start_date: Optional[date] = None,
+                end_date: Optional[date] = None) -> int:
+        """
+        Regenerate rollup rows from raw sales, payments and refunds for an optional business
+        and date range. Replaces the affected rows in one transaction; returns the row count.
+        """
+        buckets: Dict[tuple, Dict[str, float]] = defaultdict(lambda: {metric: 0 for metric in METRICS})
+
+        def bucket_key(business, day, currency, method):
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            return business, day, currency or 'USD', method or UNKNOWN_METHOD
+
+        def in_range(created_at, query):
+            query = query.filter(Sale.business_id.isnot(None))
+            if business_id is not None:
+                query = query.filter(Sale.business_id == business_id)
+            if start_date is not None:
+                query = query.filter(func.date(created_at) >= start_date)
+            if end_date is not None:
+                query = query.filter(func.date(created_at) <= end_date)
+            return query
+
+        primary_payment = db.query(
+            Payment.sale_id.label('sale_id'), func.min(Payment.id).label('payment_id')
+        ).group_by(Payment.sale_id).subquery()
+        primary = db.query(
+            primary_payment.c.sale_id, Payment.payment_method
+        ).join(Payment, Payment.id == primary_payment.c.payment_id).subquery()
+
+        sale_day = func.date(Sale.created_at)
+        sale_group = (Sale.business_id, sale_day, Sale.original_currency, primary.c.payment_method)
+
+        # Sale-level totals
+        sales = in_range(Sale.created_at, db.query(
+            *sale_group,
+            func.sum(Sale.total_amount), func.sum(Sale.original_amount), func.sum(Sale.tax_amount),
+            func.sum(func.coalesce(Sale.tax_amount / func.nullif(Sale.exchange_rate_at_sale, 0), Sale.tax_amount)),
+            func.count(Sale.id)
+        ).outerjoin(primary, primary.c.sale_id == Sale.id).filter(
+            Sale.payment_status == 'completed'
+        )).group_by(*sale_group)
+        for business, day, currency, method, sales_usd, sales_original, tax_usd, tax_original, count in sales:
+            bucket = buckets[bucket_key(business, day, currency, method)]
+            bucket.update(sales_usd=sales_usd or 0, sales_original=sales_original or 0, tax_usd=tax_usd or 0,
+                          tax_original=tax_original or 0, transactions=count)
+
+        # Item-level facts, aggregated separately so sales are not repeated per line
+        items = in_range(Sale.created_at, db.query(
+            *sale_group,
+            func.sum(SaleItem.quantity),
+            func.sum(SaleItem.quantity * func.coalesce(Product.cost_price, 0)),
+            func.sum(SaleItem.quantity * func.coalesce(Product.original_cost_price, 0))
+        ).select_from(SaleItem).join(Sale, Sale.id == SaleItem.sale_id).join(
+            Product, Product.id == SaleItem.product_id
+        ).outerjoin(primary, primary.c.sale_id == Sale.id).filter(
+            Sale.payment_status == 'completed'
+        )).group_by(*sale_group)
+        for business, day, currency, method, quantity, cogs_usd, cogs_original in items:
+            bucket = buckets[bucket_key(business, day, currency, method)]
+            bucket.update(items_sold=quantity or 0, cogs_usd=cogs_usd or 0, cogs_original=cogs_original or 0)
+
+        # Payments, by their own method
+        payment_group = (Sale.business_id, sale_day, Sale.original_currency, Payment.payment_method)
+        payments = in_range(Sale.created_at, db.query(
+            *payment_group,
+            func.count(Payment.id), func.sum(Payment.amount),
+            func.sum(func.coalesce(Payment.original_amount, Payment.amount / func.nullif(Sale.exchange_rate_at_sale, 0)))
+        ).join(Sale, Sale.id == Payment.sale_id).filter(
+            Payment.status == 'completed'
+        )).group_by(*payment_group)
+        for business, day, currency, method, count, amount_usd, amount_original in payments:
+            bucket = buckets[bucket_key(business, day, currency, method)]
+            bucket.update(payment_count=count, payments_usd=amount_usd or 0, payments_original=amount_original or 0)
+
+        # Refunds, by the day they were processed
+        refund_day = func.date(Refund.created_at)
+        refund_group = (Refund.business_id, refund_day, Refund.original_currency, primary.c.payment_method)
+        refunds = db.query(
+            *refund_group,
+            func.sum(Refund.total_amount), func.sum(Refund.original_amount), func.count(Refund.id)
+        ).outerjoin(primary, primary.c.sale_id == Refund.sale_id).filter(
+            Refund.status == 'processed', Refund.business_id.isnot(None)
+        )
+        if business_id is not None:
+            refunds = refunds.filter(Refund.business_id == business_id)
+        if start_date is not None:
+            refunds = refunds.filter(refund_day >= start_date)
+        if end_date is not None:
+            refunds = refunds.filter(refund_day <= end_date)
+        for business, day, currency, method, amount_usd, amount_original, count in refunds.group_by(*refund_group):
+            bucket = buckets[bucket_key(business, day, currency, method)]
+            bucket.update(refunds_usd=amount_usd or 0, refunds_original=amount_original or 0, refund_count=count)
+
+        try:
+            stale = db.query(DailySalesRollup)
+            if business_id is not None:
+                stale = stale.filter(DailySalesRollup.business_id == business_id)
+            if start_date is not None:
+                stale = stale.filter(DailySalesRollup.sale_date >= start_date)
+            if end_date is not None:
+                stale = stale.filter(DailySalesRollup.sale_date <= end_date)
+            stale.delete(synchronize_session=False)
+
+            rows = [
+                {**dict(zip(BUCKET_KEYS, key)), **{metric: float(value) if metric.endswith(("_usd", "_original")) else int(value)
+                                                   for metric, value in metrics.items()}}
+                for key, metrics in buckets.items()
+            ]
+            if rows:
+                db.execute(DailySalesRollup.__table__.insert(), rows)
+            db.commit()
+            logger.info(f"Rebuilt {len(rows)} daily sales rollup rows")
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            raise e
+
@@ -0,0 +1,243 @@
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.models.business import Business
+from app.models.sale import Sale, SaleItem
+from app.models.payment import Payment
+from app.models.sale_ingest import SaleIngestKey
+from app.schemas.sale_schema import QueuedSaleCreate
+from app.services.activity_service import ActivityService
+from app.services.checkout_service import CheckoutService
+from app.services.event_bus import event_bus
+from app.services.inventory_ledger import InventoryLedger
+from app.services.rollup_service import RollupService
+from app.services.sequence_service import SequenceService
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Queued sales written per transaction by the bulk ingestion endpoint
+SALE_INGEST_CHUNK_SIZE = int(os.getenv("SALE_INGEST_CHUNK_SIZE", "200"))
+
+class SaleIngestService:
+    """
+    Bulk ingestion of sales queued by offline tills.
+
+    Each chunk of a batch is one transaction that costs a fixed number of
+    statements whatever its size: the chunk's idempotency keys are claimed
+    with one insert, its products are locked once and stock is taken with one
+    conditional update, sale numbers come from one sequence bump, and items,
+    payments, history and rollup deltas are written in bulk. A sale that
+    cannot be made (unknown product, not enough stock, payments that do not
+    match) is rejected on its own and its key left free for a retry; the rest
+    of the chunk goes through.
+    """
+
+    @staticmethod
+    def ingest(db: Session, business: Business, user_id: int, sales: List[QueuedSaleCreate],
+               current_rate: float = 1.0, chunk_size: int = SALE_INGEST_CHUNK_SIZE) -> List[dict]:
+        """Create `sales` in order and return one result per sale, in request order"""
+        results: Dict[str, dict] = {}
+        unique: List[QueuedSaleCreate] = []
+        for sale_data in sales:
+            if sale_data.idempotency_key not in results:
+                results[sale_data.idempotency_key] = None
+                unique.append(sale_data)
+
+        for start in range(0, len(unique), max(chunk_size, 1)):
+            chunk = unique[start:start + max(chunk_size, 1)]
+            try:
+                results.update(SaleIngestService._ingest_chunk(db, business, user_id, chunk, current_rate))
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Failed to ingest %s queued sales for business %s", len(chunk), business.id)
+                for sale_data in chunk:
+                    results[sale_data.idempotency_key] = SaleIngestService._result(
+                        sale_data.idempotency_key, "failed", error="Failed to ingest sale")
+
+        # A key repeated within the batch reports the sale made for its first occurrence
+        ordered, seen = [], set()
+        for sale_data in sales:
+            key = sale_data.idempotency_key
+            result = results[key]
+            if key in seen and result["status"] in ("created", "duplicate"):
+                result = {**result, "status": "duplicate"}
+            seen.add(key)
+            ordered.append(result)
+
+        counts = {status: sum(1 for result in ordered if result["status"] == status)
+                  for status in ("created", "duplicate", "rejected", "failed")}
+        logger.info("Ingested %s queued sales for business %s: %s", len(sales), business.id, counts,
+                    extra={"event": "sale.batch_ingested", "business_id": business.id, "counts": counts})
+        return ordered
+
+    @staticmethod
+    def _ingest_chunk(db: Session, business: Business, user_id: int, chunk: List[QueuedSaleCreate],
+                      current_rate: float) -> Dict[str, dict]:
+        results: Dict[str, dict] = {}
+        keys = [sale_data.idempotency_key for sale_data in chunk]
+        claimed = SaleIngestService.claim(db, business.id, keys)
+        duplicates = [key for key in keys if key not in claimed]
+        for key, sale_id, business_sale_number in SaleIngestService.existing(db, business.id, duplicates):
+            results[key] = SaleIngestService._result(key, "duplicate", sale_id, business_sale_number)
+
+        # A key held by another upload that then rolled back is neither claimed
+        # nor used: claim it again, and ask for a retry if that loses too
+        unresolved = [key for key in duplicates if key not in results]
+        if unresolved:
+            claimed.update(SaleIngestService.claim(db, business.id, unresolved))
+            lost = [key for key in unresolved if key not in claimed]
+            for key, sale_id, business_sale_number in SaleIngestService.existing(db, business.id, lost):
+                results[key] = SaleIngestService._result(key, "duplicate", sale_id, business_sale_number)
+            for key in lost:
+                if key not in results:
+                    results[key] = SaleIngestService._result(
+                        key, "failed", error="Sale is being uploaded by another request; retry")
+
+        candidates: List[Tuple[QueuedSaleCreate, Dict[str, float]]] = []
+        for sale_data in chunk:
+            if sale_data.idempotency_key not in claimed:
+                continue
+            try:
+                candidates.append((sale_data, CheckoutService.calculate_totals(sale_data)))
+            except ValueError as e:
+                results[sale_data.idempotency_key] = SaleIngestService._result(sale_data.idempotency_key, "rejected", error=str(e))
+
+        # Decide against the locked stock, in upload order, which sales can be made
+        product_ids = {item.product_id for sale_data, _ in candidates for item in sale_data.sale_items}
+        products = InventoryLedger.lock(db, product_ids) if product_ids else {}
+        available = {product_id: product.stock_quantity for product_id, product in products.items()}
+        accepted: List[Tuple[QueuedSaleCreate, Dict[str, float]]] = []
+        changes: Dict[int, int] = {}
+        for sale_data, totals in candidates:
+            error = SaleIngestService._stock_error(sale_data, products, available)
+            if error:
+                results[sale_data.idempotency_key] = SaleIngestService._result(sale_data.idempotency_key, "rejected", error=error)
+                continue
+            for item in sale_data.sale_items:
+                available[item.product_id] -= item.quantity
+                changes[item.product_id] = changes.get(item.product_id, 0) - item.quantity
+            accepted.append((sale_data, totals))
+
+        rejected = [claimed[key] for key, result in results.items() if result["status"] == "rejected" and key in claimed]
+        if rejected:
+            db.execute(delete(SaleIngestKey).where(SaleIngestKey.id.in_(rejected)))
+        if not accepted:
+            return results
+
+        levels = InventoryLedger.apply(db, changes, lock=False)
+
+        db_sales = [
+            CheckoutService.build_sale(sale_data, totals, user_id, business, current_rate, sale_data.occurred_at)
+            for sale_data, totals in accepted
+        ]
+        db.add_all(db_sales)
+        db.flush()
+
+        local_currency = business.currency_code or 'USD'
+        item_rows, payment_rows = [], []
+        for db_sale, (sale_data, _) in zip(db_sales, accepted):
+            item_rows.extend(CheckoutService.item_rows(db_sale.id, sale_data, current_rate))
+            payment_rows.extend(CheckoutService.payment_rows(db_sale.id, sale_data, local_currency, current_rate))
+        db.execute(insert(SaleItem), item_rows)
+        if payment_rows:
+            db.execute(insert(Payment), payment_rows)
+
+        # Business-wide rows from here on, as in checkout
+        first_number = SequenceService.reserve_block(db, business.id, 'sale', len(db_sales))
+        for offset, db_sale in enumerate(db_sales):
+            db_sale.business_sale_number = first_number + offset
+        db.flush()
+
+        InventoryLedger.record_batches(db, business.id, user_id, "sale", [
+            (f"Sale #{db_sale.business_sale_number}", [(item.product_id, -item.quantity) for item in sale_data.sale_items])
+            for db_sale, (sale_data, _) in zip(db_sales, accepted)
+        ], levels)
+
+        db.execute(update(SaleIngestKey), [
+            {"id": claimed[sale_data.idempotency_key], "sale_id": db_sale.id}
+            for db_sale, (sale_data, _) in zip(db_sales, accepted)
+        ])
+
+        RollupService.record_sales(db, [
+            (
+                db_sale,
+                RollupService.sale_deltas(db_sale, [
+                    (item.quantity, products[item.product_id].cost_price, products[item.product_id].original_cost_price)
+                    for item in sale_data.sale_items
+                ]),
+                [(payment.payment_method, payment.amount * current_rate, payment.amount) for payment in sale_data.payments]
+            )
+            for db_sale, (sale_data, _) in zip(db_sales, accepted)
+        ])
+
+        now = datetime.now()
+        for db_sale, (sale_data, _) in zip(db_sales, accepted):
+            event_bus.publish(db, business.id, "sale", ActivityService.sale_activity(db_sale, sale_data.occurred_at or now))
+            results[sale_data.idempotency_key] = SaleIngestService._result(
+                sale_data.idempotency_key, "created", db_sale.id, db_sale.business_sale_number)
+        return results
+
+    @staticmethod
+    def claim(db: Session, business_id: int, keys: List[str]) -> Dict[str, int]:
+        """
+        Insert the keys nobody holds yet and return {key: claim id} for them.
+        A key claimed by a transaction still in flight is waited for, not taken twice.
+        """
+        if not keys:
+            return {}
+        table = SaleIngestKey.__table__
+        dialect = db.get_bind().dialect.name
+
+        if dialect not in ("postgresql", "sqlite"):
+            taken = {key for (key,) in db.query(SaleIngestKey.idempotency_key).filter(
+                SaleIngestKey.business_id == business_id, SaleIngestKey.idempotency_key.in_(keys))}
+            keys = [key for key in keys if key not in taken]
+            if not keys:
+                return {}
+            rows = db.execute(
+                insert(table).returning(table.c.idempotency_key, table.c.id),
+                [{"business_id": business_id, "idempotency_key": key} for key in keys]
+            ).all()
+            return dict(rows)
+
+        insert_ = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert_(table).values(
+            [{"business_id": business_id, "idempotency_key": key} for key in keys]
+        ).on_conflict_do_nothing(
+            index_elements=["business_id", "idempotency_key"]
+        ).returning(table.c.idempotency_key, table.c.id)
+        return dict(db.execute(stmt).all())
+
+    @staticmethod
+    def existing(db: Session, business_id: int, keys: List[str]) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """(key, sale_id, business_sale_number) for keys already used by earlier uploads"""
+        if not keys:
+            return []
+        return db.execute(
+            select(SaleIngestKey.idempotency_key, SaleIngestKey.sale_id, Sale.business_sale_number)
+            .outerjoin(Sale, Sale.id == SaleIngestKey.sale_id)
+            .where(SaleIngestKey.business_id == business_id, SaleIngestKey.idempotency_key.in_(keys))
+        ).all()
+
+    @staticmethod
+    def _stock_error(sale_data: QueuedSaleCreate, products, available: Dict[int, int]) -> Optional[str]:
+        requested: Dict[int, int] = {}
+        for item in sale_data.sale_items:
+            if item.product_id not in products:
+                return f"Product with ID {item.product_id} not found"
+            requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+        for product_id, quantity in requested.items():
+            if available[product_id] < quantity:
+                return f"Insufficient stock for product {products[product_id].name}"
+        return None
+
+    @staticmethod
+    def _result(key: str, status: str, sale_id: Optional[int] = None, business_sale_number: Optional[int] = None,
+                error: Optional[str] = None) -> dict:
+        return {"idempotency_key": key, "status": status, "sale_id": sale_id,
+                "business_sale_number": business_sale_number, "error": error}
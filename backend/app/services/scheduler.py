@@ -1,7 +1,13 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app.services.barcode_service import barcode_service
+from app.services.event_bus import event_bus
+from app.services.rate_book import rate_book
+from app.services.report_job_service import REPORT_JOB_POLL_SECONDS, REPORT_JOB_WORKERS, ReportJobService
+from app.database import ReadSessionLocal, SessionLocal, engine
 
 logger = logging.getLogger(__name__)
 
@@ -32,10 +38,31 @@ class BackgroundScheduler:
 # Global scheduler instance
 scheduler = BackgroundScheduler()
 
+EXCHANGE_RATE_REFRESH_SECONDS = int(os.getenv("EXCHANGE_RATE_REFRESH_SECONDS", "3600"))
+
+async def refresh_exchange_rates():
+    """Prefetch rates for every active business currency so requests never fetch inline"""
+    await asyncio.to_thread(rate_book.refresh_active_currencies)
+
+async def process_report_jobs():
+    """Drain the report job queue on a worker thread"""
+    await asyncio.to_thread(ReportJobService.run_pending, SessionLocal, ReadSessionLocal)
+
+async def warm_barcode_cache():
+    """Load the active catalogs into the barcode cache so the first scans at each till are hits"""
+    await asyncio.to_thread(barcode_service.warm_cache, SessionLocal)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Initialize background tasks
-    # Example: scheduler.add_task(3600, cleanup_old_data)  # Every hour
+    rate_book.background_refresh = True
+    scheduler.add_task(EXCHANGE_RATE_REFRESH_SECONDS, refresh_exchange_rates)
+    for _ in range(REPORT_JOB_WORKERS):
+        scheduler.add_task(REPORT_JOB_POLL_SECONDS, process_report_jobs)
+    scheduler.tasks.append(asyncio.create_task(warm_barcode_cache()))
+    # Other workers' events over LISTEN/NOTIFY (EVENT_BUS_NOTIFY, Postgres only)
+    event_bus.start_listener(engine)
     yield
     # Shutdown: Clean up tasks
+    event_bus.stop_listener()
     await scheduler.shutdown()
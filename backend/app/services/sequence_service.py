@@ -1,68 +1,135 @@
 # ~/Bizzy_store/backend/app/services/sequence_service.py - FIXED VERSION
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Tuple
 from app.models.business_sequence import BusinessSequence
-import time
+import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Numbers per block for block-allocated entity types (1 or less turns blocks off)
+SEQUENCE_BLOCK_SIZE = int(os.getenv("SEQUENCE_BLOCK_SIZE", "100"))
+
+class SequenceBlocks:
+    """
+    Per-process blocks of reserved sequence numbers, keyed by engine, business
+    and entity type. A block is reserved in its own short transaction, so the
+    transactions that use the numbers never lock the sequence row. Each key
+    has its own lock: refilling one business's block does not hold up the
+    others.
+    """
+
+    def __init__(self, block_size: int = SEQUENCE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()  # guards _key_locks
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._blocks: Dict[tuple, Tuple[int, int]] = {}  # key -> (next number, last number)
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def take(self, engine, business_id: int, entity_type: str, count: int) -> List[int]:
+        numbers: List[int] = []
+        key = (engine, business_id, entity_type)
+        with self._key_lock(key):
+            while len(numbers) < count:
+                next_number, last_number = self._blocks.get(key, (1, 0))
+                if next_number > last_number:
+                    size = max(self.block_size, count - len(numbers))
+                    with engine.connect() as connection:
+                        last_number = SequenceService.bump(connection, business_id, entity_type, size)
+                        connection.commit()
+                    next_number = last_number - size + 1
+                taken = min(count - len(numbers), last_number - next_number + 1)
+                numbers.extend(range(next_number, next_number + taken))
+                self._blocks[key] = (next_number + taken, last_number)
+        return numbers
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+# Global block cache instance
+sequence_blocks = SequenceBlocks()
+
 class SequenceService:
     @staticmethod
     def get_next_number(db: Session, business_id: int, entity_type: str) -> int:
         """
-        Atomically get the next sequence number for a business and entity type.
-        Uses database-level locking with retry logic to prevent race conditions.
+        Next sequence number for a business and entity type, gap-free.
+        The sequence row stays locked until the caller's transaction ends:
+        call it as late in the transaction as possible.
+        """
+        return SequenceService.reserve_block(db, business_id, entity_type, 1)
+
+    @staticmethod
+    def reserve_block(db: Session, business_id: int, entity_type: str, count: int) -> int:
+        """
+        Reserve `count` consecutive numbers with a single UPDATE ... RETURNING on the sequence row.
+        Returns the first number of the block; the caller owns first..first+count-1.
+        """
+        if count < 1:
+            raise ValueError("Block size must be at least 1")
+
+        last_number = SequenceService.bump(db, business_id, entity_type, count)
+        first_number = last_number - count + 1
+        logger.debug("Reserved %s numbers %s..%s for business %s", entity_type, first_number, last_number, business_id)
+        return first_number
+
+    @staticmethod
+    def allocate(db: Session, business_id: int, entity_type: str, count: int) -> List[int]:
+        """
+        `count` unique numbers for records nobody reads as a receipt number
+        (inventory history). They come from a per-process block, so the
+        caller's transaction does not hold the sequence row lock. Numbers
+        increase within a process but can interleave between workers, and
+        a restart leaves the rest of a block unused.
+
+        SQLite has a single writer, so a side transaction would wait on the
+        caller's own; there, and when blocks are turned off, the numbers are
+        reserved in the caller's transaction instead.
+        """
+        if count < 1:
+            raise ValueError("Block size must be at least 1")
+
+        engine = db.get_bind().engine
+        if sequence_blocks.block_size <= 1 or engine.dialect.name == "sqlite":
+            first_number = SequenceService.reserve_block(db, business_id, entity_type, count)
+            return list(range(first_number, first_number + count))
+        return sequence_blocks.take(engine, business_id, entity_type, count)
+
+    @staticmethod
+    def bump(executor, business_id: int, entity_type: str, count: int) -> int:
+        """
+        Add `count` to a sequence, creating it on first use, and return its new
+        last number. `executor` is a Session or a Connection.
         """
-        max_retries = 3
-        retry_delay = 0.1  # seconds
-
-        for attempt in range(max_retries):
-            try:
-                # Start transaction and lock the sequence row
-                sequence = db.query(BusinessSequence).filter(
-                    BusinessSequence.business_id == business_id,
-                    BusinessSequence.entity_type == entity_type
-                ).with_for_update().first()
-
-                if not sequence:
-                    # Create new sequence if it doesn't exist
-                    sequence = BusinessSequence(
-                        business_id=business_id,
-                        entity_type=entity_type,
-                        last_number=0
-                    )
-                    db.add(sequence)
-                    db.flush()  # Flush to get the ID without committing
-                    logger.info(f"Created new sequence for business {business_id}, entity {entity_type}")
-
-                # Increment and return the next number
-                sequence.last_number += 1
-                next_number = sequence.last_number
-                db.flush()  # FIXED: Use flush instead of commit to work within transaction
-
-                logger.debug(f"Generated {entity_type} number {next_number} for business {business_id}")
-                return next_number
-
-            except (IntegrityError, OperationalError) as e:
-                db.rollback()
-                logger.warning(f"Sequence generation attempt {attempt + 1} failed: {str(e)}")
-
-                if attempt == max_retries - 1:  # Last attempt
-                    logger.error(f"Failed to generate sequence number after {max_retries} attempts: {str(e)}")
-                    raise Exception(f"Failed to generate sequence number after {max_retries} attempts: {str(e)}")
-
-                # Wait before retry
-                time.sleep(retry_delay)
-                continue
-
-            except Exception as e:
-                db.rollback()
-                logger.error(f"Unexpected error in sequence generation: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to generate sequence number: {str(e)}")
-                time.sleep(retry_delay)
-                continue
+        table = BusinessSequence.__table__
+        increment = (
+            update(table)
+            .where(table.c.business_id == business_id, table.c.entity_type == entity_type)
+            .values(last_number=table.c.last_number + count)
+            .returning(table.c.last_number)
+        )
+        last_number = executor.execute(increment).scalar()
+        if last_number is not None:
+            return last_number
+
+        try:
+            with executor.begin_nested():
+                executor.execute(insert(table).values(business_id=business_id, entity_type=entity_type, last_number=count))
+            logger.info("Created new sequence for business %s, entity %s", business_id, entity_type)
+            return count
+        except IntegrityError:
+            # Another transaction created it first
+            return executor.execute(increment).scalar_one()
 
     @staticmethod
     def get_current_number(db: Session, business_id: int, entity_type: str) -> int:
@@ -0,0 +1,48 @@
+import os
+from contextlib import contextmanager
+
+# app.database builds its engine on import. Tests bring their own engines,
+# so any URL will do as long as importing the app does not fail.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401 - registers every mapper
+from app.models.base import Base
+
+# One in-memory database shared by every connection, so sessions opened by
+# the code under test see what the test wrote
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@contextmanager
+def count_statements(bind=engine):
+    """Collects the SQL sent to `bind` while active"""
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", on_execute)
+
+@pytest.fixture
+def tables():
+    """Fresh tables in the shared in-memory database for one test"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def db(tables):
+    session = TestingSessionLocal()
+    yield session
+    session.close()
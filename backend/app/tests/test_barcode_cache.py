@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from conftest import count_statements
+from app.core.barcode_cache import BarcodeCache, barcode_cache
+from app.crud.product import create_product, delete_product, update_product
+from app.models.business import Business
+from app.models.product import Product
+from app.models.user import User
+from app.schemas.product_schema import ProductCreate, ProductUpdate
+from app.services.barcode_service import barcode_service
+from app.services.external_api_service import external_api_service
+from app.services.inventory_ledger import InventoryLedger
+
+def product_reads(statements):
+    """The statements that read the products table"""
+    return [statement for statement in statements
+            if statement.lstrip().upper().startswith("SELECT") and "FROM products" in statement]
+
+@pytest.fixture
+def db(db, monkeypatch):
+    """Two businesses with a product each; the external API knows nothing"""
+    for name, barcode in (("Scanner Shop", "5000112637922"), ("Other Shop", "5000112637939")):
+        business = Business(name=name, currency_code="USD")
+        db.add(business)
+        db.flush()
+        db.add(User(username=f"owner{business.id}", email=f"owner{business.id}@example.com",
+                    hashed_password="x", business_id=business.id))
+        db.add(Product(name=f"{name} cola", price=2.0, cost_price=1.0, stock_quantity=10, min_stock_level=5,
+                       barcode=barcode, business_id=business.id))
+    db.commit()
+
+    external_lookups = []
+
+    async def lookup_barcode(barcode):
+        external_lookups.append(barcode)
+        return None
+
+    monkeypatch.setattr(external_api_service, "lookup_barcode", lookup_barcode)
+    db.info["external_lookups"] = external_lookups
+    barcode_cache.clear()
+    yield db
+    barcode_cache.clear()
+
+def scan(db, barcode, business_id=1):
+    return asyncio.run(barcode_service.lookup_barcode(db, barcode, 1, business_id))
+
+def test_scans_are_served_from_cache_and_follow_product_writes(db):
+    with count_statements() as statements:
+        first = scan(db, "5000112637922")
+        second = scan(db, "5000112637922")
+    assert len(product_reads(statements)) == 1
+    assert first == second and first["name"] == "Scanner Shop cola"
+    # Each business only resolves its own catalog
+    assert scan(db, "5000112637939") is None
+    assert scan(db, "5000112637939", business_id=2)["name"] == "Other Shop cola"
+
+    # Sales update the cached stock quantity without dropping the entry
+    InventoryLedger.apply(db, {first["id"]: -3})
+    db.commit()
+    with count_statements() as statements:
+        assert scan(db, "5000112637922")["stock_quantity"] == 7
+    assert product_reads(statements) == []
+
+    update_product(db, first["id"], ProductUpdate(name="Diet cola", price=2.5, barcode="5000112637922",
+                                                  stock_quantity=7, min_stock_level=5), user_id=1, exchange_rate=1.0)
+    assert scan(db, "5000112637922")["name"] == "Diet cola"
+
+    delete_product(db, first["id"])
+    assert scan(db, "5000112637922") is None
+
+def test_unknown_barcodes_are_remembered_until_a_product_takes_them(db):
+    external_lookups = db.info["external_lookups"]
+    assert scan(db, "4006381333931") is None
+    with count_statements() as statements:
+        assert scan(db, "4006381333931") is None
+    assert product_reads(statements) == [] and external_lookups == ["4006381333931"]
+
+    create_product(db, ProductCreate(name="Marker", price=1.5, barcode="4006381333931"), user_id=1,
+                   business_id=1, exchange_rate=1.0)
+    assert scan(db, "4006381333931")["name"] == "Marker"
+    assert external_lookups == ["4006381333931"]
+
+def test_entries_expire_and_least_recently_scanned_are_evicted():
+    now = [0.0]
+    cache = BarcodeCache(ttl_seconds=60, negative_ttl_seconds=5, max_entries=2, clock=lambda: now[0])
+    for product_id, barcode in ((1, "A"), (2, "B")):
+        cache.put(1, barcode, {"id": product_id, "stock_quantity": 1})
+    cache.put(2, "A", {"id": 3, "stock_quantity": 1})
+    assert cache.get(1, "A").product["id"] == 1
+    cache.put(1, "C", None)
+    # B was scanned least recently
+    assert cache.get(1, "B") is None and cache.get(1, "C").product is None
+    assert cache.get(2, "A").product["id"] == 3
+
+    # A lookup that started before a change committed is not cached
+    generation = cache.generation(1)
+    cache.apply(1, "D", None, None)
+    cache.put(1, "D", {"id": 4, "stock_quantity": 1}, generation)
+    assert cache.get(1, "D") is None
+
+    now[0] = 6
+    assert cache.get(1, "C") is None and cache.get(1, "A") is not None
+    now[0] = 61
+    assert cache.get(1, "A") is None
+    assert cache.get(None, "A") is None
@@ -0,0 +1,89 @@
+import pytest
+
+from app.crud.sale import create_sale
+from app.models.business import Business
+from app.models.business_sequence import BusinessSequence
+from app.models.inventory import InventoryHistory
+from app.models.payment import Payment
+from app.models.product import Product
+from app.models.sale import Sale, SaleItem
+from app.models.user import User
+from app.schemas.sale_schema import SaleCreate
+
+RATE = 1 / 4.0  # local currency -> USD
+
+@pytest.fixture
+def shop(db):
+    """A business in a non-USD currency, its cashier and two products"""
+    business = Business(name="Checkout Shop", currency_code="KES")
+    db.add(business)
+    db.flush()
+    user = User(username="cashier", email="cashier@example.com", hashed_password="x", business_id=business.id)
+    products = [
+        Product(name=f"Item {i}", price=2.0, cost_price=1.0, stock_quantity=10, business_id=business.id,
+                barcode=f"CHK{i}")
+        for i in range(2)
+    ]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+    return business, user, products
+
+def basket(user, lines, payments):
+    """lines: [(product, quantity, local unit price)]; payments: [(local amount, method)]"""
+    return SaleCreate(
+        user_id=user.id, tax_rate=0.0,
+        sale_items=[{"product_id": product.id, "quantity": quantity, "unit_price": price}
+                    for product, quantity, price in lines],
+        payments=[{"amount": amount, "payment_method": method} for amount, method in payments]
+    )
+
+def stock(db, products):
+    db.expire_all()
+    return [db.get(Product, product.id).stock_quantity for product in products]
+
+def assert_nothing_written(db, products):
+    assert stock(db, products) == [10, 10]
+    for model in (Sale, SaleItem, Payment, InventoryHistory, BusinessSequence):
+        assert db.query(model).count() == 0, model.__name__
+
+def test_multi_line_sale(db, shop):
+    business, user, products = shop
+    first, second = products
+    # The same product on two lines is checked and decremented as one
+    sale = create_sale(db, basket(user, [(first, 2, 8.0), (second, 1, 4.0), (first, 1, 8.0)],
+                                  [(20.0, "cash"), (8.0, "card")]), user.id, exchange_rate=RATE)
+
+    assert sale.business_sale_number == 1
+    assert (sale.original_amount, sale.total_amount, sale.original_currency) == (28.0, 7.0, "KES")
+    assert stock(db, products) == [7, 9]
+    items = db.query(SaleItem).filter_by(sale_id=sale.id).order_by(SaleItem.id).all()
+    assert [(item.product_id, item.quantity, item.original_subtotal, item.subtotal) for item in items] == [
+        (first.id, 2, 16.0, 4.0), (second.id, 1, 4.0, 1.0), (first.id, 1, 8.0, 2.0)
+    ]
+    payments = db.query(Payment).filter_by(sale_id=sale.id).order_by(Payment.id).all()
+    assert [(p.payment_method, p.original_amount, p.amount, p.status) for p in payments] == [
+        ("cash", 20.0, 5.0, "completed"), ("card", 8.0, 2.0, "completed")
+    ]
+    history = db.query(InventoryHistory).order_by(InventoryHistory.id).all()
+    assert [(h.product_id, h.quantity_change, h.reason) for h in history] == [
+        (first.id, -2, "Sale #1"), (second.id, -1, "Sale #1"), (first.id, -1, "Sale #1")
+    ]
+
+    again = create_sale(db, basket(user, [(second, 1, 4.0)], [(4.0, "cash")]), user.id, exchange_rate=RATE)
+    assert again.business_sale_number == 2
+
+def test_insufficient_stock_writes_nothing(db, shop):
+    business, user, products = shop
+    first, second = products
+    # Each line fits on its own; together they take 11 of the 10 in stock
+    with pytest.raises(ValueError, match="Insufficient stock for product Item 0"):
+        create_sale(db, basket(user, [(second, 1, 4.0), (first, 6, 8.0), (first, 5, 8.0)], [(92.0, "cash")]),
+                    user.id, exchange_rate=RATE)
+    assert_nothing_written(db, products)
+
+def test_payment_mismatch_writes_nothing(db, shop):
+    business, user, products = shop
+    with pytest.raises(ValueError, match="Payment total does not match sale total"):
+        create_sale(db, basket(user, [(products[0], 2, 8.0)], [(15.0, "cash")]), user.id, exchange_rate=RATE)
+    assert_nothing_written(db, products)
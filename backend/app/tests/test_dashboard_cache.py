@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import TestingSessionLocal, count_statements
+from app.core.auth import get_current_user
+from app.core.dashboard_cache import DashboardCache, dashboard_cache
+from app.database import get_db, get_read_db
+from app.main import app
+from app.models.business import Business
+from app.models.sale import Sale
+from app.services.rollup_service import RollupService
+
+@pytest.fixture
+def business_id(tables):
+    with TestingSessionLocal() as db:
+        business = Business(name="Dashboard Shop", currency_code="USD")
+        db.add(business)
+        db.commit()
+        business_id = business.id
+    dashboard_cache.clear()
+    yield business_id
+    dashboard_cache.clear()
+
+@pytest.fixture
+def client(business_id, monkeypatch):
+    # Rebuild as soon as a write invalidates the snapshot
+    monkeypatch.setattr(dashboard_cache, "min_refresh_seconds", 0)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: {
+        "id": 1, "email": "owner@example.com", "username": "owner", "business_id": business_id,
+        "is_active": True, "permissions": ["report:view"],
+    }
+    yield TestClient(app)
+    for dependency in (get_db, get_read_db, get_current_user):
+        app.dependency_overrides.pop(dependency, None)
+
+def sell(business_id, amount, commit=True):
+    with TestingSessionLocal() as db:
+        sale = Sale(business_id=business_id, total_amount=amount, original_amount=amount, original_currency="USD",
+                    payment_status="completed", created_at=datetime.now())
+        db.add(sale)
+        db.flush()
+        RollupService.add(db, Sale, sale.id, business_id, "USD", "cash",
+                          {"transactions": 1, "sales_usd": amount, "sales_original": amount, "payment_count": 1})
+        db.commit() if commit else db.rollback()
+
+def test_unchanged_polls_are_answered_from_the_snapshot(client):
+    first = client.get("/api/reports/dashboard")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    with count_statements() as statements:
+        again = client.get("/api/reports/dashboard", headers={"If-None-Match": etag})
+        other_tab = client.get("/api/reports/dashboard")
+    assert again.status_code == 304 and again.headers["etag"] == etag
+    assert other_tab.json() == first.json()
+    assert statements == []
+
+def test_committed_sales_invalidate_the_snapshot(client, business_id):
+    etag = client.get("/api/reports/dashboard").headers["etag"]
+
+    sell(business_id, 12.5, commit=False)
+    assert client.get("/api/reports/dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+    sell(business_id, 12.5)
+    response = client.get("/api/reports/dashboard", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["sales_today"]["total_transactions"] == 1
+
+def test_invalidated_snapshot_is_rebuilt_at_most_once_per_interval():
+    now = [0.0]
+    cache = DashboardCache(ttl_seconds=60, min_refresh_seconds=5, clock=lambda: now[0])
+    builds = []
+
+    def build():
+        builds.append(now[0])
+        return {"sales": len(builds)}
+
+    cache.get(1, "2026-10-17", build)
+    for second in range(1, 10):
+        now[0] = second
+        cache.invalidate(1)
+        cache.get(1, "2026-10-17", build)
+    assert builds == [0.0, 5.0]
+
+    now[0] = 12
+    cache.get(1, "2026-10-17", build)  # the write at 9s is picked up
+    cache.get(1, "2026-10-17", build)
+    cache.get(1, "2026-10-18", build)  # a new day is a new snapshot
+    now[0] = 80
+    cache.get(1, "2026-10-18", build)
+    assert builds == [0.0, 5.0, 12.0, 12.0, 80.0]
+    assert (cache.hits, cache.misses) == (9, 5)
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import count_statements
+from app.models.business import Business
+from app.models.expense import Expense, ExpenseCategory
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.schemas.sale_schema import SaleCreate
+from app.services.activity_service import ActivityService
+from app.services.checkout_service import CheckoutService
+from app.services.event_bus import EventBus, event_bus
+
+@pytest.fixture
+def db(db):
+    """A business with one product two units above its minimum stock level"""
+    business = Business(name="Event Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    db.add(Product(name="Widget", price=2.0, cost_price=1.0, stock_quantity=7, min_stock_level=5,
+                   business_id=business.id, barcode="EVT1"))
+    db.commit()
+    event_bus.clear()
+    yield db
+    event_bus.clear()
+
+def sell(db, quantity):
+    business = db.query(Business).one()
+    product = db.query(Product).one()
+    sale_data = SaleCreate(user_id=1, tax_rate=0.0,
+                           sale_items=[{"product_id": product.id, "quantity": quantity, "unit_price": 2.0}],
+                           payments=[{"amount": 2.0 * quantity, "payment_method": "cash"}])
+    return CheckoutService.create_sale(db, sale_data, 1, business, 1.0)
+
+def feed_types(business_id):
+    return [bus_event.type for bus_event in event_bus._feeds.get(business_id, ())]
+
+def test_events_are_delivered_when_the_sale_commits(db):
+    business_id = db.query(Business).one().id
+    sell(db, 1)
+    db.rollback()
+    assert feed_types(business_id) == []
+
+    sell(db, 1)
+    assert feed_types(business_id) == []
+    db.commit()
+    # 7 -> 6 stays above the minimum of 5
+    assert feed_types(business_id) == ["inventory", "sale"]
+    # Inventory activities keep the history row id; the business number is its own field
+    history = db.query(InventoryHistory).one()
+    inventory = next(bus_event.data for bus_event in event_bus._feeds[business_id] if bus_event.type == "inventory")
+    assert (inventory["id"], inventory["business_inventory_number"]) == (history.id, history.business_inventory_number)
+    assert ActivityService.inventory_activity(history.__dict__)["id"] == history.id
+
+    sell(db, 2)
+    db.commit()
+    low_stock = [bus_event.data for bus_event in event_bus._feeds[business_id] if bus_event.type == "low_stock"]
+    assert low_stock == [{"product_id": 1, "name": "Widget", "stock_quantity": 4, "min_stock_level": 5}]
+
+def test_feed_is_loaded_once_then_kept_current(db):
+    business = db.query(Business).one()
+    category = ExpenseCategory(name="Rent")
+    db.add(category)
+    db.flush()
+    db.add(Expense(business_id=business.id, category_id=category.id, description="Old rent", amount=10,
+                   original_amount=10, original_currency_code="USD", created_by=1, date=datetime.now() - timedelta(hours=2)))
+    db.commit()
+    business_id = business.id
+
+    with count_statements() as statements:
+        first = ActivityService.get_feed(db, business_id)
+        loaded = len(statements)
+        sell(db, 1)
+        db.commit()
+        written = len(statements)
+        second = ActivityService.get_feed(db, business_id)
+    assert loaded > 0
+    assert len(statements) == written  # served from the feed
+    assert [activity["description"] for activity in first] == ["Expense: Old rent"]
+    assert [activity["type"] for activity in second] == ["sale", "inventory", "expense"]
+
+def test_streams_replay_what_they_missed():
+    bus = EventBus(feed_size=2, queue_size=10)
+
+    async def scenario():
+        live = bus.subscribe(1)
+        # Commits arrive from worker threads
+        thread = threading.Thread(target=lambda: [bus.deliver(1, "sale", {"id": n}) for n in range(1, 5)])
+        thread.start()
+        thread.join()
+        received = [await live.get(1) for _ in range(4)]
+        bus.unsubscribe(live)
+
+        second_id = bus.event_id(received[1])
+        resumed = bus.subscribe(1, second_id)
+        too_old = bus.subscribe(1, bus.event_id(received[0]))
+        stranger = bus.subscribe(1, "0123456789ab.3")
+        other_business = bus.subscribe(2)
+        bus.deliver(1, "expense", {"id": 9})
+        await asyncio.sleep(0)
+        return received, resumed, too_old, stranger, other_business
+
+    received, resumed, too_old, stranger, other_business = asyncio.run(scenario())
+    assert [bus_event.data["id"] for bus_event in received] == [1, 2, 3, 4]
+    assert [bus_event.data["id"] for bus_event in resumed.replay] == [3, 4]
+    # Event 2 has been evicted from the two-event feed, and ids of another process mean nothing here
+    assert too_old.replay is None and stranger.replay is None
+    assert other_business.queue.empty() and resumed.queue.qsize() == 1
@@ -0,0 +1,88 @@
+import csv
+import io
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+
+from conftest import TestingSessionLocal
+from app.models.business import Business
+from app.models.product import Product
+from app.models.refund import Refund, RefundItem
+from app.models.sale import Sale, SaleItem
+from app.services import export_service
+from app.services.export_service import EXPORT_DATASETS, ExportService
+
+@pytest.fixture
+def business_id(tables):
+    """Five one-line sales on 2026-10-01 (plus one from another business) and a refund of the first"""
+    with TestingSessionLocal() as db:
+        shop, other = Business(name="Export Shop", currency_code="USD"), Business(name="Other", currency_code="USD")
+        db.add_all([shop, other])
+        db.flush()
+        product = Product(name="Widget, large", price=2.5, cost_price=1.0, original_cost_price=1.0,
+                          stock_quantity=100, business_id=shop.id, barcode="EXP1")
+        db.add(product)
+        db.flush()
+        for n, business in enumerate([shop] * 5 + [other]):
+            sale = Sale(business_id=business.id, business_sale_number=n + 1, total_amount=2.5 * (n + 1),
+                        original_currency="USD", payment_status="completed", created_at=datetime(2026, 10, 1, 9, n))
+            db.add(sale)
+            db.flush()
+            db.add(SaleItem(sale_id=sale.id, product_id=product.id, quantity=n + 1, unit_price=2.5,
+                            subtotal=2.5 * (n + 1), original_unit_price=2.5, original_subtotal=2.5 * (n + 1)))
+        db.flush()
+        first_sale = db.query(Sale).filter_by(business_id=shop.id).order_by(Sale.id).first()
+        refund = Refund(sale_id=first_sale.id, business_id=shop.id, business_refund_number=1, total_amount=2.5,
+                        original_currency="USD", status="processed", created_at=datetime(2026, 10, 1, 12))
+        db.add(refund)
+        db.flush()
+        db.add(RefundItem(refund_id=refund.id, sale_item_id=first_sale.sale_items[0].id, quantity=1))
+        db.commit()
+        shop_id = shop.id
+    return shop_id
+
+def export(dataset, fmt, business_id, fetch_size=2):
+    return list(ExportService.dataset_chunks(TestingSessionLocal, EXPORT_DATASETS[dataset], fmt, business_id,
+                                             date(2026, 10, 1), date(2026, 10, 1), fetch_size))
+
+def test_csv_is_streamed_batch_by_batch(business_id):
+    chunks = export("sales-lines", "csv", business_id)
+
+    assert len(chunks) == 3  # header with the first two rows, then two more batches
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0][:6] == ["Sale #", "Date", "Status", "Product", "Barcode", "Quantity"]
+    assert [row[0] for row in rows[1:]] == ["1", "2", "3", "4", "5"]
+    assert rows[1][1:4] == ["2026-10-01 09:00:00", "completed", "Widget, large"]
+
+def test_financial_and_refund_detail(business_id):
+    financial = list(csv.DictReader(io.StringIO(b"".join(export("financial", "csv", business_id)).decode())))
+    refunds = list(csv.DictReader(io.StringIO(b"".join(export("refunds", "csv", business_id)).decode())))
+
+    assert [float(row["Gross Profit (USD)"]) for row in financial] == [1.5, 3.0, 4.5, 6.0, 7.5]
+    assert [(row["Refund #"], row["Sale #"], row["Quantity"], row["Amount (USD)"]) for row in refunds] == [("1", "1", "1", "2.5")]
+
+def test_xlsx_continues_on_a_new_sheet_past_the_row_limit(business_id, monkeypatch):
+    monkeypatch.setattr(export_service, "XLSX_MAX_ROWS", 3)
+
+    workbook = openpyxl.load_workbook(io.BytesIO(b"".join(export("sales-lines", "xlsx", business_id))), read_only=True)
+
+    assert workbook.sheetnames == ["Sales Lines", "Sales Lines (2)"]
+    first, second = (list(workbook[name].iter_rows(values_only=True)) for name in workbook.sheetnames)
+    assert [row[0] for row in first] == ["Sale #", 1, 2, 3]
+    assert [row[0] for row in second] == ["Sale #", 4, 5]
+    assert first[1][1] == datetime(2026, 10, 1, 9, 0)
+
+def test_report_exports_write_every_section():
+    data = {
+        "summary": {"total_products": 2, "total_stock_value": 10.0},
+        "stock_movements": [{"product_name": "A", "quantity": 3}, {"product_name": "B", "quantity": -1}],
+        "low_stock_alerts": [],
+    }
+
+    text = b"".join(ExportService.csv_chunks(ExportService._report_sections(data))).decode()
+
+    assert text.splitlines() == [
+        "SUMMARY", "Metric,Value", "Total Products,2", "Total Stock Value,10.0",
+        "", "STOCK MOVEMENTS", "Product Name,Quantity", "A,3", "B,-1",
+    ]
@@ -0,0 +1,100 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models.business import Business
+from app.models.product import Product
+from app.models.sale import Sale, SaleItem
+from app.models.user import User
+from app.crud.report import get_financial_report
+
+RATE = 1 / 3700.0
+
+def add_sale(db, business, user, lines, created_at, status="completed", tax=0.0):
+    """lines: [(product, quantity)]"""
+    total = sum(product.price * quantity for product, quantity in lines)
+    sale = Sale(
+        business_id=business.id, user_id=user.id, total_amount=total + tax, tax_amount=tax,
+        original_amount=(total + tax) / RATE, original_currency="UGX", exchange_rate_at_sale=RATE,
+        payment_status=status, created_at=created_at
+    )
+    db.add(sale)
+    db.flush()
+    for product, quantity in lines:
+        db.add(SaleItem(
+            sale_id=sale.id, product_id=product.id, quantity=quantity, unit_price=product.price,
+            subtotal=product.price * quantity, original_unit_price=product.price / RATE,
+            original_subtotal=product.price * quantity / RATE, exchange_rate_at_creation=RATE
+        ))
+    return sale
+
+@pytest.fixture
+def shop(db):
+    business = Business(name="Report Shop", currency_code="UGX")
+    other = Business(name="Other Shop", currency_code="UGX")
+    db.add_all([business, other])
+    db.flush()
+    user = User(username="reporter", email="reporter@example.com", hashed_password="x", business_id=business.id)
+    db.add(user)
+    products = [
+        Product(name=f"Item {i}", price=2.0 + i, cost_price=1.0 + i, original_price=(2.0 + i) / RATE,
+                original_cost_price=(1.0 + i) / RATE, original_currency_code="UGX", stock_quantity=100,
+                business_id=business.id, barcode=f"FIN{i:04d}")
+        for i in range(4)
+    ]
+    db.add_all(products)
+    db.flush()
+
+    now = datetime.now().replace(microsecond=0)
+    add_sale(db, business, user, [(products[0], 1)], now)
+    add_sale(db, business, user, [(products[0], 2), (products[1], 1), (products[2], 3)], now, tax=1.5)
+    add_sale(db, business, user, [(products[i], 1) for i in range(4)] * 3, now - timedelta(days=1))
+    # Excluded: pending, outside the window, another business
+    add_sale(db, business, user, [(products[3], 5)], now, status="pending")
+    add_sale(db, business, user, [(products[1], 1)], now - timedelta(days=30))
+    add_sale(db, other, user, [(products[2], 2), (products[3], 2)], now)
+    db.commit()
+    return business
+
+def reference_summary(db, business, start_date, end_date):
+    """Totals computed sale by sale in Python"""
+    start_dt = datetime.combine(start_date, datetime.min.time())
+    end_dt = datetime.combine(end_date, datetime.max.time())
+    sales = [
+        sale for sale in db.query(Sale).all()
+        if sale.business_id == business.id and sale.payment_status == "completed"
+        and start_dt <= sale.created_at <= end_dt
+    ]
+    items = [item for sale in sales for item in sale.sale_items]
+    return {
+        "total_revenue": sum(sale.total_amount for sale in sales),
+        "total_revenue_original": sum(sale.original_amount for sale in sales),
+        "tax_collected": sum(sale.tax_amount for sale in sales),
+        "cogs": sum(item.quantity * item.product.cost_price for item in items),
+        "cogs_original": sum(item.quantity * item.product.original_cost_price for item in items),
+        "total_transactions": len(sales),
+    }
+
+def test_summary_counts_each_sale_once(db, shop):
+    end_date = date.today()
+    start_date = end_date - timedelta(days=7)
+
+    summary = get_financial_report(db, start_date, end_date, shop.id)["summary"]
+    expected = reference_summary(db, shop, start_date, end_date)
+
+    assert summary["total_transactions"] == expected["total_transactions"] == 3
+    for key in ("total_revenue", "total_revenue_original", "tax_collected", "cogs", "cogs_original"):
+        assert summary[key] == pytest.approx(expected[key]), key
+    assert summary["gross_profit"] == pytest.approx(expected["total_revenue"] - expected["cogs"])
+    assert summary["exchange_rate"] == pytest.approx(RATE)
+
+def test_summary_with_no_sales(db, shop):
+    start_date = date.today() - timedelta(days=400)
+    end_date = start_date + timedelta(days=7)
+
+    summary = get_financial_report(db, start_date, end_date, shop.id)["summary"]
+
+    assert summary["total_transactions"] == 0
+    assert summary["total_revenue"] == 0
+    assert summary["cogs"] == 0
+    assert summary["exchange_rate"] == 1.0
@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every mapper
+from app.models.base import Base
+from app.models.business import Business
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.crud.inventory import count_low_stock_items, get_low_stock_items
+from app.services.event_bus import event_bus
+from app.services.inventory_ledger import InsufficientStock, InventoryLedger
+
+@pytest.fixture
+def shop(tmp_path):
+    """A file database so every thread gets its own connection, plus one business with two products"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        business = Business(name="Ledger Shop", currency_code="USD")
+        db.add(business)
+        db.flush()
+        products = [
+            Product(name=f"Item {i}", price=2.0, cost_price=1.0, stock_quantity=20, business_id=business.id, barcode=f"LED{i}")
+            for i in range(2)
+        ]
+        db.add_all(products)
+        db.commit()
+        ids = (business.id, [product.id for product in products])
+    yield SessionLocal, ids
+    engine.dispose()
+
+def hammer(SessionLocal, jobs, threads=8):
+    """Run each job (a callable taking a session) on a thread pool; returns the ones that committed"""
+    committed, lock = [], threading.Lock()
+    pending = list(jobs)
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                job = pending.pop()
+            db = SessionLocal()
+            try:
+                job(db)
+                db.commit()
+                with lock:
+                    committed.append(job)
+            except InsufficientStock:
+                db.rollback()
+            finally:
+                db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return committed
+
+def stock(SessionLocal, product_ids):
+    with SessionLocal() as db:
+        return [db.get(Product, product_id).stock_quantity for product_id in product_ids]
+
+def test_concurrent_decrements_never_oversell(shop):
+    SessionLocal, (business_id, product_ids) = shop
+    # 60 buyers of one unit of each product, 20 in stock: products listed in both orders
+    jobs = [
+        (lambda db, ids=ids: InventoryLedger.move(db, business_id, None, "sale", "stress", [(pid, -1) for pid in ids]))
+        for n in range(60)
+        for ids in [product_ids if n % 2 else list(reversed(product_ids))]
+    ]
+
+    committed = hammer(SessionLocal, jobs)
+
+    assert len(committed) == 20
+    assert stock(SessionLocal, product_ids) == [0, 0]
+    with SessionLocal() as db:
+        assert db.query(InventoryHistory).count() == 40
+        assert sorted(row.business_inventory_number for row in db.query(InventoryHistory)) == list(range(1, 41))
+
+def test_mixed_changes_lose_no_updates(shop):
+    SessionLocal, (business_id, product_ids) = shop
+    deltas = [3, -5, 2, -1, -4, 6, -2, -7] * 10
+    jobs = [
+        (lambda db, delta=delta: InventoryLedger.move(db, business_id, None, "adjustment", "stress", [(product_ids[0], delta)]))
+        for delta in deltas
+    ]
+
+    committed = hammer(SessionLocal, jobs)
+
+    with SessionLocal() as db:
+        history = db.query(InventoryHistory).all()
+    assert len(history) == len(committed)
+    final = stock(SessionLocal, product_ids)[0]
+    assert final == 20 + sum(row.quantity_change for row in history)
+    assert final >= 0
+    # Every committed change saw the stock left by the one before it
+    for row in history:
+        assert row.new_quantity == row.previous_quantity + row.quantity_change >= 0
+
+def test_a_refused_batch_changes_nothing(shop):
+    SessionLocal, (business_id, product_ids) = shop
+    with SessionLocal() as db:
+        with pytest.raises(InsufficientStock) as refused:
+            InventoryLedger.apply(db, {product_ids[0]: -5, product_ids[1]: -21})
+        db.rollback()
+        assert refused.value.product_ids == [product_ids[1]]
+
+        levels = InventoryLedger.apply(db, {product_ids[0]: -5, product_ids[1]: 4})
+        db.commit()
+    assert levels == {product_ids[0]: (20, 15), product_ids[1]: (20, 24)}
+    assert stock(SessionLocal, product_ids) == [15, 24]
+
+def test_low_stock_flag_follows_every_stock_write(shop):
+    SessionLocal, (business_id, product_ids) = shop
+    first, second = product_ids
+    event_bus.clear()
+
+    def flagged():
+        with SessionLocal() as db:
+            return sorted(product.id for product in get_low_stock_items(db, business_id=business_id))
+
+    levels = []
+    with SessionLocal() as db:
+        for delta in (-14, -1, -1, 10):  # 20 -> 6 -> 5 (the minimum) -> 4 -> 14
+            InventoryLedger.move(db, business_id, None, "adjustment", None, [(first, delta)])
+            db.commit()
+            levels.append((db.get(Product, first).stock_quantity, flagged()))
+        assert levels == [(6, []), (5, [first]), (4, [first]), (14, [])]
+        # One alert for the crossing, none while it stayed low
+        alerts = [bus_event.data for bus_event in event_bus._feeds[business_id] if bus_event.type == "low_stock"]
+        assert [alert["stock_quantity"] for alert in alerts] == [5]
+
+        # Edits through the ORM keep the flag too
+        db.get(Product, second).min_stock_level = 25
+        db.commit()
+        assert flagged() == [second]
+        assert count_low_stock_items(db, business_id) == 1
@@ -0,0 +1,57 @@
+import io
+import json
+import logging
+
+import pytest
+
+from app.core import logging_config
+from app.core.logging_config import SamplingFilter, configure_logging, parse_levels, stop_logging
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    logging.getLogger("bench.quiet").setLevel(logging.NOTSET)
+
+def make_record(event=None):
+    record = logging.makeLogRecord({"msg": "hello", "levelno": logging.DEBUG})
+    if event is not None:
+        record.event = event
+    return record
+
+def test_sampling_keeps_one_in_n_per_event():
+    sampler = SamplingFilter(["auth.authenticated"], every=10)
+
+    kept = [sampler.filter(make_record("auth.authenticated")) for _ in range(100)]
+
+    assert sum(kept) == 10
+    assert kept[0]
+    assert all(sampler.filter(make_record("sale.created")) for _ in range(5))
+    assert all(sampler.filter(make_record()) for _ in range(5))
+
+def test_parse_levels():
+    assert parse_levels(" app.core.auth=debug, ,app.crud=WARNING,broken") == {
+        "app.core.auth": "DEBUG", "app.crud": "WARNING"
+    }
+
+def test_json_output_through_queue(restore_logging):
+    stream = io.StringIO()
+    configure_logging(level="DEBUG", levels="bench.quiet=WARNING", fmt="json",
+                      sample_every=1, sampled_events="", stream=stream)
+
+    logging.getLogger("bench.loud").debug("Checked %s", "sale:read", extra={"event": "permission.checked", "user_id": 7})
+    logging.getLogger("bench.quiet").info("dropped by the per-module level")
+    stop_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["message"] == "Checked sale:read"
+    assert entry["logger"] == "bench.loud"
+    assert entry["event"] == "permission.checked"
+    assert entry["user_id"] == 7
+    assert logging_config._listener is None
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.business import Business
+from app.models.sale import Sale
+from app.crud.sale import get_sales
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, next_cursor
+
+@pytest.fixture
+def business(db):
+    business = Business(name="Paging Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    # Groups of three sales share a timestamp so the id tie-breaker matters
+    db.add_all([
+        Sale(business_id=business.id, total_amount=float(n), payment_status="completed",
+             created_at=start + timedelta(minutes=n // 3))
+        for n in range(20)
+    ])
+    db.commit()
+    return business
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 4, 5, 6, 7, 890000)
+    cursor = encode_cursor((created_at, 42))
+
+    assert decode_cursor(cursor, (Sale.created_at, Sale.id)) == [created_at, 42]
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", (Sale.created_at, Sale.id))
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor((1,)), (Sale.created_at, Sale.id))
+
+def test_keyset_pages_match_offset_pages(db, business):
+    offset_ids = [sale.id for sale in get_sales(db, skip=0, limit=100, business_id=business.id)]
+
+    keyset_ids, cursor = [], None
+    while True:
+        page = get_sales(db, limit=6, business_id=business.id, cursor=cursor)
+        keyset_ids.extend(sale.id for sale in page)
+        cursor = next_cursor(page, 6, lambda sale: (sale.created_at, sale.id))
+        if cursor is None:
+            break
+
+    assert len(offset_ids) == 20
+    assert keyset_ids == offset_ids
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core.auth import build_token_claims, create_access_token, get_current_user
+from app.core.permission_cache import permission_cache
+from app.crud.user import bump_role_version, toggle_user_status
+from app.models.business import Business
+from app.models.permission import Permission, Role
+from app.models.user import User
+
+@pytest.fixture
+def cashier(db, monkeypatch):
+    """A cashier who may only sell, a manager role and a clock the cache reads"""
+    business = Business(name="Auth Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    sell, refund = Permission(name="sale:create"), Permission(name="refund:create")
+    cashier_role = Role(name="Cashier", permissions=[sell])
+    manager_role = Role(name="Manager", permissions=[sell, refund])
+    user = User(username="cashier", email="cashier@example.com", hashed_password="x", business_id=business.id,
+                roles=[cashier_role])
+    db.add_all([cashier_role, manager_role, user])
+    db.commit()
+
+    now = [0.0]
+    monkeypatch.setattr(permission_cache, "clock", lambda: now[0])
+    monkeypatch.setattr(permission_cache, "ttl_seconds", 30)
+    permission_cache.clear()
+    db.info["now"] = now
+    yield user
+    permission_cache.clear()
+
+def authenticate(db, token):
+    """One request's worth of get_current_user"""
+    return asyncio.run(get_current_user(Request({"type": "http"}), token, db))
+
+def test_role_change_applies_on_the_next_request_after_invalidation(db, cashier):
+    token = create_access_token(build_token_claims(cashier))
+    assert authenticate(db, token)["permissions"] == ["sale:create"]
+
+    cashier.roles = [db.query(Role).filter_by(name="Manager").one()]
+    bump_role_version(cashier)
+    db.commit()
+    # Without invalidation the cached context is still served
+    assert authenticate(db, token)["permissions"] == ["sale:create"]
+
+    permission_cache.invalidate_user(cashier.id)
+    assert sorted(authenticate(db, token)["permissions"]) == ["refund:create", "sale:create"]
+
+def test_permission_change_and_deactivation_apply_after_invalidation(db, cashier):
+    token = create_access_token(build_token_claims(cashier))
+    authenticate(db, token)
+
+    cashier.roles[0].permissions.append(db.query(Permission).filter_by(name="refund:create").one())
+    db.commit()
+    permission_cache.invalidate_user(cashier.id)
+    assert sorted(authenticate(db, token)["permissions"]) == ["refund:create", "sale:create"]
+
+    # toggle_user_status invalidates by itself
+    toggle_user_status(db, cashier.id)
+    assert authenticate(db, token)["is_active"] is False
+
+def test_entries_expire_after_the_ttl(db, cashier):
+    now = db.info["now"]
+    token = create_access_token(build_token_claims(cashier))
+    authenticate(db, token)
+    cashier.roles = []
+    db.commit()
+
+    now[0] = 30
+    assert authenticate(db, token)["permissions"] == ["sale:create"]
+    now[0] = 31
+    assert authenticate(db, token)["permissions"] == []
+
+    db.delete(cashier)
+    db.commit()
+    now[0] = 62
+    with pytest.raises(HTTPException) as rejected:
+        authenticate(db, token)
+    assert rejected.value.status_code == 401
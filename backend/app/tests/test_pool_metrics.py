@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.auth import get_current_user
+from app.core.metrics import pool_metrics
+from app.main import app
+from app.routers import metrics
+from app.database import InstrumentedQueuePool, create_db_engine
+
+def test_checkouts_and_timeouts_are_counted(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}", name="test-pool",
+                              pool_size=1, max_overflow=0, pool_timeout=0.05)
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+
+    with engine.connect() as held:
+        held.execute(text("SELECT 1"))
+        assert pool_metrics.snapshot()["test-pool"]["checked_out"] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    stats = pool_metrics.snapshot()["test-pool"]
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["checked_out"] == 0
+    assert 'bizzy_db_pool_checkout_timeouts_total{pool="test-pool"} 1' in pool_metrics.render_prometheus()
+
+    # A recreated pool keeps reporting under the same name
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert pool_metrics.snapshot()["test-pool"]["checkouts"] == 2
+
+def test_in_memory_sqlite_keeps_default_pool():
+    engine = create_db_engine("sqlite://")
+
+    assert not isinstance(engine.pool, InstrumentedQueuePool)
+
+@pytest.mark.parametrize("profiling", [False, True])
+def test_metrics_endpoint_serves_pools_whether_or_not_profiling_is_on(tmp_path, monkeypatch, profiling):
+    name = f"endpoint-pool-{profiling}"
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'endpoint.db'}", name=name)
+    with engine.connect():
+        pass
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", profiling)
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1, "permissions": ["role:manage"]}
+    try:
+        client = TestClient(app)
+        text_response = client.get("/api/admin/metrics")
+        json_response = client.get("/api/admin/metrics", params={"format": "json"})
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+    assert text_response.status_code == json_response.status_code == 200
+    assert f'bizzy_db_pool_checkout_wait_seconds_count{{pool="{name}"}} 1' in text_response.text
+    assert ("bizzy_http_requests_total" in text_response.text) is profiling
+    body = json_response.json()
+    assert body["profiling_enabled"] is profiling
+    assert body["pool"][name]["checkouts"] == 1
+    if not profiling:
+        assert body["routes"] == []
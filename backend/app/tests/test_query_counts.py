@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import TestingSessionLocal, count_statements, engine
+from app.core.auth import get_current_user
+from app.database import get_db
+from app.main import app
+from app.models.base import Base
+from app.models.business import Business
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.models.refund import Refund, RefundItem
+from app.models.sale import Sale, SaleItem
+from app.models.supplier import PurchaseOrder, PurchaseOrderItem, Supplier
+from app.models.user import User
+
+ROWS = 30
+SMALL_PAGE, LARGE_PAGE = 5, 25
+
+# Every list endpoint must cost the same number of statements whatever the page size
+LIST_ENDPOINTS = [
+    "/api/sales/",
+    "/api/refunds/",
+    "/api/products/",
+    "/api/inventory/history",
+    "/api/suppliers/purchase-orders",
+]
+
+def seed(db):
+    """ROWS of everything, each sale by its own cashier so per-row lookups would show"""
+    business = Business(name="Count Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    users = [
+        User(username=f"cashier{i}", email=f"cashier{i}@example.com", hashed_password="x", business_id=business.id)
+        for i in range(ROWS)
+    ]
+    db.add_all(users)
+    db.flush()
+    products = [
+        Product(name=f"Product {i}", price=1.0 + i, cost_price=0.5 + i, stock_quantity=100,
+                business_id=business.id, barcode=f"QC{i:05d}", business_product_number=i + 1)
+        for i in range(ROWS)
+    ]
+    db.add_all(products)
+    supplier = Supplier(name="Count Supplier", business_id=business.id)
+    db.add(supplier)
+    db.flush()
+
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    for n in range(ROWS):
+        user = users[n]
+        product = products[n]
+        sale = Sale(business_id=business.id, user_id=user.id, total_amount=product.price, tax_amount=0.0,
+                    original_amount=product.price, original_currency="USD", exchange_rate_at_sale=1.0,
+                    business_sale_number=n + 1, payment_status="completed", created_at=start + timedelta(minutes=n))
+        db.add(sale)
+        db.flush()
+        item = SaleItem(sale_id=sale.id, product_id=product.id, quantity=2, unit_price=product.price,
+                        subtotal=product.price * 2, original_unit_price=product.price, original_subtotal=product.price * 2)
+        db.add(item)
+        db.flush()
+        refund = Refund(sale_id=sale.id, user_id=user.id, business_id=business.id, business_refund_number=n + 1,
+                        total_amount=product.price, original_amount=product.price, original_currency="USD",
+                        exchange_rate_at_refund=1.0, status="processed", created_at=sale.created_at)
+        db.add(refund)
+        db.flush()
+        db.add(RefundItem(refund_id=refund.id, sale_item_id=item.id, quantity=1))
+        db.add(InventoryHistory(product_id=product.id, business_id=business.id, business_inventory_number=n + 1,
+                                change_type="sale", quantity_change=-2, previous_quantity=100, new_quantity=98,
+                                changed_by=user.id, changed_at=sale.created_at))
+        po = PurchaseOrder(supplier_id=supplier.id, business_id=business.id, po_number=f"PO-QC-{n:04d}",
+                           total_amount=10.0, created_by=user.id, created_at=sale.created_at)
+        db.add(po)
+        db.flush()
+        db.add(PurchaseOrderItem(po_id=po.id, product_id=product.id, quantity=5, unit_cost=0.5))
+    db.commit()
+    return {
+        "id": users[0].id, "email": users[0].email, "username": users[0].username,
+        "business_id": business.id, "is_active": True,
+        "permissions": ["sale:read", "product:read", "inventory:read", "purchase_order:read"],
+    }
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    current_user = seed(db)
+    db.close()
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: current_user
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_current_user, None)
+    Base.metadata.drop_all(bind=engine)
+
+def statements_for(client, path, limit):
+    with count_statements() as statements:
+        response = client.get(path, params={"limit": limit})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == limit
+    return statements
+
+@pytest.mark.parametrize("path", LIST_ENDPOINTS)
+def test_statement_count_does_not_grow_with_page_size(client, path):
+    small = statements_for(client, path, SMALL_PAGE)
+    large = statements_for(client, path, LARGE_PAGE)
+
+    assert len(large) == len(small), (
+        f"{path}: {len(small)} statements for {SMALL_PAGE} rows but {len(large)} for {LARGE_PAGE}:\n"
+        + "\n".join(" ".join(statement.split())[:150] for statement in large)
+    )
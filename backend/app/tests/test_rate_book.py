@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from conftest import TestingSessionLocal
+from app.services.rate_book import RateBook
+
+def test_sync_and_async_misses_share_one_fetch(tables):
+    started, release = threading.Event(), threading.Event()
+    fetches = []
+
+    def fetcher():
+        fetches.append(threading.current_thread().name)
+        started.set()
+        assert release.wait(5)
+        return {"KES": 130.0}
+
+    book = RateBook(ttl_seconds=3600, retry_seconds=60, session_factory=TestingSessionLocal, fetcher=fetcher)
+    results = {}
+    worker = threading.Thread(target=lambda: results.setdefault("sync", book.get_rate("USD", "KES")))
+    worker.start()
+    assert started.wait(5)
+
+    async def scenario():
+        waiting = asyncio.create_task(book.aget_rate("USD", "KES"))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        # Nothing holds a lock across the download
+        assert await asyncio.wait_for(asyncio.to_thread(book.ensure_loaded), 1) is None
+        release.set()
+        return await waiting
+
+    results["async"] = asyncio.run(scenario())
+    worker.join(5)
+    assert results == {"sync": 130.0, "async": 130.0}
+    assert len(fetches) == 1
+    assert book.refresh_successes == 1
+
+def test_failed_fetch_releases_waiters_with_what_is_known(tables):
+    book = RateBook(ttl_seconds=3600, retry_seconds=60, session_factory=TestingSessionLocal, fetcher=lambda: None)
+    assert book.get_rate("USD", "KES") is None
+    assert book.refresh_failures == 1
+    # Inside the retry window nothing is fetched again
+    assert book.get_rate("USD", "KES") is None
+    assert book.refresh_failures == 1
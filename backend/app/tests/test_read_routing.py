@@ -0,0 +1,69 @@
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every mapper
+from app import database
+from app.database import ReplicaMonitor, RoutingSession
+from app.models.base import Base
+from app.models.business import Business
+
+def make_engine(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+@pytest.fixture
+def engines(tmp_path):
+    """Two SQLite files standing in for the primary and its replica, told apart by one row"""
+    primary, replica = make_engine(tmp_path / "primary.db"), make_engine(tmp_path / "replica.db")
+    for engine, name in ((primary, "On primary"), (replica, "On replica")):
+        with sessionmaker(bind=engine)() as db:
+            db.add(Business(name=name, currency_code="USD"))
+            db.commit()
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+def routing_session(primary, replica, monitor):
+    return sessionmaker(class_=RoutingSession, primary=primary, replica=replica, monitor=monitor)()
+
+def test_reads_go_to_replica_and_writes_to_primary(engines):
+    primary, replica = engines
+    db = routing_session(primary, replica, ReplicaMonitor(replica))
+
+    assert [b.name for b in db.query(Business).all()] == ["On replica"]
+
+    db.add(Business(name="Written", currency_code="USD"))
+    db.commit()
+    db.close()
+
+    with sessionmaker(bind=primary)() as check:
+        assert {b.name for b in check.query(Business).all()} == {"On primary", "Written"}
+    with sessionmaker(bind=replica)() as check:
+        assert [b.name for b in check.query(Business).all()] == ["On replica"]
+
+def test_unreachable_replica_falls_back_to_primary(engines, tmp_path):
+    primary, _ = engines
+    missing = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    db = routing_session(primary, missing, ReplicaMonitor(missing))
+
+    assert [b.name for b in db.query(Business).all()] == ["On primary"]
+    db.close()
+
+def test_lagging_replica_falls_back_until_rechecked(engines, monkeypatch):
+    primary, replica = engines
+    lag = {"seconds": 30.0}
+    monkeypatch.setattr(database, "replication_lag", lambda connection: lag["seconds"])
+    monitor = ReplicaMonitor(replica, max_lag=5, interval=60)
+
+    db = routing_session(primary, replica, monitor)
+    assert [b.name for b in db.query(Business).all()] == ["On primary"]
+    db.close()
+
+    # Cached until the next check
+    lag["seconds"] = 1.0
+    assert not monitor.usable()
+    monitor.interval = 0
+    assert monitor.usable()
@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from conftest import TestingSessionLocal
+from app.crud.report import get_sales_report
+from app.models.base import Base
+from app.models.business import Business
+from app.models.report_job import ReportJob
+from app.models.sales_rollup import DailySalesRollup
+from app.services import report_job_service
+from app.services.report_job_service import ReportJobService
+
+START, END = date(2026, 9, 1), date(2026, 9, 30)
+
+@pytest.fixture
+def business_id(db):
+    business = Business(name="Report Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    db.add(DailySalesRollup(business_id=business.id, sale_date=date(2026, 9, 10), currency_code="USD",
+                            payment_method="cash", sales_usd=40.0, transactions=2, payment_count=2))
+    db.commit()
+    return business.id
+
+def submit(db, business_id, report_type="sales"):
+    return ReportJobService.submit(db, db, business_id, None, report_type, START, END)
+
+def test_job_runs_in_the_background_and_is_reused(db, business_id):
+    job, cached = submit(db, business_id)
+    assert (job.status, cached) == ("queued", False)
+
+    assert ReportJobService.run_pending(TestingSessionLocal, TestingSessionLocal) == 1
+    db.refresh(job)
+    assert job.status == "done"
+    assert job.result["summary"] == get_sales_report(db, START, END, business_id)["summary"]
+
+    again, cached = submit(db, business_id)
+    assert (again.id, cached) == (job.id, True)
+    assert db.query(ReportJob).count() == 1
+
+def test_new_data_in_the_range_gets_a_new_job(db, business_id):
+    job, _ = submit(db, business_id)
+    ReportJobService.run_pending(TestingSessionLocal, TestingSessionLocal)
+
+    bucket = db.query(DailySalesRollup).one()
+    bucket.transactions += 1
+    bucket.sales_usd += 15.0
+    db.commit()
+
+    fresh, cached = submit(db, business_id)
+    assert fresh.id != job.id and not cached
+    # Other report types and ranges are keyed separately
+    assert submit(db, business_id, "financial")[0].id not in (job.id, fresh.id)
+
+def test_failed_jobs_are_retried_then_given_up(db, business_id, monkeypatch):
+    calls = []
+
+    def broken(read_db, job):
+        calls.append(job.id)
+        raise RuntimeError("database went away")
+
+    monkeypatch.setitem(report_job_service.REPORT_BUILDERS, "sales", (True, broken))
+    monkeypatch.setattr(report_job_service, "REPORT_JOB_MAX_ATTEMPTS", 2)
+    job, _ = submit(db, business_id)
+
+    ReportJobService.run_pending(TestingSessionLocal, TestingSessionLocal)
+
+    db.refresh(job)
+    assert (job.status, job.attempts, len(calls)) == ("failed", 2, 2)
+    assert job.error == "database went away"
+    # A failed job is not a cache hit
+    assert submit(db, business_id)[0].id != job.id
+
+def test_jobs_of_a_dead_worker_are_taken_over(db, business_id):
+    job, _ = submit(db, business_id)
+    assert ReportJobService.claim(db, "crashed-worker") == job.id
+    assert ReportJobService.claim(db, "second-worker") is None
+
+    db.query(ReportJob).update({"heartbeat_at": datetime.now() - timedelta(hours=1)})
+    db.commit()
+
+    assert ReportJobService.run_pending(TestingSessionLocal, TestingSessionLocal) == 1
+    db.refresh(job)
+    assert (job.status, job.attempts) == ("done", 2)
+
+@pytest.fixture
+def file_sessions(tmp_path, monkeypatch):
+    """A file database, so the heartbeat thread gets a connection of its own, and a one-second stale window"""
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=file_engine)
+    monkeypatch.setattr(report_job_service, "REPORT_JOB_STALE_SECONDS", 1)
+    monkeypatch.setattr(report_job_service, "REPORT_JOB_HEARTBEAT_SECONDS", 0.1)
+    yield sessionmaker(bind=file_engine)
+    file_engine.dispose()
+
+def slow_job(sessions, monkeypatch, while_running):
+    """Queue a sales job whose builder outlives the stale window, calling `while_running` meanwhile"""
+    def slow(read_db, job):
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            while_running(job.id)
+            time.sleep(0.2)
+        return {"built": True}
+
+    monkeypatch.setitem(report_job_service.REPORT_BUILDERS, "sales", (True, slow))
+    with sessions() as db:
+        business = Business(name="Slow Shop", currency_code="USD")
+        db.add(business)
+        db.commit()
+        return submit(db, business.id)[0].id
+
+def test_a_long_job_keeps_its_worker(file_sessions, monkeypatch):
+    takeovers = []
+
+    def try_to_take_over(job_id):
+        with file_sessions() as other:
+            takeovers.append(ReportJobService.claim(other, "second-worker"))
+
+    job_id = slow_job(file_sessions, monkeypatch, try_to_take_over)
+    assert ReportJobService.run_next(file_sessions, file_sessions, "first-worker") == job_id
+
+    assert takeovers and set(takeovers) == {None}
+    with file_sessions() as db:
+        job = db.get(ReportJob, job_id)
+        assert (job.status, job.worker_id, job.attempts, job.result) == ("done", "first-worker", 1, {"built": True})
+
+def test_a_worker_that_lost_its_job_does_not_record_it(file_sessions, monkeypatch):
+    heartbeat = ReportJobService.heartbeat
+    beating, dead = threading.Lock(), threading.Event()
+
+    def heartbeat_until_dead(db, job_id, worker_id):
+        with beating:
+            return not dead.is_set() and heartbeat(db, job_id, worker_id)
+
+    monkeypatch.setattr(ReportJobService, "heartbeat", staticmethod(heartbeat_until_dead))
+
+    def taken_over(job_id):
+        if dead.is_set():
+            return
+        # The first worker stops beating before it is made to look dead, so no
+        # heartbeat can land between backdating and the second worker's claim
+        with beating:
+            dead.set()
+        with file_sessions() as other:
+            other.query(ReportJob).update({"heartbeat_at": datetime.now() - timedelta(hours=1)})
+            other.commit()
+            assert ReportJobService.claim(other, "second-worker") == job_id
+
+    job_id = slow_job(file_sessions, monkeypatch, taken_over)
+    ReportJobService.run_next(file_sessions, file_sessions, "first-worker")
+
+    with file_sessions() as db:
+        job = db.get(ReportJob, job_id)
+        assert (job.status, job.worker_id, job.attempts, job.result) == ("running", "second-worker", 2, None)
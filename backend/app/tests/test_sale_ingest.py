@@ -0,0 +1,114 @@
+from datetime import date, datetime
+
+import pytest
+
+from sqlalchemy import func
+
+from app.models.business import Business
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.models.sale import Sale, SaleItem
+from app.models.sale_ingest import SaleIngestKey
+from app.models.sales_rollup import DailySalesRollup
+from app.models.user import User
+from app.schemas.sale_schema import QueuedSaleCreate
+from app.services.sale_ingest_service import SaleIngestService
+
+@pytest.fixture
+def shop(db):
+    business = Business(name="Offline Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    user = User(username="till", email="till@example.com", hashed_password="x", business_id=business.id)
+    products = [
+        Product(name=f"Item {i}", price=2.0, cost_price=1.0, stock_quantity=5, business_id=business.id, barcode=f"ING{i}")
+        for i in range(2)
+    ]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+    return business, user, products
+
+def queued(key, user, lines, **extra):
+    total = sum(quantity * 2.0 for _, quantity in lines)
+    return QueuedSaleCreate(
+        idempotency_key=key,
+        user_id=user.id,
+        sale_items=[{"product_id": product.id, "quantity": quantity, "unit_price": 2.0} for product, quantity in lines],
+        payments=[{"amount": total, "payment_method": "cash"}],
+        **extra
+    )
+
+def test_batch_creates_numbers_and_rejects_per_sale(db, shop):
+    business, user, (first, second) = shop
+    sales = [
+        queued("a", user, [(first, 2), (second, 1)]),
+        queued("b", user, [(first, 4)]),  # only 3 left
+        queued("c", user, [(first, 3)]),
+        queued("a", user, [(first, 2), (second, 1)]),  # resent within the batch
+    ]
+
+    results = SaleIngestService.ingest(db, business, user.id, sales, chunk_size=2)
+
+    assert [result["status"] for result in results] == ["created", "rejected", "created", "duplicate"]
+    assert results[1]["error"] == "Insufficient stock for product Item 0"
+    assert [results[0]["business_sale_number"], results[2]["business_sale_number"]] == [1, 2]
+    assert results[3]["sale_id"] == results[0]["sale_id"]
+
+    db.expire_all()
+    assert [db.get(Product, first.id).stock_quantity, db.get(Product, second.id).stock_quantity] == [0, 4]
+    assert db.query(SaleItem).count() == 3
+    history = db.query(InventoryHistory).order_by(InventoryHistory.business_inventory_number).all()
+    assert [(row.reason, row.previous_quantity, row.new_quantity) for row in history] == [
+        ("Sale #1", 5, 3), ("Sale #1", 5, 4), ("Sale #2", 3, 0)
+    ]
+    # The rejected sale's key stays free for a retry
+    assert sorted(key for (key,) in db.query(SaleIngestKey.idempotency_key)) == ["a", "c"]
+    rollup = db.query(DailySalesRollup).one()
+    assert (rollup.transactions, rollup.items_sold, rollup.sales_usd, rollup.payment_count) == (2, 6, 12.0, 2)
+
+def test_resent_batch_creates_nothing(db, shop):
+    business, user, (first, _) = shop
+    sales = [queued(f"k{i}", user, [(first, 1)]) for i in range(3)]
+
+    created = SaleIngestService.ingest(db, business, user.id, sales)
+    resent = SaleIngestService.ingest(db, business, user.id, sales + [queued("k3", user, [(first, 1)])])
+
+    assert [result["status"] for result in resent] == ["duplicate"] * 3 + ["created"]
+    assert [result["sale_id"] for result in resent[:3]] == [result["sale_id"] for result in created]
+    assert resent[3]["business_sale_number"] == 4
+    assert db.query(Sale).count() == 4
+    db.expire_all()
+    assert db.get(Product, first.id).stock_quantity == 1
+
+def test_offline_sales_keep_their_time(db, shop):
+    business, user, (first, _) = shop
+    occurred_at = datetime(2026, 10, 1, 9, 30)
+
+    SaleIngestService.ingest(db, business, user.id, [queued("old", user, [(first, 1)], occurred_at=occurred_at)])
+
+    assert db.query(Sale.created_at).scalar() == occurred_at
+    assert db.query(func.count(DailySalesRollup.id)).filter(DailySalesRollup.sale_date == date(2026, 10, 1)).scalar() == 1
+
+def test_keys_freed_by_a_rolled_back_upload_are_claimed_again(db, shop, monkeypatch):
+    business, user, (first, _) = shop
+    claim = SaleIngestService.claim
+    withheld = {"b": 1, "c": 2}
+
+    def claim_after_rollbacks(db, business_id, keys):
+        # As if another upload held the key and rolled back: the insert waited
+        # and claimed nothing, yet no row is left behind
+        skipped = [key for key in keys if withheld.get(key)]
+        for key in skipped:
+            withheld[key] -= 1
+        return claim(db, business_id, [key for key in keys if key not in skipped])
+
+    monkeypatch.setattr(SaleIngestService, "claim", staticmethod(claim_after_rollbacks))
+    results = SaleIngestService.ingest(db, business, user.id, [queued(key, user, [(first, 1)]) for key in "abc"])
+
+    assert [result["status"] for result in results] == ["created", "created", "failed"]
+    assert results[2]["error"] == "Sale is being uploaded by another request; retry"
+    assert sorted(key for (key,) in db.query(SaleIngestKey.idempotency_key)) == ["a", "b"]
+
+    retried = SaleIngestService.ingest(db, business, user.id, [queued("c", user, [(first, 1)])])
+    assert retried[0]["status"] == "created" and retried[0]["business_sale_number"] == 3
@@ -0,0 +1,160 @@
+import importlib.util
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from app.crud.refund import process_refund
+from app.crud.report import get_sales_report
+from app.crud.sale import create_sale
+from app.models.business import Business
+from app.models.product import Product
+from app.models.sale import Sale, SaleItem
+from app.models.sales_rollup import DailySalesRollup
+from app.models.user import User
+from app.schemas.refund_schema import RefundCreate
+from app.schemas.sale_schema import QueuedSaleCreate, SaleCreate
+from app.services.rollup_service import METRICS, RollupService
+from app.services.sale_ingest_service import SaleIngestService
+
+RATE = 1 / 4.0  # local currency -> USD
+MIGRATION = Path(__file__).resolve().parents[2] / "alembic" / "versions" / "e5b2d8a41c67_add_daily_sales_rollup.py"
+
+@pytest.fixture
+def shop(db):
+    """A business in a non-USD currency, its cashier and two products"""
+    business = Business(name="Rollup Shop", currency_code="KES")
+    db.add(business)
+    db.flush()
+    user = User(username="cashier", email="cashier@example.com", hashed_password="x", business_id=business.id)
+    products = [
+        Product(name=f"Item {i}", price=2.0, cost_price=1.0, original_cost_price=4.0, stock_quantity=10,
+                business_id=business.id, barcode=f"RUP{i}")
+        for i in range(2)
+    ]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+    return business, user, products
+
+def sell(db, user, products, payments):
+    """Two of the first product and one of the second, 20.0 in local currency"""
+    first, second = products
+    return create_sale(db, SaleCreate(
+        user_id=user.id, tax_rate=0.0,
+        sale_items=[{"product_id": first.id, "quantity": 2, "unit_price": 8.0},
+                    {"product_id": second.id, "quantity": 1, "unit_price": 4.0}],
+        payments=[{"amount": amount, "payment_method": method} for amount, method in payments]
+    ), user.id, exchange_rate=RATE)
+
+def sell_yesterday(db, business, user, products):
+    """The same basket, queued offline yesterday and paid in cash"""
+    first, second = products
+    occurred_at = datetime.utcnow() - timedelta(days=1)
+    SaleIngestService.ingest(db, business, user.id, [QueuedSaleCreate(
+        idempotency_key="yesterday", user_id=user.id, occurred_at=occurred_at,
+        sale_items=[{"product_id": first.id, "quantity": 2, "unit_price": 8.0},
+                    {"product_id": second.id, "quantity": 1, "unit_price": 4.0}],
+        payments=[{"amount": 20.0, "payment_method": "cash"}]
+    )], current_rate=RATE)
+    return db.query(Sale).filter(Sale.business_sale_number == 1).one()
+
+def refund(db, user, sale, lines):
+    """lines: [(product, quantity)]"""
+    items = {item.product_id: item.id for item in db.query(SaleItem).filter_by(sale_id=sale.id)}
+    return process_refund(db, RefundCreate(sale_id=sale.id, refund_items=[
+        {"sale_item_id": items[product.id], "quantity": quantity} for product, quantity in lines
+    ]), user.id)
+
+def buckets(db):
+    """{(day, currency, method): {metric: value}}, leaving out buckets that are all zero"""
+    rows = {}
+    for row in db.query(DailySalesRollup).all():
+        metrics = {metric: getattr(row, metric) for metric in METRICS}
+        if any(metrics.values()):
+            rows[(row.sale_date, row.currency_code, row.payment_method)] = metrics
+    return rows
+
+def assert_same_buckets(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, metrics in expected.items():
+        assert actual[key] == pytest.approx(metrics), key
+
+def test_checkout_shows_up_in_the_sales_report(db, shop):
+    business, user, products = shop
+    sale = sell(db, user, products, [(12.0, "cash"), (8.0, "card")])
+    day = sale.created_at.date()
+
+    report = get_sales_report(db, day, day, business.id)
+    assert report["summary"] == {
+        "total_sales": 5.0, "total_sales_original": 20.0, "total_tax": 0.0, "total_transactions": 1,
+        "average_transaction_value": 5.0, "payment_methods": {"cash": 1, "card": 1}, "primary_currency": "KES"
+    }
+    assert [(trend["date"], trend["daily_sales"], trend["transactions"]) for trend in report["sales_trends"]] == [
+        (str(day), 5.0, 1)
+    ]
+    # Sale totals go to the first payment's method, payments to their own
+    rows = buckets(db)
+    assert rows[(day, "KES", "cash")] == pytest.approx({
+        **dict.fromkeys(METRICS, 0), "sales_usd": 5.0, "sales_original": 20.0, "transactions": 1, "items_sold": 3,
+        "cogs_usd": 3.0, "cogs_original": 12.0, "payment_count": 1, "payments_usd": 3.0, "payments_original": 12.0
+    })
+    assert rows[(day, "KES", "card")] == pytest.approx({
+        **dict.fromkeys(METRICS, 0), "payment_count": 1, "payments_usd": 2.0, "payments_original": 8.0
+    })
+    assert get_sales_report(db, day + timedelta(days=1), day + timedelta(days=1), business.id)["summary"][
+        "total_transactions"] == 0
+
+def test_refunds_land_on_the_refund_day_and_a_full_refund_leaves_the_sale_day(db, shop):
+    business, user, products = shop
+    first, second = products
+    sale = sell_yesterday(db, business, user, products)
+    sale_day = sale.created_at.date()
+
+    partial = refund(db, user, sale, [(first, 1)])
+    refund_day = partial.created_at.date()
+    assert refund_day == sale_day + timedelta(days=1)
+    rows = buckets(db)
+    assert rows[(sale_day, "KES", "cash")] == pytest.approx({
+        **dict.fromkeys(METRICS, 0), "sales_usd": 5.0, "sales_original": 20.0, "transactions": 1, "items_sold": 3,
+        "cogs_usd": 3.0, "cogs_original": 12.0, "payment_count": 1, "payments_usd": 5.0, "payments_original": 20.0
+    })
+    assert rows[(refund_day, "KES", "cash")] == pytest.approx({
+        **dict.fromkeys(METRICS, 0), "refunds_usd": 2.0, "refunds_original": 8.0, "refund_count": 1
+    })
+
+    refund(db, user, sale, [(first, 1), (second, 1)])
+    rows = buckets(db)
+    # The sale no longer counts as completed; its payment still happened that day
+    assert rows[(sale_day, "KES", "cash")] == pytest.approx({
+        **dict.fromkeys(METRICS, 0), "payment_count": 1, "payments_usd": 5.0, "payments_original": 20.0
+    })
+    assert rows[(refund_day, "KES", "cash")] == pytest.approx({
+        **dict.fromkeys(METRICS, 0), "refunds_usd": 5.0, "refunds_original": 20.0, "refund_count": 2
+    })
+    assert get_sales_report(db, sale_day, sale_day, business.id)["sales_trends"] == []
+
+def test_rebuild_and_backfill_match_incremental_maintenance(db, shop):
+    business, user, products = shop
+    first, second = products
+    yesterday = sell_yesterday(db, business, user, products)
+    today = sell(db, user, products, [(12.0, "cash"), (8.0, "card")])
+    sell(db, user, products, [(20.0, "mobile_money")])
+    refund(db, user, today, [(second, 1)])
+    refund(db, user, yesterday, [(first, 2), (second, 1)])
+    incremental = buckets(db)
+    assert len(incremental) == 4
+
+    assert RollupService.rebuild(db, business_id=business.id) == len(incremental)
+    assert_same_buckets(buckets(db), incremental)
+
+    # The migration's backfill starts from an empty table
+    spec = importlib.util.spec_from_file_location("add_daily_sales_rollup", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    db.query(DailySalesRollup).delete()
+    db.execute(text(migration.BACKFILL))
+    db.commit()
+    db.expire_all()
+    assert_same_buckets(buckets(db), incremental)
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.business import Business
+from app.models.business_sequence import BusinessSequence
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.models.sale import Sale
+from app.models.user import User
+from app.schemas.sale_schema import SaleCreate
+from app.services.checkout_service import CheckoutService
+from app.services.sequence_service import SequenceBlocks, SequenceService
+
+def test_reserve_block_creates_and_bumps_the_sequence(db):
+    assert SequenceService.reserve_block(db, 1, "sale", 1) == 1
+    assert SequenceService.reserve_block(db, 1, "sale", 5) == 2
+    assert SequenceService.get_next_number(db, 1, "sale") == 7
+    assert SequenceService.get_next_number(db, 2, "sale") == 1
+    db.commit()
+
+    assert SequenceService.get_current_number(db, 1, "sale") == 7
+
+def test_blocks_are_reserved_in_their_own_transaction(tmp_path):
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'blocks.db'}")
+    Base.metadata.create_all(bind=file_engine)
+    blocks = SequenceBlocks(block_size=5)
+
+    assert blocks.take(file_engine, 1, "inventory", 3) == [1, 2, 3]
+    assert blocks.take(file_engine, 1, "inventory", 4) == [4, 5, 6, 7]
+    assert blocks.take(file_engine, 1, "inventory", 12) == [8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
+
+    with sessionmaker(bind=file_engine)() as check:
+        # Committed as soon as reserved; a request larger than a block reserves just what it needs
+        assert SequenceService.get_current_number(check, 1, "inventory") == 19
+    file_engine.dispose()
+
+def test_a_refill_does_not_hold_up_other_businesses(tmp_path, monkeypatch):
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'blocks.db'}")
+    Base.metadata.create_all(bind=file_engine)
+    blocks = SequenceBlocks(block_size=5)
+    refilling, release = threading.Event(), threading.Event()
+    bump = SequenceService.bump
+
+    def slow_bump(executor, business_id, entity_type, count):
+        if business_id == 1:
+            refilling.set()
+            assert release.wait(5)
+        return bump(executor, business_id, entity_type, count)
+
+    monkeypatch.setattr(SequenceService, "bump", staticmethod(slow_bump))
+    taken = {}
+    slow = threading.Thread(target=lambda: taken.setdefault(1, blocks.take(file_engine, 1, "inventory", 2)))
+    slow.start()
+    assert refilling.wait(5)
+
+    # Business 2 refills and allocates while business 1 is still waiting on its refill
+    other = threading.Thread(target=lambda: taken.setdefault(2, blocks.take(file_engine, 2, "inventory", 3)))
+    other.start()
+    other.join(5)
+    assert taken == {2: [1, 2, 3]}
+
+    release.set()
+    slow.join(5)
+    assert taken == {1: [1, 2], 2: [1, 2, 3]}
+    file_engine.dispose()
+
+def test_checkout_numbers_sale_and_history_at_the_end(db):
+    business = Business(name="Numbering Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    user = User(username="numberer", email="numberer@example.com", hashed_password="x", business_id=business.id)
+    products = [
+        Product(name=f"Item {i}", price=2.0, cost_price=1.0, stock_quantity=50, business_id=business.id, barcode=f"SEQ{i}")
+        for i in range(3)
+    ]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+
+    for _ in range(4):
+        sale_data = SaleCreate(
+            user_id=user.id,
+            sale_items=[{"product_id": product.id, "quantity": 1, "unit_price": 2.0} for product in products],
+            payments=[{"amount": 6.0, "payment_method": "cash"}],
+            tax_rate=0.0
+        )
+        CheckoutService.create_sale(db, sale_data, user.id, business)
+        db.commit()
+
+    sales = db.query(Sale).order_by(Sale.id).all()
+    assert [sale.business_sale_number for sale in sales] == [1, 2, 3, 4]
+    history = db.query(InventoryHistory).order_by(InventoryHistory.id).all()
+    assert [row.business_inventory_number for row in history] == list(range(1, 13))
+    assert [row.reason for row in history[-3:]] == ["Sale #4"] * 3
+    assert db.query(BusinessSequence).filter_by(business_id=business.id, entity_type="inventory").one().last_number == 12
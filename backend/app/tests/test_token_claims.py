@@ -0,0 +1,67 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core import token_claims
+from app.core.auth import build_token_claims, create_access_token, get_current_user
+from app.core.permission_cache import permission_cache
+from app.crud.user import bump_role_version
+from app.models.business import Business
+from app.models.permission import Permission, Role
+from app.models.user import User
+
+@pytest.fixture
+def cashier(db, monkeypatch):
+    """A cashier who may only sell, with claims-mode tokens switched on"""
+    business = Business(name="Claims Shop", currency_code="USD")
+    db.add(business)
+    db.flush()
+    sell, refund = Permission(name="sale:create"), Permission(name="refund:create")
+    user = User(username="cashier", email="cashier@example.com", hashed_password="x", business_id=business.id,
+                roles=[Role(name="Cashier", permissions=[sell])])
+    db.add_all([refund, user])
+    db.commit()
+
+    monkeypatch.setattr(token_claims, "AUTH_TOKEN_MODE", "claims")
+    token_claims.permission_catalog.load(db)
+    permission_cache.clear()
+    yield user
+    permission_cache.clear()
+
+def authenticate(db, token):
+    return asyncio.run(get_current_user(Request({"type": "http"}), token, db))
+
+def assert_rejected(db, token):
+    with pytest.raises(HTTPException) as rejected:
+        authenticate(db, token)
+    assert rejected.value.status_code == 401
+
+def test_permissions_come_from_the_token(db, cashier):
+    context = authenticate(db, create_access_token(build_token_claims(cashier)))
+    assert (context["id"], context["username"], context["permissions"]) == (cashier.id, "cashier", ["sale:create"])
+
+def test_tokens_minted_before_a_role_change_are_rejected(db, cashier):
+    old_token = create_access_token(build_token_claims(cashier))
+    authenticate(db, old_token)
+
+    bump_role_version(cashier)
+    db.commit()
+    permission_cache.invalidate_user(cashier.id)
+    assert_rejected(db, old_token)
+
+    # A token minted after the change is accepted
+    assert authenticate(db, create_access_token(build_token_claims(cashier)))["permissions"] == ["sale:create"]
+
+def test_tampered_permission_bits_fail_verification(db, cashier):
+    header, payload, signature = create_access_token(build_token_claims(cashier)).split(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    refund_id = db.query(Permission).filter_by(name="refund:create").one().id
+    claims["perms"] = token_claims.encode_permission_bits(
+        token_claims.decode_permission_bits(claims["perms"]) + [refund_id]
+    )
+    forged = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    assert_rejected(db, ".".join((header, forged, signature)))
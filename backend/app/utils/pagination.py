@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+from sqlalchemy import Date, DateTime, tuple_
+
+# Response header carrying the cursor for the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursor(ValueError):
+    """The cursor could not be decoded or does not match the listing"""
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Pack the sort-key values of the last row into an opaque, URL-safe cursor"""
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Unpack a cursor, converting each value back to its column's Python type"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {str(e)}")
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise InvalidCursor("Invalid cursor: does not match this listing")
+
+    values = []
+    for column, value in zip(columns, payload):
+        try:
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor(f"Invalid cursor: {str(e)}")
+        values.append(value)
+    return values
+
+def keyset_paginate(query, columns: Sequence, cursor: Optional[str], skip: int, limit: int, descending: bool = True):
+    """
+    Order `query` by `columns` and return one page of it.
+
+    With a cursor, the page starts right after the row the cursor was made
+    from, using a row-value comparison the (business_id, ...) indexes can
+    seek on. Without one, falls back to offset paging with `skip`. The
+    columns must end with a unique column (normally the primary key) so
+    rows with the same timestamp are neither repeated nor skipped.
+    """
+    order = [column.desc() if descending else column.asc() for column in columns]
+    query = query.order_by(*order)
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        position = tuple_(*columns)
+        query = query.filter(position < tuple_(*values) if descending else position > tuple_(*values))
+    elif skip:
+        query = query.offset(skip)
+
+    return query.limit(limit).all()
+
+def next_cursor(rows: Sequence, limit: int, key: Callable[[Any], Sequence[Any]]) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this page was the last"""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(key(rows[-1]))
+
+def set_next_cursor(response, rows: Sequence, limit: int, key: Callable[[Any], Sequence[Any]]):
+    """Advertise the next page's cursor on a list response"""
+    cursor = next_cursor(rows, limit, key)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
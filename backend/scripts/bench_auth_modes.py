@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Auth benchmark: requests/sec for GET /api/products/ under each way of authorizing a token.
+
+Usage:
+    python scripts/bench_auth_modes.py [--requests 2000] [--concurrency 20]
+
+  db         user and permissions loaded from the database on every request
+  db-cached  the same lookups served by the process-local permission cache
+  claims     AUTH_TOKEN_MODE=claims: permissions read from the token bitset,
+             only the role version is checked (and cached)
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from bench_utils import StatementCounter, auth_headers, grant_permissions, make_engine, make_session_factory, percentile, seed_business
+
+import httpx
+
+from app.core import token_claims
+from app.core.permission_cache import permission_cache
+from app.database import get_db
+from app.main import app
+
+MODES = {
+    "db": ("db", 0),
+    "db-cached": ("db", 30),
+    "claims": ("claims", 30),
+}
+
+
+async def drive(headers, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, failures = [], 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get("/api/products/", headers=headers)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return samples, failures, elapsed
+
+
+def run(requests: int, concurrency: int):
+    engine = make_engine(pool_size=concurrency + 5, max_overflow=0)
+    SessionLocal = make_session_factory(engine)
+
+    def bench_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_db
+
+    db = SessionLocal()
+    business, user, products = seed_business(db, products=20)
+    grant_permissions(db, user, ["product:read", "product:create", "sale:create", "sale:read"])
+    headers = auth_headers(user)
+    db.close()
+
+    print(f"{requests} requests, concurrency {concurrency}")
+    print(f"{'mode':>10} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'stmts/req':>10} {'failed':>7}")
+    for name, (token_mode, cache_ttl) in MODES.items():
+        token_claims.AUTH_TOKEN_MODE = token_mode
+        permission_cache.ttl_seconds = cache_ttl
+        permission_cache.clear()
+        with StatementCounter(engine) as counter, contextlib.redirect_stdout(io.StringIO()):
+            samples, failures, elapsed = asyncio.run(drive(headers, requests, concurrency))
+        print(f"{name:>10} {requests / elapsed:>8.1f} {percentile(samples, 50):>9.2f} "
+              f"{percentile(samples, 95):>9.2f} {counter.count / requests:>10.2f} {failures:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Checkout benchmark: database round trips and latency of a sale against basket size.
+
+Usage:
+    python scripts/bench_checkout.py [--sales 200] [--sizes 1,5,10,20,40]
+
+Round trips should stay flat as the basket grows; latency should grow only
+with the size of the bulk inserts.
+"""
+import argparse
+
+from bench_utils import StatementCounter, make_engine, make_session_factory, percentile, seed_business, timed
+
+from app.models.business import Business
+from app.schemas.sale_schema import SaleCreate
+from app.services.checkout_service import CheckoutService
+
+
+def build_basket(user_id: int, catalog, size: int, offset: int) -> SaleCreate:
+    lines = [catalog[(offset + i) % len(catalog)] for i in range(size)]
+    total = sum(price for _, price in lines)
+    return SaleCreate(
+        user_id=user_id,
+        sale_items=[{"product_id": product_id, "quantity": 1, "unit_price": price} for product_id, price in lines],
+        payments=[{"amount": total, "payment_method": "cash"}],
+        tax_rate=0.0
+    )
+
+
+def run(sales: int, sizes):
+    engine = make_engine()
+    SessionLocal = make_session_factory(engine)
+
+    db = SessionLocal()
+    business, user, products = seed_business(db, products=max(sizes) * 2)
+    business_id, user_id = business.id, user.id
+    catalog = [(p.id, p.price) for p in products]
+    db.close()
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{'basket':>7} {'round trips':>12} {'p50 ms':>9} {'p95 ms':>9}")
+
+    for size in sizes:
+        samples = []
+        round_trips = []
+        for n in range(sales):
+            db = SessionLocal()
+            try:
+                business = db.get(Business, business_id)
+                basket = build_basket(user_id, catalog, size, n)
+                with StatementCounter(engine) as counter, timed(samples):
+                    CheckoutService.create_sale(db, basket, user_id, business, 1.0)
+                    db.commit()
+                round_trips.append(counter.count)
+            finally:
+                db.close()
+        print(f"{size:>7} {max(round_trips):>12} {percentile(samples, 50):>9.2f} {percentile(samples, 95):>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=200, help="sales per basket size")
+    parser.add_argument("--sizes", default="1,5,10,20,40", help="comma separated basket sizes")
+    args = parser.parse_args()
+    run(args.sales, [int(s) for s in args.sizes.split(",")])
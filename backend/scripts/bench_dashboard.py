@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Dashboard polling benchmark: queries per minute for a shop with several open
+dashboards while its tills keep selling.
+
+Usage:
+    python scripts/bench_dashboard.py [--dashboards 10] [--poll-seconds 30]
+                                      [--sales-per-minute 0,6,60] [--minutes 5]
+                                      [--history 20000]
+
+Simulated time runs in one-second ticks. Each dashboard polls every
+--poll-seconds (staggered, as tabs opened at different times would) and
+sends back the ETag it last got; sales go through the live checkout and
+commit between polls. "uncached" builds the metrics for every poll as
+get_dashboard_metrics did; "cached" serves them from the dashboard snapshot
+cache. Only the dashboards' statements are counted.
+"""
+import argparse
+import time
+from datetime import date
+
+from bench_utils import StatementCounter, make_engine, make_session_factory, seed_business, seed_sales_history
+
+from app.core.dashboard_cache import dashboard_cache
+from app.models.business import Business
+from app.routers.reports import build_dashboard_metrics
+from app.schemas.sale_schema import SaleCreate
+from app.services.checkout_service import CheckoutService
+
+
+def run(dashboards: int, poll_seconds: int, rates, minutes: int, history: int):
+    engine = make_engine()
+    SessionLocal = make_session_factory(engine)
+    db = SessionLocal()
+    business, user, products = seed_business(db, products=200)
+    seed_sales_history(engine, business, user, products, sales=history, days=7, expenses=200)
+    business_id, user_id = business.id, user.id
+    catalog = [(p.id, p.price) for p in products]
+    db.close()
+
+    now = [0.0]
+    dashboard_cache.clock = lambda: now[0]
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{dashboards} dashboards polling every {poll_seconds} s for {minutes} simulated minutes; "
+          f"{history} sales of history")
+    print(f"{'mode':>9} {'sales/min':>10} {'polls/min':>10} {'queries/min':>12} {'queries/poll':>13} "
+          f"{'304s':>6} {'ms/poll':>8}")
+
+    for rate in rates:
+        for mode in ("uncached", "cached"):
+            dashboard_cache.clear()
+            etags = [None] * dashboards
+            polls = not_modified = 0
+            poll_time = 0.0
+            sale_every = 60 / rate if rate else None
+            next_sale = 0.0
+            write_db, read_db = SessionLocal(), SessionLocal()
+            business = write_db.get(Business, business_id)
+            counter = StatementCounter(engine)
+            for tick in range(minutes * 60):
+                now[0] = float(tick)
+                while sale_every and next_sale <= tick:
+                    product_id, price = catalog[int(next_sale) % len(catalog)]
+                    CheckoutService.create_sale(write_db, SaleCreate(
+                        user_id=user_id,
+                        sale_items=[{"product_id": product_id, "quantity": 1, "unit_price": price}],
+                        payments=[{"amount": price, "payment_method": "cash"}],
+                        tax_rate=0.0
+                    ), user_id, business, 1.0)
+                    write_db.commit()
+                    next_sale += sale_every
+
+                for dashboard in range(dashboards):
+                    if (tick - dashboard * poll_seconds // dashboards) % poll_seconds:
+                        continue
+                    polls += 1
+                    started = time.perf_counter()
+                    with counter:
+                        read_db.rollback()  # each poll is its own request
+                        today = date.today()
+                        if mode == "uncached":
+                            build_dashboard_metrics(read_db, business_id, today)
+                        else:
+                            snapshot = dashboard_cache.get(business_id, today.isoformat(),
+                                                           lambda: build_dashboard_metrics(read_db, business_id, today))
+                            not_modified += snapshot.etag == etags[dashboard]
+                            etags[dashboard] = snapshot.etag
+                    poll_time += time.perf_counter() - started
+            write_db.close()
+            read_db.close()
+            print(f"{mode:>9} {rate:>10} {polls / minutes:>10.0f} {counter.count / minutes:>12.0f} "
+                  f"{counter.count / polls:>13.1f} {not_modified:>6} {poll_time / polls * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dashboards", type=int, default=10)
+    parser.add_argument("--poll-seconds", type=int, default=30)
+    parser.add_argument("--sales-per-minute", default="0,6,60")
+    parser.add_argument("--minutes", type=int, default=5)
+    parser.add_argument("--history", type=int, default=20_000)
+    options = parser.parse_args()
+    run(options.dashboards, options.poll_seconds, [int(rate) for rate in options.sales_per_minute.split(",")],
+        options.minutes, options.history)
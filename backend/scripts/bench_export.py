@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Export benchmark: peak memory and time to first byte of a large sales-lines
+export, streamed against built in memory.
+
+Usage:
+    python scripts/bench_export.py [--rows 2000000] [--items 3] [--days 30]
+                                   [--modes legacy-csv,csv,xlsx] [--fetch-size 5000]
+
+  legacy-csv  every row loaded with .all() and joined into one string before
+              the first byte is sent, as export_sales_to_csv did
+  csv         ExportService.dataset_chunks: streaming cursor, one CSV chunk
+              per fetched batch
+  xlsx        the same rows through xlsxwriter's constant-memory mode into a
+              temporary file, then sent in chunks
+
+Each mode runs in a fresh Python process so its peak RSS is its own; "base
+RSS" is that process after imports, before the export starts. Seeding
+--rows lines takes a few minutes; point BENCH_DATABASE_URL at a scratch
+Postgres database to measure server-side cursors.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+from bench_utils import BENCH_DATABASE_URL, make_engine, make_session_factory, seed_business, seed_sales_history
+
+from app.services.export_service import EXPORT_DATASETS, ExportService
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def legacy_csv_chunks(session_factory, dataset, business_id, start_date, end_date):
+    db = session_factory()
+    try:
+        rows = db.execute(dataset.query(business_id, start_date, end_date)).all()
+        lines = [",".join(dataset.header)]
+        lines.extend(",".join("" if value is None else str(value) for value in row) for row in rows)
+        csv_output = "\n".join(lines)
+        yield csv_output.encode("utf-8")
+    finally:
+        db.close()
+
+
+def child(mode: str, business_id: int, days: int, fetch_size: int):
+    engine = make_engine(reset=False)
+    session_factory = make_session_factory(engine)
+    dataset = EXPORT_DATASETS["sales-lines"]
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+    base_rss = peak_rss_mb()
+
+    if mode == "legacy-csv":
+        chunks = legacy_csv_chunks(session_factory, dataset, business_id, start_date, end_date)
+    else:
+        chunks = ExportService.dataset_chunks(session_factory, dataset, mode, business_id, start_date, end_date, fetch_size)
+
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in chunks:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    print(json.dumps({"ttfb": first_byte or total, "total": total, "mb": size / 1e6,
+                      "base_rss": base_rss, "peak_rss": peak_rss_mb()}))
+
+
+def run(rows: int, items: int, days: int, modes, fetch_size: int):
+    engine = make_engine()
+    db = make_session_factory(engine)()
+    business, user, catalog = seed_business(db, products=500)
+    started = time.perf_counter()
+    seed_sales_history(engine, business, user, catalog, sales=rows // items, items_per_sale=items, days=days,
+                       refund_every=0, expenses=0)
+    business_id = business.id
+    db.close()
+    engine.dispose()
+
+    print(f"Database: {BENCH_DATABASE_URL}")
+    print(f"Seeded {rows // items * items} sale lines in {time.perf_counter() - started:.0f} s; fetch size {fetch_size}")
+    print(f"{'mode':>11} {'ttfb s':>8} {'total s':>8} {'MB out':>8} {'base RSS MB':>12} {'peak RSS MB':>12}")
+    for mode in modes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, "--business-id", str(business_id),
+             "--days", str(days), "--fetch-size", str(fetch_size)],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(f"{mode:>11} {result['ttfb']:>8.2f} {result['total']:>8.2f} {result['mb']:>8.1f} "
+              f"{result['base_rss']:>12.0f} {result['peak_rss']:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--modes", default="legacy-csv,csv,xlsx")
+    parser.add_argument("--fetch-size", type=int, default=5000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--business-id", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.child:
+        child(options.child, options.business_id, options.days, options.fetch_size)
+    else:
+        run(options.rows, options.items, options.days, options.modes.split(","), options.fetch_size)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Logging benchmark: per-request cost of the log calls on the auth, permission
+and scanner paths, before and after the move to level-gated structured logging.
+
+Usage:
+    python scripts/bench_logging.py [--requests 20000] [--permissions 60]
+
+"before" replays the old call sites: f-strings (including the decoded JWT
+and the full permission list) built on every request whatever the level,
+and a StreamHandler writing on the request thread. "after" replays the
+current call sites through configure_logging(): lazy arguments, scanner
+noise at DEBUG, a queue handler and sampling of high-frequency events.
+Output goes to a temporary file so the write cost is real.
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+import bench_utils  # noqa: F401 - puts the backend on sys.path
+
+from app.core import logging_config
+
+auth_logger = logging.getLogger("app.core.auth")
+permissions_logger = logging.getLogger("app.core.permissions")
+scanner_logger = logging.getLogger("app.routers.scanner")
+barcode_logger = logging.getLogger("app.services.barcode_service")
+
+
+def before_request(payload, user_context, permission, barcode):
+    """The log calls one scan request made before"""
+    auth_logger.debug(f"Decoded JWT payload: {payload}")
+    auth_logger.debug(f"Found user: {user_context['id']}")
+    auth_logger.debug(f"User permissions: {user_context['permissions']}")
+    permissions_logger.debug(f"Checking permission '{permission}' for user {user_context['email']}. User has: {user_context.get('permissions', [])}")
+    scanner_logger.info(f"📦 Scanner endpoint called with barcode: {barcode}")
+    barcode_logger.info(f"🔍 Starting lookup for barcode: {barcode}")
+    barcode_logger.info(f"✅ Product found in local database: {user_context['product']}")
+
+
+def after_request(payload, user_context, permission, barcode):
+    """The same request's log calls now"""
+    auth_logger.debug("Decoded JWT", extra={"event": "auth.token_decoded", "sub": payload["sub"]})
+    if auth_logger.isEnabledFor(logging.DEBUG):
+        auth_logger.debug("Loaded permissions", extra={
+            "event": "auth.authenticated", "user_id": user_context["id"],
+            "permission_count": len(user_context["permissions"])
+        })
+    granted = permission in user_context.get("permissions", [])
+    permissions_logger.debug("Permission check", extra={
+        "event": "permission.checked", "permission": permission,
+        "user_id": user_context.get("id"), "granted": granted
+    })
+    scanner_logger.debug("Scan requested", extra={"event": "scanner.lookup", "barcode": barcode, "user_id": user_context["id"]})
+    barcode_logger.debug("Barcode %s found locally", barcode, extra={"event": "scanner.lookup", "source": "local_database"})
+
+
+def configure_before(level: str, stream):
+    """What running without configure_logging() amounted to: one synchronous handler"""
+    logging_config.stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def measure(request, requests: int, args) -> float:
+    """Microseconds per request, measured on the calling thread"""
+    for _ in range(100):
+        request(*args)
+    started = time.perf_counter()
+    for _ in range(requests):
+        request(*args)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def run(requests: int, permissions: int):
+    permission_names = [f"resource{i}:action" for i in range(permissions)]
+    payload = {"sub": "cashier@example.com", "business_id": 1, "uid": 7, "usr": "cashier",
+               "rv": 3, "perms": "f" * (permissions // 4 + 1), "exp": 1760000000}
+    user_context = {"id": 7, "email": "cashier@example.com", "permissions": permission_names,
+                    "product": "Bench Product"}
+    args = (payload, user_context, permission_names[-1], "5012345678900")
+
+    scenarios = [
+        ("before", "INFO", None, before_request),
+        ("before", "DEBUG", None, before_request),
+        ("after", "INFO", {}, after_request),
+        ("after", "DEBUG", {"sample_every": 1}, after_request),
+        ("after", "DEBUG", {"sample_every": 100}, after_request),
+    ]
+
+    print(f"{requests} requests, {permissions} permissions per user")
+    print(f"{'code':>7} {'level':>6} {'sampling':>9} {'us/req':>8} {'lines':>7}")
+    results = {}
+    for code, level, options, request in scenarios:
+        with tempfile.TemporaryFile("w+") as sink:
+            if options is None:
+                configure_before(level, sink)
+                sampling = "-"
+            else:
+                logging_config.configure_logging(level=level, levels="", fmt="text", stream=sink, **options)
+                sampling = f"1/{options.get('sample_every', logging_config.LOG_SAMPLE_EVERY)}" if level == "DEBUG" else "-"
+            per_request = measure(request, requests, args)
+            # Drain the queue before counting what was written
+            logging_config.stop_logging()
+            sink.flush()
+            sink.seek(0)
+            lines = sum(1 for _ in sink)
+        results[(code, level)] = per_request
+        print(f"{code:>7} {level:>6} {sampling:>9} {per_request:>8.2f} {lines:>7}")
+
+    before, after = results[("before", "INFO")], results[("after", "INFO")]
+    print(f"\nAt the default INFO level: {before:.2f} -> {after:.2f} us/request ({before / after:.0f}x less)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--permissions", type=int, default=60)
+    options = parser.parse_args()
+    run(options.requests, options.permissions)
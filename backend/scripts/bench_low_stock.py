@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Low-stock benchmark: the dashboard's alert count and the low-stock list over a
+large catalog, scanning stock_quantity <= min_stock_level against reading the
+flagged rows through the partial index.
+
+Usage:
+    python scripts/bench_low_stock.py [--products 200000] [--low 50] [--runs 50]
+
+"scan" is the query every low-stock reader used to run (full ORM objects for
+the list); "flagged" filters on products.is_low_stock.
+"""
+import argparse
+
+from bench_utils import make_engine, make_session_factory, percentile, seed_business, timed
+from sqlalchemy import func, insert
+
+from app.crud.inventory import count_low_stock_items, get_low_stock_items
+from app.models.product import Product
+
+
+def seed_catalog(db, business_id: int, products: int, low: int, batch: int = 20_000):
+    """`products` products of which every (products // low)-th is at or below its minimum"""
+    every = max(products // low, 1)
+    for start in range(0, products, batch):
+        db.execute(insert(Product), [
+            {"name": f"Catalog {n}", "price": 2.0, "cost_price": 1.0, "barcode": f"LS{n:09d}",
+             "stock_quantity": 3 if n % every == 0 else 100, "min_stock_level": 5,
+             "is_low_stock": n % every == 0, "business_id": business_id, "business_product_number": n + 1}
+            for n in range(start, min(start + batch, products))
+        ])
+    db.commit()
+
+
+def scan_count(db, business_id):
+    return db.query(func.count(Product.id)).filter(
+        Product.business_id == business_id, Product.stock_quantity <= Product.min_stock_level).scalar()
+
+
+def scan_list(db, business_id):
+    return db.query(Product).filter(
+        Product.business_id == business_id, Product.stock_quantity <= Product.min_stock_level).all()
+
+
+def run(products: int, low: int, runs: int):
+    engine = make_engine()
+    db = make_session_factory(engine)()
+    business, _, _ = seed_business(db, products=0)
+    seed_catalog(db, business.id, products, low)
+    business_id = business.id
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{products} products, {scan_count(db, business_id)} at or below their minimum; {runs} runs each")
+    print(f"{'query':>14} {'p50 ms':>8} {'p95 ms':>8}")
+    cases = [
+        ("scan count", lambda: scan_count(db, business_id)),
+        ("flagged count", lambda: count_low_stock_items(db, business_id)),
+        ("scan list", lambda: scan_list(db, business_id)),
+        ("flagged list", lambda: get_low_stock_items(db, business_id=business_id)),
+    ]
+    for label, query in cases:
+        samples = []
+        for _ in range(runs):
+            db.expunge_all()
+            with timed(samples):
+                query()
+        print(f"{label:>14} {percentile(samples, 50):>8.2f} {percentile(samples, 95):>8.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--low", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=50)
+    options = parser.parse_args()
+    run(options.products, options.low, options.runs)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Pagination benchmark: page 1 against a deep page of GET /api/sales/ data,
+offset paging against keyset (cursor) paging.
+
+Usage:
+    python scripts/bench_pagination.py [--sales 300000] [--page-size 50]
+                                       [--page 5000] [--repeat 20]
+
+Offset paging reads and discards every row before the page, so its cost
+grows with the page number. Keyset paging seeks straight to the cursor
+through the (business_id, created_at) index and should cost the same on
+any page. The cursor for the deep page is built from the last row of the
+page before it, exactly as the X-Next-Cursor header would carry it.
+"""
+import argparse
+
+from bench_utils import make_engine, make_session_factory, percentile, seed_business, seed_sales_history, timed
+
+from app.crud.sale import get_sales
+from app.utils.pagination import encode_cursor
+
+
+def measure(SessionLocal, repeat: int, **kwargs):
+    samples = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            with timed(samples):
+                rows = get_sales(db, **kwargs)
+            ids = [sale.id for sale in rows]
+        finally:
+            db.close()
+    return samples, ids
+
+
+def run(sales: int, page_size: int, page: int, repeat: int):
+    if sales < page_size * page:
+        raise SystemExit(f"--sales must be at least {page_size * page} to reach page {page}")
+
+    engine = make_engine()
+    SessionLocal = make_session_factory(engine)
+
+    db = SessionLocal()
+    business, user, products = seed_business(db, products=100, currency_code="UGX")
+    print(f"Seeding {sales} sales...")
+    seed_sales_history(engine, business, user, products, sales, items_per_sale=1, refund_every=0, expenses=0)
+    business_id = business.id
+
+    # The row that ends the page before the deep page, as the previous response would have seen it
+    previous = get_sales(db, skip=page_size * (page - 1) - 1, limit=1, business_id=business_id)[0]
+    deep_cursor = encode_cursor((previous.created_at, previous.id))
+    db.close()
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{'mode':>7} {'page':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    results = {}
+    for mode, target, kwargs in (
+        ("offset", 1, {"skip": 0}),
+        ("offset", page, {"skip": page_size * (page - 1)}),
+        ("keyset", 1, {"cursor": None}),
+        ("keyset", page, {"cursor": deep_cursor}),
+    ):
+        samples, ids = measure(SessionLocal, repeat, limit=page_size, business_id=business_id, **kwargs)
+        results[(mode, target)] = ids
+        print(f"{mode:>7} {target:>6} {percentile(samples, 50):>9.2f} {percentile(samples, 95):>9.2f}")
+
+    same_page = results[("offset", page)] == results[("keyset", page)]
+    print("Deep pages match" if same_page else "Deep pages differ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=300_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--page", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sales, args.page_size, args.page, args.repeat)
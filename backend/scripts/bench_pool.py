@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Connection pool load test: throughput and checkout wait as the pool size and
+the number of worker processes change.
+
+Usage:
+    python scripts/bench_pool.py [--workers 1,2,4] [--pool-sizes 2,5,10]
+                                 [--concurrency 10] [--hold-ms 5] [--seconds 3]
+
+Each worker process stands in for one uvicorn worker: it builds its own
+engine through app.database.create_db_engine (max_overflow=0, so the pool
+size is a hard cap) and runs --concurrency threads that each open a session,
+list products and keep the session for --hold-ms, as a request handler
+would. The "conns" column is what the database server has to accept
+(workers * pool size); keep it below Postgres' max_connections.
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+
+from bench_utils import BENCH_DATABASE_URL, make_engine, make_session_factory, percentile, seed_business
+
+from app.core.metrics import pool_metrics
+from app.database import create_db_engine
+from app.models.product import Product
+
+
+def worker(url, business_id, pool_size, concurrency, hold, seconds, results):
+    engine = create_db_engine(url, name="bench", pool_size=pool_size, max_overflow=0, pool_timeout=30)
+    SessionLocal = make_session_factory(engine)
+    samples = []
+    stop_at = time.perf_counter() + seconds
+
+    def loop():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                db.query(Product).filter(Product.business_id == business_id).order_by(Product.id).limit(50).all()
+                time.sleep(hold)
+            finally:
+                db.close()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=loop) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    results.put((samples, pool_metrics.snapshot()["bench"]))
+
+
+def run(workers_list, pool_sizes, concurrency: int, hold_ms: float, seconds: float):
+    engine = make_engine()
+    db = make_session_factory(engine)()
+    business, _, _ = seed_business(db, products=200)
+    business_id = business.id
+    db.close()
+    engine.dispose()
+
+    print(f"{concurrency} request threads per worker, {hold_ms:g} ms held per request, {seconds:g} s per run")
+    print(f"{'workers':>7} {'pool':>5} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'avg wait ms':>12} {'max wait ms':>12}")
+    context = multiprocessing.get_context("fork")
+    for workers in workers_list:
+        for pool_size in pool_sizes:
+            results = context.Queue()
+            processes = [
+                context.Process(target=worker, args=(BENCH_DATABASE_URL, business_id, pool_size, concurrency,
+                                                     hold_ms / 1000, seconds, results))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            outcomes = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+            samples = [sample for worker_samples, _ in outcomes for sample in worker_samples]
+            pools = [pool for _, pool in outcomes]
+            checkouts = sum(pool["checkouts"] for pool in pools)
+            avg_wait = sum(pool["avg_wait_ms"] * pool["checkouts"] for pool in pools) / checkouts if checkouts else 0.0
+            max_wait = max(pool["max_wait_ms"] for pool in pools)
+            print(f"{workers:>7} {pool_size:>5} {workers * pool_size:>6} {len(samples) / seconds:>8.0f} "
+                  f"{percentile(samples, 50):>8.1f} {percentile(samples, 95):>8.1f} {avg_wait:>12.2f} {max_wait:>12.1f}")
+
+
+def int_list(value: str):
+    return [int(part) for part in value.split(",") if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int_list, default=[1, 2, 4])
+    parser.add_argument("--pool-sizes", type=int_list, default=[2, 5, 10])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    options = parser.parse_args()
+    run(options.workers, options.pool_sizes, options.concurrency, options.hold_ms, options.seconds)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Offline till upload benchmark: draining a queue of sales one POST at a time
+against the bulk ingestion endpoint's service.
+
+Usage:
+    python scripts/bench_sale_ingest.py [--sales 10000] [--live-sample 500]
+                                        [--batch 1000] [--chunk 200] [--basket 3]
+
+"one by one" replays --live-sample sales through the live checkout (one
+transaction per sale, as the till does today) and projects the time for the
+whole queue; "bulk" ingests all --sales in batches of --batch, each written
+--chunk sales per transaction. A resend of the whole queue shows the cost of
+a till retrying after a lost response.
+"""
+import argparse
+import time
+
+from bench_utils import StatementCounter, make_engine, make_session_factory, seed_business
+
+from app.models.business import Business
+from app.schemas.sale_schema import QueuedSaleCreate
+from app.services.checkout_service import CheckoutService
+from app.services.sale_ingest_service import SaleIngestService
+
+
+def build_queue(user_id: int, catalog, sales: int, basket: int):
+    queue = []
+    for n in range(sales):
+        lines = [catalog[(n + i) % len(catalog)] for i in range(basket)]
+        total = sum(price for _, price in lines)
+        queue.append(QueuedSaleCreate(
+            idempotency_key=f"till-1-{n}",
+            user_id=user_id,
+            sale_items=[{"product_id": product_id, "quantity": 1, "unit_price": price} for product_id, price in lines],
+            payments=[{"amount": total, "payment_method": "cash"}],
+            tax_rate=0.0
+        ))
+    return queue
+
+
+def report(label: str, sales: int, seconds: float, statements: int, projected_for: int = None):
+    rate = sales / seconds if seconds else 0.0
+    projected = projected_for / rate if projected_for and rate else seconds
+    print(f"{label:>12} {sales:>7} {rate:>10.0f} {statements / sales:>12.2f} {projected:>12.1f}")
+
+
+def run(sales: int, live_sample: int, batch: int, chunk: int, basket: int):
+    engine = make_engine()
+    SessionLocal = make_session_factory(engine)
+
+    db = SessionLocal()
+    business, user, products = seed_business(db, products=200)
+    business_id, user_id = business.id, user.id
+    catalog = [(p.id, p.price) for p in products]
+    db.close()
+
+    queue = build_queue(user_id, catalog, sales, basket)
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{sales} queued sales, {basket} lines each; bulk batches of {batch}, {chunk} sales per transaction")
+    print(f"{'mode':>12} {'sales':>7} {'sales/s':>10} {'stmts/sale':>12} {f'{sales} in s':>12}")
+
+    db = SessionLocal()
+    business = db.get(Business, business_id)
+    with StatementCounter(engine) as counter:
+        started = time.perf_counter()
+        for sale_data in queue[:live_sample]:
+            CheckoutService.create_sale(db, sale_data, user_id, business, 1.0)
+            db.commit()
+        elapsed = time.perf_counter() - started
+    report("one by one", live_sample, elapsed, counter.count, projected_for=sales)
+
+    for label in ("bulk", "resend"):
+        with StatementCounter(engine) as counter:
+            started = time.perf_counter()
+            for start in range(0, sales, batch):
+                SaleIngestService.ingest(db, business, user_id, queue[start:start + batch], 1.0, chunk)
+            elapsed = time.perf_counter() - started
+        report(label, sales, elapsed, counter.count)
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=10_000)
+    parser.add_argument("--live-sample", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--chunk", type=int, default=200)
+    parser.add_argument("--basket", type=int, default=3)
+    options = parser.parse_args()
+    run(options.sales, options.live_sample, options.batch, options.chunk, options.basket)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for POST /api/sales/ under a slow exchange-rate provider.
+
+Usage:
+    python scripts/bench_sales_concurrency.py [--requests 200] [--concurrency 50]
+                                              [--latency-ms 200] [--threads 40]
+
+Every rate resolution is delayed by --latency-ms to simulate a cache miss
+against a slow provider. Two handlers are compared:
+
+  async     the real endpoint: the rate is awaited on the event loop and only
+            the checkout runs in the threadpool
+  blocking  the previous shape: a sync endpoint that calls asyncio.run() on
+            the rate lookup, holding a threadpool slot for the whole delay
+
+--threads caps the worker threadpool (Starlette's default is 40). The
+connection pool is sized above --concurrency so it never becomes the limit.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from bench_utils import auth_headers, grant_permissions, make_engine, make_session_factory, percentile, seed_business
+
+import anyio
+import httpx
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from app.core.auth import get_current_user
+from app.crud.sale import create_sale
+from app.database import get_db
+from app.main import app
+from app.schemas.sale_schema import SaleCreate
+from app.services.currency_service import CurrencyService
+from app.services.rate_book import rate_book
+
+
+def install_slow_provider(latency: float):
+    """Delay every rate lookup by `latency` seconds, as an uncached provider call would"""
+    real_aget_rate = rate_book.aget_rate
+
+    async def slow_aget_rate(base_currency, target_currency):
+        await asyncio.sleep(latency)
+        return await real_aget_rate(base_currency, target_currency)
+
+    rate_book.aget_rate = slow_aget_rate
+
+
+@app.post("/bench/blocking-sale", status_code=201)
+def blocking_sale(sale: SaleCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    """The pre-async handler shape: event loop spun up inside a worker thread"""
+    exchange_rate = asyncio.run(CurrencyService(db).get_business_rate_to_usd(current_user.get("business_id")))
+    create_sale(db, sale, current_user["id"], exchange_rate)
+    return {"ok": True}
+
+
+async def drive(path: str, payloads, headers, concurrency: int, threads: int):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, failures = [], 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(payload):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(path, json=payload, headers=headers)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 201:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(payload) for payload in payloads))
+        elapsed = time.perf_counter() - started
+
+    return samples, failures, elapsed
+
+
+def run(requests: int, concurrency: int, latency_ms: float, threads: int):
+    # Every in-flight request holds a connection, so size the pool past the concurrency
+    engine = make_engine(pool_size=concurrency + threads, max_overflow=0)
+    SessionLocal = make_session_factory(engine)
+
+    def bench_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_db
+
+    db = SessionLocal()
+    rate_book._session_factory = SessionLocal
+    rate_book._fetcher = lambda: {"UGX": 3700.0}
+    business, user, products = seed_business(db, products=50, currency_code="UGX")
+    grant_permissions(db, user, ["sale:create"])
+    headers = auth_headers(user)
+    catalog = [(p.id, p.price) for p in products]
+    user_id = user.id
+    db.close()
+
+    rate_book.refresh(force=True)
+    install_slow_provider(latency_ms / 1000)
+
+    payloads = []
+    for n in range(requests):
+        product_id, price = catalog[n % len(catalog)]
+        payloads.append({
+            "user_id": user_id,
+            "sale_items": [{"product_id": product_id, "quantity": 1, "unit_price": price}],
+            "payments": [{"amount": price, "payment_method": "cash"}],
+            "tax_rate": 0.0
+        })
+
+    print(f"{requests} requests, concurrency {concurrency}, provider latency {latency_ms:.0f} ms, {threads} worker threads")
+    print(f"{'handler':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'failed':>7}")
+    for name, path in (("async", "/api/sales/"), ("blocking", "/bench/blocking-sale")):
+        with contextlib.redirect_stdout(io.StringIO()):  # the auth dependency prints debug lines
+            samples, failures, elapsed = asyncio.run(drive(path, payloads, headers, concurrency, threads))
+        print(f"{name:>9} {requests / elapsed:>8.1f} {percentile(samples, 50):>9.1f} "
+              f"{percentile(samples, 95):>9.1f} {failures:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--threads", type=int, default=40)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.latency_ms, args.threads)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Scanner benchmark: scans/sec and latency for POST /api/scanner/scan with and
+without the barcode cache.
+
+Usage:
+    python scripts/bench_scanner.py [--products 5000] [--scans 5000]
+                                    [--concurrency 20] [--unknown-pct 5]
+
+Scans follow a skewed popularity (a few products account for most scans, as
+at a real till); --unknown-pct of them are barcodes in no catalog, drawn
+from a small set that gets rescanned. The external barcode API is replaced by
+one that finds nothing, so unknown scans cost what the local side spends on
+them. "cached" starts from a warmed cache, as after startup.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import random
+import time
+from datetime import date
+
+from bench_utils import StatementCounter, auth_headers, make_engine, make_session_factory, percentile, seed_business
+
+import httpx
+
+from app.core.barcode_cache import barcode_cache
+from app.core.permission_cache import permission_cache
+from app.database import get_db
+from app.main import app
+from app.models.sales_rollup import DailySalesRollup
+from app.services.barcode_service import barcode_service
+from app.services.external_api_service import external_api_service
+
+MODES = {
+    "uncached": 0,
+    "cached": 120,
+}
+
+
+async def find_nothing(barcode: str):
+    return None
+
+
+async def drive(headers, barcodes, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, failures = [], 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(barcode):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/scanner/scan", json={"barcode": barcode}, headers=headers)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(barcode) for barcode in barcodes))
+        elapsed = time.perf_counter() - started
+
+    return samples, failures, elapsed
+
+
+def run(products: int, scans: int, concurrency: int, unknown_pct: float):
+    engine = make_engine(pool_size=concurrency + 5, max_overflow=0)
+    SessionLocal = make_session_factory(engine)
+
+    def bench_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_db
+    external_api_service.lookup_barcode = find_nothing
+    permission_cache.ttl_seconds = 30
+    # The client's own request log would dominate the timings
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    business, user, catalog = seed_business(db, products=products)
+    # A sale today makes the business active for warming
+    db.add(DailySalesRollup(business_id=business.id, sale_date=date.today(), currency_code="USD",
+                            payment_method="cash"))
+    db.commit()
+    headers = auth_headers(user)
+    known = [product.barcode for product in catalog]
+    db.close()
+
+    rng = random.Random(42)
+    weights = [1 / rank for rank in range(1, len(known) + 1)]
+    unknown = [f"99{n:010d}" for n in range(20)]
+    barcodes = [rng.choice(unknown) if rng.random() * 100 < unknown_pct else rng.choices(known, weights)[0]
+                for _ in range(scans)]
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{products} products, {scans} scans ({unknown_pct:g}% unknown), concurrency {concurrency}")
+    print(f"{'mode':>9} {'scans/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'stmts/scan':>11} {'hit %':>6} {'failed':>7}")
+    for name, ttl in MODES.items():
+        barcode_cache.ttl_seconds = barcode_cache.negative_ttl_seconds = ttl
+        barcode_cache.clear()
+        barcode_cache.hits = barcode_cache.misses = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            if ttl:
+                barcode_service.warm_cache(SessionLocal)
+            # Untimed request so the permission cache is warm in both modes
+            asyncio.run(drive(headers, known[:1], 1))
+            barcode_cache.hits = barcode_cache.misses = 0
+            with StatementCounter(engine) as counter:
+                samples, failures, elapsed = asyncio.run(drive(headers, barcodes, concurrency))
+        lookups = barcode_cache.hits + barcode_cache.misses
+        hit_pct = barcode_cache.hits / lookups * 100 if lookups else 0.0
+        print(f"{name:>9} {scans / elapsed:>8.0f} {percentile(samples, 50):>8.2f} {percentile(samples, 99):>8.2f} "
+              f"{counter.count / scans:>11.2f} {hit_pct:>6.1f} {failures:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--scans", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--unknown-pct", type=float, default=5)
+    options = parser.parse_args()
+    run(options.products, options.scans, options.concurrency, options.unknown_pct)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Sequence contention benchmark: sales/sec per business when many tills in the
+same shop check out at once.
+
+Usage:
+    python scripts/bench_sequence_contention.py [--businesses 2] [--tills 8]
+                                                [--sales 50] [--basket 5]
+
+Two checkouts are compared:
+
+  legacy   the sale number taken first with SELECT ... FOR UPDATE, so the
+           business's sequence row stays locked for the whole checkout,
+           and inventory numbers reserved inside the same transaction
+  current  per-sale work first; the sale number (one UPDATE ... RETURNING),
+           history insert and rollup upsert last, right before commit,
+           with inventory numbers from per-process blocks
+
+"hot ms" is how long each transaction held the business-wide rows (the
+sequence and the daily rollup) before committing. On Postgres those are row
+locks, so one shop cannot exceed roughly 1000 / hot ms sales per second
+however many tills it runs. SQLite serializes every writer on one database
+lock, so there the measured sales/sec mostly reflect that lock; point
+BENCH_DATABASE_URL at Postgres to see the per-business limit directly.
+
+"misnumbered" counts businesses whose sale numbers are not exactly 1..N.
+SQLite ignores FOR UPDATE, so the legacy read-then-write can hand two sales
+the same number there; a single UPDATE ... RETURNING cannot.
+"""
+import argparse
+import threading
+import time
+
+from bench_utils import make_engine, make_session_factory, percentile, seed_business
+
+from sqlalchemy import case, event, insert
+from sqlalchemy.orm import Session
+
+from app.models.business import Business
+from app.models.business_sequence import BusinessSequence
+from app.models.inventory import InventoryHistory
+from app.models.payment import Payment
+from app.models.product import Product
+from app.models.sale import Sale, SaleItem
+from app.schemas.sale_schema import SaleCreate
+from app.services.checkout_service import CheckoutService
+from app.services.inventory_ledger import InventoryLedger
+from app.services.rollup_service import RollupService
+from app.services.sequence_service import SequenceService, sequence_blocks
+
+HOT_TABLES = ("business_sequences", "daily_sales_rollup")
+
+
+def legacy_reserve_block(db: Session, business_id: int, entity_type: str, count: int) -> int:
+    """The previous allocation: lock the sequence row, then bump it through the ORM"""
+    sequence = db.query(BusinessSequence).filter(
+        BusinessSequence.business_id == business_id,
+        BusinessSequence.entity_type == entity_type
+    ).with_for_update().first()
+    if not sequence:
+        sequence = BusinessSequence(business_id=business_id, entity_type=entity_type, last_number=0)
+        db.add(sequence)
+        db.flush()
+    first_number = sequence.last_number + 1
+    sequence.last_number += count
+    db.flush()
+    return first_number
+
+
+class LegacyCheckout:
+    """CheckoutService.create_sale as it was, numbering first"""
+
+    @staticmethod
+    def create_sale(db: Session, sale_data: SaleCreate, user_id: int, business: Business,
+                    current_rate: float = 1.0) -> Sale:
+        totals = CheckoutService.calculate_totals(sale_data)
+        local_currency = business.currency_code or 'USD'
+
+        # Aggregate quantities so repeated lines of the same product are checked together
+        requested: Dict[int, int] = {}
+        for item in sale_data.sale_items:
+            requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+
+        products = InventoryLedger.lock(db, requested)
+        for item in sale_data.sale_items:
+            if item.product_id not in products:
+                raise ValueError(f"Product with ID {item.product_id} not found")
+        for product_id, quantity in requested.items():
+            product = products[product_id]
+            if product.stock_quantity < quantity:
+                raise ValueError(f"Insufficient stock for product {product.name}")
+
+        # FIXED PATTERN: Get sequence number FIRST (within transaction)
+        business_sale_number = legacy_reserve_block(db, business.id, 'sale', 1)
+
+        final_total = totals["final_total"]
+        tax_amount = totals["tax_amount"]
+        final_total_usd = final_total * current_rate if current_rate != 0 else final_total
+        tax_amount_usd = tax_amount * current_rate if current_rate != 0 else tax_amount
+
+        db_sale = Sale(
+            user_id=user_id,
+            business_id=business.id,
+            business_sale_number=business_sale_number,
+            total_amount=final_total_usd,
+            tax_amount=tax_amount_usd,
+            usd_amount=final_total_usd,
+            usd_tax_amount=tax_amount_usd,
+            original_amount=final_total,
+            original_currency=local_currency,
+            exchange_rate_at_sale=current_rate,
+            payment_status="completed"
+        )
+        db.add(db_sale)
+        db.flush()  # Get sale ID without committing
+
+        # One set-based UPDATE for every product in the basket
+        db.query(Product).filter(Product.id.in_(list(requested))).update(
+            {Product.stock_quantity: Product.stock_quantity - case(requested, value=Product.id, else_=0)},
+            synchronize_session=False
+        )
+
+        # One sequence bump covers the history row of every line
+        line_count = len(sale_data.sale_items)
+        first_inventory_number = legacy_reserve_block(db, business.id, 'inventory', line_count)
+
+        running_stock = {product_id: product.stock_quantity for product_id, product in products.items()}
+        item_rows = []
+        history_rows = []
+        for offset, item in enumerate(sale_data.sale_items):
+            subtotal = item.quantity * item.unit_price
+            item_rows.append({
+                "sale_id": db_sale.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price * current_rate,
+                "subtotal": subtotal * current_rate,
+                "original_unit_price": item.unit_price,
+                "original_subtotal": subtotal,
+                "exchange_rate_at_creation": current_rate,
+                "refunded_quantity": 0
+            })
+
+            previous_quantity = running_stock[item.product_id]
+            running_stock[item.product_id] = previous_quantity - item.quantity
+            history_rows.append({
+                "product_id": item.product_id,
+                "business_id": business.id,
+                "business_inventory_number": first_inventory_number + offset,
+                "change_type": "sale",
+                "quantity_change": -item.quantity,
+                "previous_quantity": previous_quantity,
+                "new_quantity": running_stock[item.product_id],
+                "reason": f"Sale #{business_sale_number}",
+                "changed_by": user_id
+            })
+
+        payment_rows = [
+            {
+                "sale_id": db_sale.id,
+                "amount": payment.amount * current_rate,
+                "payment_method": payment.payment_method,
+                "transaction_id": payment.transaction_id,
+                "status": "completed",
+                "original_amount": payment.amount,
+                "original_currency_code": local_currency,
+                "exchange_rate_at_payment": current_rate
+            }
+            for payment in sale_data.payments
+        ]
+
+        db.execute(insert(SaleItem), item_rows)
+        db.execute(insert(InventoryHistory), history_rows)
+        if payment_rows:
+            db.execute(insert(Payment), payment_rows)
+
+        lines = [
+            (item.quantity, products[item.product_id].cost_price, products[item.product_id].original_cost_price)
+            for item in sale_data.sale_items
+        ]
+        RollupService.record_sale(
+            db, db_sale, RollupService.sale_deltas(db_sale, lines),
+            [(row["payment_method"], row["amount"], row["original_amount"]) for row in payment_rows]
+        )
+
+        return db_sale
+
+
+class HotRowTimer:
+    """Time from a transaction's first statement on a business-wide row to its commit"""
+
+    def __init__(self, engine):
+        self.samples = []
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "commit", self._commit)
+        event.listen(engine, "rollback", self._rollback)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if "hot_since" not in conn.info and any(table in statement for table in HOT_TABLES):
+            conn.info["hot_since"] = time.perf_counter()
+
+    def _commit(self, conn):
+        started = conn.info.pop("hot_since", None)
+        if started is not None:
+            with self._lock:
+                self.samples.append((time.perf_counter() - started) * 1000)
+
+    def _rollback(self, conn):
+        conn.info.pop("hot_since", None)
+
+
+def build_basket(user_id: int, catalog, size: int, offset: int) -> SaleCreate:
+    lines = [catalog[(offset + i) % len(catalog)] for i in range(size)]
+    total = sum(price for _, price in lines)
+    return SaleCreate(
+        user_id=user_id,
+        sale_items=[{"product_id": product_id, "quantity": 1, "unit_price": price} for product_id, price in lines],
+        payments=[{"amount": total, "payment_method": "cash"}],
+        tax_rate=0.0
+    )
+
+
+def run_mode(create_sale, businesses: int, tills: int, sales: int, basket: int):
+    engine = make_engine(pool_size=businesses * tills + 5, max_overflow=0)
+    SessionLocal = make_session_factory(engine)
+    sequence_blocks.clear()
+
+    shops = []
+    db = SessionLocal()
+    for n in range(businesses):
+        business, user, products = seed_business(db, products=basket * tills * 2, name=f"Contention Shop {n}")
+        # Measure steady state, not the race to create each sequence row
+        SequenceService.ensure_all_sequences(db, business.id)
+        # Every till sells from its own shelf, so product row locks never collide
+        shops.append((business.id, user.id, [(p.id, p.price) for p in products]))
+    db.close()
+
+    timer = HotRowTimer(engine)
+    failures = []
+
+    def till(business_id, user_id, catalog, index):
+        db = SessionLocal()
+        business = db.get(Business, business_id)
+        shelf = catalog[index * basket * 2:(index + 1) * basket * 2]
+        try:
+            for n in range(sales):
+                try:
+                    create_sale(db, build_basket(user_id, shelf, basket, n), user_id, business, 1.0)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    failures.append(e)
+        finally:
+            db.close()
+
+    threads = [
+        threading.Thread(target=till, args=(business_id, user_id, catalog, index))
+        for business_id, user_id, catalog in shops
+        for index in range(tills)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    misnumbered = 0
+    for business_id, _, _ in shops:
+        numbers = sorted(n for (n,) in db.query(Sale.business_sale_number).filter(Sale.business_id == business_id))
+        misnumbered += numbers != list(range(1, len(numbers) + 1))
+    db.close()
+    engine.dispose()
+
+    completed = businesses * tills * sales - len(failures)
+    return completed / elapsed / businesses, timer.samples, len(failures), misnumbered
+
+
+def run(businesses: int, tills: int, sales: int, basket: int):
+    print(f"{businesses} businesses x {tills} tills x {sales} sales, {basket} lines per basket")
+    print(f"{'mode':>8} {'sales/s/biz':>12} {'hot p50 ms':>11} {'hot p95 ms':>11} {'failed':>7} {'misnumbered':>12}")
+    modes = {"legacy": LegacyCheckout.create_sale, "current": CheckoutService.create_sale}
+    for name, create_sale in modes.items():
+        per_business, hot, failed, misnumbered = run_mode(create_sale, businesses, tills, sales, basket)
+        print(f"{name:>8} {per_business:>12.1f} {percentile(hot, 50):>11.2f} {percentile(hot, 95):>11.2f} "
+              f"{failed:>7} {misnumbered:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--businesses", type=int, default=2)
+    parser.add_argument("--tills", type=int, default=8)
+    parser.add_argument("--sales", type=int, default=50, help="sales per till")
+    parser.add_argument("--basket", type=int, default=5, help="lines per sale")
+    options = parser.parse_args()
+    run(options.businesses, options.tills, options.sales, options.basket)
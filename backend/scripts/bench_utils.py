@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Benchmarks run against BENCH_DATABASE_URL when it is set (use a scratch
+Postgres database for realistic numbers) and fall back to a throwaway
+SQLite file otherwise.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+
+BENCH_DATABASE_URL = os.getenv(
+    "BENCH_DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bizzy_bench.db')}"
+)
+# app.database builds its engine at import time, so make sure it has a URL
+os.environ.setdefault("DATABASE_URL", BENCH_DATABASE_URL)
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every mapper before relationships resolve
+from app.models.base import Base
+from app.models.business import Business
+from app.models.currency import Currency
+from app.models.permission import Permission, Role
+from app.models.product import Product
+from app.models.user import User
+
+
+def make_engine(url: str = BENCH_DATABASE_URL, reset: bool = True, **engine_kwargs):
+    """Create an engine for the benchmark database, optionally rebuilding the schema"""
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, **engine_kwargs)
+    if url.startswith("sqlite"):
+        # WAL lets readers run alongside the single writer, closer to Postgres behaviour
+        @event.listens_for(engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.close()
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def make_session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class StatementCounter:
+    """Counts statements sent to the database while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        return False
+
+
+@contextmanager
+def timed(samples: list):
+    """Append the elapsed wall time (ms) of the block to `samples`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def seed_business(db, products: int = 100, stock: int = 1_000_000, currency_code: str = "USD",
+                  name: str = "Bench Shop"):
+    """Create a business, its owner and a catalog of products. Returns (business, user, products)"""
+    if not db.query(Currency).filter(Currency.code == currency_code).first():
+        db.add(Currency(code=currency_code, name=currency_code, symbol=currency_code))
+        db.flush()
+
+    business = Business(name=name, currency_code=currency_code)
+    db.add(business)
+    db.flush()
+
+    user = User(
+        username=f"bench_{business.id}",
+        email=f"bench_{business.id}@example.com",
+        hashed_password="x",
+        business_id=business.id
+    )
+    db.add(user)
+
+    catalog = [
+        Product(
+            name=f"Product {business.id}-{i}",
+            price=1.0 + i % 50,
+            cost_price=0.5 + i % 50,
+            original_price=1.0 + i % 50,
+            original_cost_price=0.5 + i % 50,
+            original_currency_code=currency_code,
+            barcode=f"{business.id:04d}{i:08d}",
+            stock_quantity=stock,
+            min_stock_level=5,
+            business_id=business.id,
+            business_product_number=i + 1
+        )
+        for i in range(products)
+    ]
+    db.add_all(catalog)
+    db.commit()
+    return business, user, catalog
+
+
+def grant_permissions(db, user, names, role_name: str = "Bench Role"):
+    """Give `user` a role holding the named permissions, creating whatever is missing"""
+    role = db.query(Role).filter(Role.name == role_name).first()
+    if role is None:
+        role = Role(name=role_name, description="Benchmark role")
+        db.add(role)
+    for name in names:
+        permission = db.query(Permission).filter(Permission.name == name).first()
+        if permission is None:
+            permission = Permission(name=name, description=name)
+            db.add(permission)
+        if permission not in role.permissions:
+            role.permissions.append(permission)
+    if role not in user.roles:
+        user.roles.append(role)
+    db.commit()
+    return role
+
+
+def auth_headers(user):
+    """Bearer header for `user`, built the same way /api/auth/token builds it"""
+    from app.core.auth import build_token_claims, create_access_token
+    token = create_access_token(data=build_token_claims(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed_sales_history(engine, business, user, catalog, sales: int, items_per_sale: int = 3, days: int = 30,
+                       refund_every: int = 50, expenses: int = 500, batch: int = 20_000):
+    """
+    Bulk-load `sales` completed sales (with items and one payment each) spread over
+    the last `days` days, a processed refund for every `refund_every`-th sale, and
+    `expenses` expenses over the same window. Writes through Core executemany in
+    batches so millions of rows load in minutes rather than hours.
+    """
+    from datetime import datetime, timedelta
+    from app.models.expense import Expense, ExpenseCategory
+    from app.models.payment import Payment
+    from app.models.refund import Refund, RefundItem
+    from app.models.sale import Sale, SaleItem
+
+    rate = 1 / 3700.0
+    now = datetime.now().replace(microsecond=0)
+    span = days * 86400
+    products = [(p.id, p.price) for p in catalog]
+    sale_table, item_table = Sale.__table__, SaleItem.__table__
+    payment_table, refund_table, refund_item_table = Payment.__table__, Refund.__table__, RefundItem.__table__
+
+    with engine.begin() as conn:
+        next_sale = (conn.execute(sale_table.select().with_only_columns(sale_table.c.id).order_by(sale_table.c.id.desc()).limit(1)).scalar() or 0) + 1
+        next_item = (conn.execute(item_table.select().with_only_columns(item_table.c.id).order_by(item_table.c.id.desc()).limit(1)).scalar() or 0) + 1
+        next_refund = (conn.execute(refund_table.select().with_only_columns(refund_table.c.id).order_by(refund_table.c.id.desc()).limit(1)).scalar() or 0) + 1
+
+    for start in range(0, sales, batch):
+        sale_rows, item_rows, payment_rows, refund_rows, refund_item_rows = [], [], [], [], []
+        for n in range(start, min(start + batch, sales)):
+            created_at = now - timedelta(seconds=(n * 7919) % span)
+            sale_id = next_sale + n
+            total = 0.0
+            first_item_id = None
+            for line in range(items_per_sale):
+                product_id, price = products[(n + line) % len(products)]
+                item_id = next_item + n * items_per_sale + line
+                first_item_id = first_item_id or item_id
+                item_rows.append({
+                    "id": item_id, "sale_id": sale_id, "product_id": product_id, "quantity": 1,
+                    "unit_price": price, "subtotal": price, "refunded_quantity": 0,
+                    "original_unit_price": price / rate, "original_subtotal": price / rate,
+                    "exchange_rate_at_creation": rate
+                })
+                total += price
+            sale_rows.append({
+                "id": sale_id, "user_id": user.id, "business_id": business.id, "total_amount": total,
+                "tax_amount": 0.0, "original_amount": total / rate, "original_currency": business.currency_code,
+                "exchange_rate_at_sale": rate, "usd_amount": total, "usd_tax_amount": 0.0,
+                "business_sale_number": sale_id, "payment_status": "completed", "created_at": created_at
+            })
+            payment_rows.append({
+                "sale_id": sale_id, "amount": total, "payment_method": ("cash", "card", "mobile_money")[n % 3],
+                "status": "completed", "created_at": created_at, "original_amount": total / rate,
+                "original_currency_code": business.currency_code, "exchange_rate_at_payment": rate
+            })
+            if refund_every and n % refund_every == 0:
+                refund_id = next_refund + n // refund_every
+                _, price = products[n % len(products)]
+                refund_rows.append({
+                    "id": refund_id, "sale_id": sale_id, "user_id": user.id, "business_id": business.id,
+                    "business_refund_number": refund_id, "reason": "Bench refund", "total_amount": price,
+                    "original_amount": price / rate, "original_currency": business.currency_code,
+                    "exchange_rate_at_refund": rate, "status": "processed", "created_at": created_at
+                })
+                refund_item_rows.append({"refund_id": refund_id, "sale_item_id": first_item_id, "quantity": 1})
+        with engine.begin() as conn:
+            conn.execute(sale_table.insert(), sale_rows)
+            conn.execute(item_table.insert(), item_rows)
+            conn.execute(payment_table.insert(), payment_rows)
+            if refund_rows:
+                conn.execute(refund_table.insert(), refund_rows)
+                conn.execute(refund_item_table.insert(), refund_item_rows)
+
+    with engine.begin() as conn:
+        categories = []
+        for name in ("Rent", "Utilities", "Salaries", "Supplies", "Transport"):
+            category_id = conn.execute(
+                ExpenseCategory.__table__.select().with_only_columns(ExpenseCategory.id).where(ExpenseCategory.name == name)
+            ).scalar()
+            if category_id is None:
+                category_id = conn.execute(ExpenseCategory.__table__.insert().values(name=name, is_active=True)).inserted_primary_key[0]
+            categories.append(category_id)
+        if expenses:
+            conn.execute(Expense.__table__.insert(), [
+                {
+                    "amount": 10 + n % 90, "original_amount": (10 + n % 90) / rate,
+                    "original_currency_code": business.currency_code, "exchange_rate": rate,
+                    "description": f"Bench expense {n}", "category_id": categories[n % len(categories)],
+                    "date": now - timedelta(seconds=(n * 104729) % span), "created_by": user.id,
+                    "business_id": business.id, "payment_method": "cash"
+                }
+                for n in range(expenses)
+            ])
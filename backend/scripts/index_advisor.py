@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Index advisor: EXPLAIN every statement the report, sale and inventory CRUD
+functions issue against a seeded database and flag full table scans.
+
+Usage:
+    python scripts/index_advisor.py [--sales 50000] [--min-rows 1000] [--no-seed]
+
+Each workload below is run once while its SQL is captured. The captured
+statements are re-run under EXPLAIN (EXPLAIN QUERY PLAN on SQLite) with their
+original parameters. A sequential scan is flagged when the table holds at
+least --min-rows rows; tiny lookup tables are expected to be scanned.
+
+Point BENCH_DATABASE_URL at a scratch Postgres database for plans that match
+production. --no-seed reuses whatever data is already there. Exits with
+status 1 when anything is flagged.
+"""
+import argparse
+import json
+import sys
+from datetime import date, datetime, timedelta
+
+from bench_utils import BENCH_DATABASE_URL, make_engine, make_session_factory, seed_business, seed_sales_history
+
+from sqlalchemy import event, inspect, text
+
+from app.crud import inventory as inventory_crud
+from app.crud import product as product_crud
+from app.crud import refund as refund_crud
+from app.crud import report as report_crud
+from app.crud import sale as sale_crud
+from app.models.business import Business
+from app.models.inventory import InventoryHistory
+from app.models.product import Product
+from app.models.sale import Sale
+
+
+def workloads(business_id: int, product: Product, sale_id: int):
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    return [
+        ("report.get_sales_report", lambda db: report_crud.get_sales_report(db, month_ago, today, business_id)),
+        ("report.get_inventory_report", lambda db: report_crud.get_inventory_report(db, business_id)),
+        ("report.get_financial_report", lambda db: report_crud.get_financial_report(db, month_ago, today, business_id)),
+        ("sale.get_sale", lambda db: sale_crud.get_sale(db, sale_id, business_id)),
+        ("sale.get_sales", lambda db: sale_crud.get_sales(db, 0, 50, business_id=business_id)),
+        ("sale.get_sales (date range)", lambda db: sale_crud.get_sales(db, 0, 50, month_ago, today - timedelta(days=1), business_id)),
+        ("sale.get_daily_sales_report", lambda db: sale_crud.get_daily_sales_report(db, today - timedelta(days=1), business_id)),
+        ("inventory.get_inventory_history", lambda db: inventory_crud.get_inventory_history(db, business_id=business_id)),
+        ("inventory.get_inventory_history (product)", lambda db: inventory_crud.get_inventory_history(db, product.id, business_id=business_id)),
+        ("inventory.get_low_stock_items", lambda db: inventory_crud.get_low_stock_items(db, business_id=business_id)),
+        ("inventory.get_stock_levels", lambda db: inventory_crud.get_stock_levels(db, business_id=business_id)),
+        ("product.get_product_by_barcode", lambda db: product_crud.get_product_by_barcode(db, product.barcode, business_id)),
+        ("refund.get_refunds_by_business", lambda db: refund_crud.get_refunds_by_business(db, business_id)),
+        ("refund.get_refunds_by_sale", lambda db: refund_crud.get_refunds_by_sale(db, sale_id, business_id)),
+    ]
+
+
+def capture(engine, session_factory, run):
+    """Run `run(db)` and return the distinct (statement, parameters) it sent"""
+    captured = {}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.setdefault(statement, parameters)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    db = session_factory()
+    try:
+        run(db)
+        db.rollback()
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return list(captured.items())
+
+
+def full_scans(conn, statement, parameters):
+    """Tables the plan reads with a sequential (full) scan"""
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scans, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node.get("Node Type") == "Seq Scan":
+                scans.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scans
+
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        scans = []
+        for row in rows:
+            detail = row[-1]
+            # "SCAN sales" is a full scan; "SCAN sales USING INDEX ..." walks an index
+            if detail.startswith("SCAN ") and " USING " not in detail:
+                scans.append(detail.split()[1])
+        return scans
+
+    raise SystemExit(f"EXPLAIN parsing is not implemented for {conn.dialect.name}")
+
+
+def seed(engine, session_factory, sales: int):
+    db = session_factory()
+    business, user, products = seed_business(db, products=500, currency_code="UGX")
+    seed_sales_history(engine, business, user, products, sales)
+
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(InventoryHistory.__table__.insert(), [
+            {
+                "product_id": products[n % len(products)].id, "business_id": business.id,
+                "business_inventory_number": n + 1, "change_type": "sale", "quantity_change": -1,
+                "previous_quantity": 100, "new_quantity": 99, "changed_by": user.id,
+                "changed_at": now - timedelta(minutes=n)
+            }
+            for n in range(sales)
+        ])
+    db.close()
+
+
+def run(sales: int, min_rows: int, reseed: bool):
+    engine = make_engine(reset=reseed)
+    SessionLocal = make_session_factory(engine)
+    if reseed:
+        print(f"Seeding {sales} sales...")
+        seed(engine, SessionLocal, sales)
+
+    with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+        else:
+            conn.execute(text("ANALYZE"))
+        row_counts = {
+            table: conn.execute(text(f'SELECT count(*) FROM "{table}"')).scalar()
+            for table in inspect(conn).get_table_names()
+        }
+
+    db = SessionLocal()
+    business_id = db.query(Business.id).join(Sale, Sale.business_id == Business.id).limit(1).scalar()
+    if business_id is None:
+        raise SystemExit("No sales found - run without --no-seed")
+    product = db.query(Product).filter(Product.business_id == business_id).first()
+    sale_id = db.query(Sale.id).filter(Sale.business_id == business_id).order_by(Sale.id.desc()).limit(1).scalar()
+    db.expunge(product)
+    db.close()
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    flagged = 0
+    for name, workload in workloads(business_id, product, sale_id):
+        statements = capture(engine, SessionLocal, workload)
+        problems = []
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                scans = [table for table in full_scans(conn, statement, parameters) if row_counts.get(table, 0) >= min_rows]
+                if scans:
+                    problems.append((scans, statement))
+        status = "ok" if not problems else f"{len(problems)} flagged"
+        print(f"{name:<45} {len(statements):>3} statements  {status}")
+        for scans, statement in problems:
+            flagged += 1
+            tables = ", ".join(f"{table} ({row_counts[table]} rows)" for table in sorted(set(scans)))
+            print(f"    full scan of {tables}")
+            print("      " + " ".join(statement.split())[:200])
+
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=50_000)
+    parser.add_argument("--min-rows", type=int, default=1000)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    args = parser.parse_args()
+    sys.exit(1 if run(args.sales, args.min_rows, not args.no_seed) else 0)
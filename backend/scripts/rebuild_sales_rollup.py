@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Rebuild the daily_sales_rollup table from sales, payments and refunds.
+
+Usage:
+    python scripts/rebuild_sales_rollup.py [--business-id 1] [--start 2025-01-01] [--end 2025-12-31]
+
+The add_daily_sales_rollup migration backfills history; run this whenever
+the rollup is suspected to have drifted. Rows for the selected business and
+date range are replaced in a single transaction.
+"""
+import argparse
+import sys
+import os
+from datetime import date
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+
+from app.database import SessionLocal
+from app.services.rollup_service import RollupService
+
+def rebuild_sales_rollup(business_id=None, start_date=None, end_date=None):
+    db = SessionLocal()
+    try:
+        print("Rebuilding daily sales rollup...")
+        rows = RollupService.rebuild(db, business_id=business_id, start_date=start_date, end_date=end_date)
+        print(f"Wrote {rows} rollup rows")
+    except Exception as e:
+        print(f"Error rebuilding rollup: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--business-id", type=int)
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    args = parser.parse_args()
+    rebuild_sales_rollup(args.business_id, args.start, args.end)
@@ -4,7 +4,7 @@ import { useAuthStore } from '../hooks/useAuth';
 import { useReports } from '../hooks/useReports';
 import SalesTrendChart from '../components/charts/SalesTrendChart';
 import TopProductsChart from '../components/charts/TopProductsChart';
-import { standaloneActivityService } from '../utils/activityService';
+import { standaloneActivityService, streamActivities } from '../utils/activityService';
 import { CurrencyDisplay } from '../components/CurrencyDisplay';
 import { Activity } from '../types';
 
@@ -52,28 +52,54 @@ const Dashboard: React.FC = () => {
   };
 
   useEffect(() => {
-    // Initial load
+    // Initial load; after that the activity stream says when something changed
     loadDashboardMetrics();
     loadSalesTrends();
     loadTopProducts();
     loadActivities();
     setLastUpdated(new Date());
 
-    // Set up real-time updates every 30 seconds
-    const dataInterval = setInterval(() => {
-      loadDashboardMetrics();
-      loadSalesTrends();
-      loadTopProducts();
-      loadActivities();
-      setLastUpdated(new Date());
-    }, 30000);
-
     // Update time every minute
     const timer = setInterval(() => setCurrentTime(new Date()), 60000);
 
+    return () => clearInterval(timer);
+  }, [loadDashboardMetrics, loadSalesTrends, loadTopProducts]);
+
+  useEffect(() => {
+    const controller = new AbortController();
+    let refreshTimer: ReturnType<typeof setTimeout> | undefined;
+    let salesChanged = false;
+
+    streamActivities((event) => {
+      if (event.type === 'reset') {
+        // Events were missed: reload everything
+        salesChanged = true;
+        loadActivities();
+      } else if (['sale', 'inventory', 'expense'].includes(event.type)) {
+        const activity = event.data as Activity;
+        setActivities((current) => [
+          activity,
+          ...current.filter((item) => !(item.type === activity.type && item.id === activity.id)),
+        ].slice(0, 10));
+        salesChanged = salesChanged || event.type === 'sale';
+      }
+
+      // A checkout sends several events at once; refresh the metrics once for all of them
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => {
+        loadDashboardMetrics();
+        if (salesChanged) {
+          loadSalesTrends();
+          loadTopProducts();
+          salesChanged = false;
+        }
+        setLastUpdated(new Date());
+      }, 2000);
+    }, controller.signal);
+
     return () => {
-      clearInterval(dataInterval);
-      clearInterval(timer);
+      controller.abort();
+      clearTimeout(refreshTimer);
     };
   }, [loadDashboardMetrics, loadSalesTrends, loadTopProducts]);
 
@@ -41,3 +41,66 @@ export const standaloneActivityService = {
     }
   },
 };
+
+export interface ActivityStreamEvent {
+  type: string;
+  data: any;
+}
+
+const STREAM_RETRY_MS = 3000;
+
+// Server-sent events read with fetch, so the bearer token travels in a header
+// rather than the URL. Reconnects (sending Last-Event-ID) until `signal` aborts.
+export const streamActivities = async (
+  onEvent: (event: ActivityStreamEvent) => void,
+  signal: AbortSignal
+) => {
+  const baseURL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+  let lastEventId: string | null = null;
+  let retryMs = STREAM_RETRY_MS;
+
+  while (!signal.aborted) {
+    try {
+      const token = localStorage.getItem('access_token') || localStorage.getItem('auth_token');
+      const headers: Record<string, string> = { Accept: 'text/event-stream' };
+      if (token) headers.Authorization = `Bearer ${token}`;
+      if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+
+      const response = await fetch(`${baseURL}/api/activity/stream`, { headers, signal });
+      if (response.status === 401) {
+        localStorage.removeItem('auth_token');
+        localStorage.removeItem('access_token');
+        localStorage.removeItem('user_data');
+        window.location.href = '/login';
+        return;
+      }
+      if (!response.ok || !response.body) throw new Error(`Activity stream failed: ${response.status}`);
+
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop() || '';
+        for (const message of messages) {
+          let type = 'message';
+          let data = '';
+          for (const line of message.split('\n')) {
+            if (line.startsWith('id: ')) lastEventId = line.slice(4);
+            else if (line.startsWith('event: ')) type = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+            else if (line.startsWith('retry: ')) retryMs = Number(line.slice(7)) || retryMs;
+          }
+          if (data) onEvent({ type, data: JSON.parse(data) });
+        }
+      }
+    } catch (error) {
+      if (signal.aborted) return;
+      console.error('Activity stream interrupted:', error);
+    }
+    // Whatever happened while disconnected is replayed, or announced with a reset
+    await new Promise((resolve) => setTimeout(resolve, retryMs));
+  }
+};